@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Offline micro-benchmarks for the dictionary crawlers.
+
+Run them from the scrapy project directory, e.g. ``python -m benchmarks.xpath_plans``.
+``python -m benchmarks`` runs the parser suite against the stored baseline.
+
+The pages in ``fixtures/`` follow the ldoceonline markup the spiders target: a short word (dog),
+multi-homograph words (market, bank), a phrasal verb (give-up) and a corpus-heavy page (run).
+Nothing is fetched, so every benchmark runs offline.
+"""
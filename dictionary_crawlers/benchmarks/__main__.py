@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import sys
+
+from .suite import main
+
+sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import os
+import time
+
+from lxml import etree
+
+__all__ = (
+    'FIXTURES_DIR',
+    'load_fixture',
+    'dictentries',
+    'make_response',
+    'measure',
+    'report',
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name: str) -> str:
+    """
+    :param name: fixture name without the `.html` extension
+    :return: the recorded page
+    """
+    with open(os.path.join(FIXTURES_DIR, f'{name}.html'), encoding='utf-8') as fh:
+        return fh.read()
+
+
+def dictentries(page: str) -> list:
+    """
+    :param page: a recorded page
+    :return: serialized `dictentry` spans, the same strings `BaseSpider.parse` hands to the processors
+    """
+    root = etree.HTML(page)
+    return [etree.tostring(element, encoding='unicode') for element in root.xpath("//span[@class='dictentry']")]
+
+
+def make_response(page: str, word: str = 'market'):
+    """
+    :param page: a recorded page
+    :param word:
+    :return: a fresh `HtmlResponse`, its selector is built lazily on first use
+    """
+    from scrapy.http import HtmlResponse, Request
+
+    request = Request(f'https://www.ldoceonline.com/dictionary/{word}')
+    return HtmlResponse(url=request.url, body=page.encode('utf-8'), encoding='utf-8', request=request)
+
+
+def measure(func, repeat: int = 200, warmup: int = 10) -> float:
+    """
+    :param func: a callable without arguments, executed once per iteration
+    :param repeat: number of timed iterations
+    :param warmup: number of untimed iterations
+    :return: iterations per second
+    """
+    for _ in range(warmup):
+        func()
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - started
+
+    return repeat / elapsed
+
+
+def report(title: str, before: float, after: float, unit: str = 'pages/sec'):
+    """
+    :param title:
+    :param before: rate without the optimization
+    :param after: rate with the optimization
+    :param unit:
+    :return:
+    """
+    print(f"{title}")
+    print(f"  before: {before:10.1f} {unit}")
+    print(f"  after:  {after:10.1f} {unit}")
+    print(f"  speedup: {after / before:.2f}x")
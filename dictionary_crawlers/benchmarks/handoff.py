@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Per-response CPU time and peak allocation of the definition extraction, with and without handing
+the parsed `dictentry` elements from the response to `LongManDefinitionService`.
+
+Without the hand-off every `dictentry` is serialized by the item loader and parsed again by the
+service. Both paths start from a response whose page is already parsed, as it is once the spider
+callback runs. Peak allocation is measured with tracemalloc, so it covers the serialized strings and
+the python objects but not libxml2's own buffers.
+
+    python -m benchmarks.handoff [fixture] [repeat]
+"""
+import sys
+import time
+import tracemalloc
+
+from dictionary_crawlers.services import LongManDefinitionService
+from dictionary_crawlers.spiders.longman import LongmanDictionarySpider
+
+from .common import load_fixture, make_response
+
+XPATH = LongmanDictionarySpider.item_loader_xpath['definition']
+
+
+def reparse(response):
+    return LongManDefinitionService().process(response.xpath(XPATH).getall())
+
+
+def handoff(response):
+    return LongManDefinitionService().process([selector.root for selector in response.xpath(XPATH)])
+
+
+def parsed_responses(page, count):
+    responses = [make_response(page) for _ in range(count)]
+    for response in responses:
+        response.selector
+    return responses
+
+
+def profile(func, page, repeat):
+    """
+    :return: (cpu ms per response, peak KiB per response)
+    """
+    responses = parsed_responses(page, repeat)
+    started = time.process_time()
+    for response in responses:
+        func(response)
+    cpu = (time.process_time() - started) / repeat * 1000
+
+    peaks = []
+    for response in parsed_responses(page, min(repeat, 20)):
+        tracemalloc.start()
+        func(response)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return cpu, max(peaks) / 1024
+
+
+def main(fixture='market', repeat=300):
+    page = load_fixture(fixture)
+    assert reparse(make_response(page)) == handoff(make_response(page)), "both paths must extract the same entries"
+
+    print(f"definition extraction on '{fixture}', per response")
+    print(f"{'path':>10} {'cpu ms':>10} {'peak KiB':>10}")
+    for name, func in (('reparse', reparse), ('hand-off', handoff)):
+        cpu, peak = profile(func, page, repeat)
+        print(f"{name:>10} {cpu:>10.3f} {peak:>10.1f}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Regression benchmark for multi-homograph pages.
+
+Builds one document with N `ldoceEntry` spans out of the recorded "market" page and compares the
+entry-scoped traversal of `IdocProcessor` with the former document-wide `//span[@class='Sense']`
+lookup, which made the cost grow with entries x document size.
+
+    python -m benchmarks.homographs [repeat]
+"""
+import sys
+
+from lxml import etree
+
+from dictionary_crawlers.services import longman
+
+from .common import load_fixture, measure
+
+HOMOGRAPHS = (1, 2, 5, 10)
+
+ENTRY = etree.XPath("//span[@class='ldoceEntry Entry']")
+DOCUMENT_SENSE = etree.XPath("//span[@class='Sense']")
+SUB_SENSE = etree.XPath("span[@class='Subsense']")
+
+LEGACY_SENSE_ITEMS = {
+    "header": longman.SubHeaderProcessor(),
+    "refs": longman.RefProcessor(),
+    "examples": longman.ExampleProcessor(),
+    "grammar_examples": longman.GrammarExampleProcessor(),
+    "collocation_examples": longman.CollocationExampleProcessor(),
+}
+
+
+def build_page(homographs: int):
+    """
+    :param homographs: number of entries in the page
+    :return: a parsed document holding `homographs` entries and the number of senses of each entry
+    """
+    template = etree.HTML(load_fixture('market'))
+    entries = ENTRY(template)
+    container = entries[0].getparent()
+
+    for entry in entries:
+        entry.getparent().remove(entry)
+
+    for idx in range(homographs):
+        entry = etree.fromstring(etree.tostring(entries[idx % len(entries)]))
+        entry.xpath(".//span[@class='HOMNUM']")[0].text = str(idx + 1)
+        container.append(entry)
+
+    return template, [len(entries[idx % len(entries)].xpath(".//span[@class='Sense']")) for idx in range(homographs)]
+
+
+def _legacy_sense(root):
+    definition = {}
+    for key, processor in LEGACY_SENSE_ITEMS.items():
+        processed_items = processor(root)
+        definition.update({key: processed_items}) if processed_items else None
+    return definition
+
+
+def legacy_process(root):
+    """
+    the former `IdocProcessor.process`: every entry re-searches the whole document for senses.
+    """
+    definitions = []
+    for html in ENTRY(root):
+        senses = []
+        for sense in DOCUMENT_SENSE(html):
+            sense_item = _legacy_sense(sense)
+            sub_senses = [_legacy_sense(sub_sense) for sub_sense in SUB_SENSE(sense)]
+            sense_item.update({'sub_senses': sub_senses}) if sub_senses else None
+            senses.append(sense_item)
+        definitions.append({'senses': senses})
+    return definitions
+
+
+def main(repeat=100):
+    print(f"{'entries':>8} {'legacy entries/sec':>20} {'scoped entries/sec':>20} {'speedup':>8}")
+
+    for homographs in HOMOGRAPHS:
+        root, expected = build_page(homographs)
+
+        definitions = longman.IdocProcessor(root).process()
+        senses = [len(definition.senses) for definition in definitions]
+        assert senses == expected, f"senses leaked between homographs: {senses} != {expected}"
+
+        before = measure(lambda: legacy_process(root), repeat=repeat) * homographs
+        after = measure(lambda: longman.IdocProcessor(root).process(), repeat=repeat) * homographs
+        print(f"{homographs:>8} {before:>20.1f} {after:>20.1f} {after / before:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Memory retained by the definitions of 10k crawled words, as slotted models and as nested dicts.
+
+Every word parses one of the fixture pages again, so no string is shared between words by accident, and
+keeps its definitions alive the way items pile up on a long crawl. The dicts are the JSON shape of the
+same definitions, rebuilt per word with fresh values and shared keys, as the processors built them before
+the models. Retained memory is measured with tracemalloc, it covers the python objects only.
+
+    python -m benchmarks.memory [words]
+"""
+import json
+import sys
+import tracemalloc
+
+from lxml import etree
+
+from dictionary_crawlers.models import to_primitive
+from dictionary_crawlers.services import LongManDefinitionService
+from dictionary_crawlers.spiders.longman import LongmanDictionarySpider
+
+from .common import load_fixture
+from .suite import FIXTURES
+
+XPATH = LongmanDictionarySpider.item_loader_xpath['definition']
+
+
+def shared_keys(value):
+    """
+    :param value: a JSON value
+    :return: the same value, its dict keys interned like the literal keys of the processors
+    """
+    if isinstance(value, dict):
+        return {sys.intern(key): shared_keys(sub_value) for key, sub_value in value.items()}
+    if isinstance(value, list):
+        return [shared_keys(sub_value) for sub_value in value]
+    return value
+
+
+def as_models(page):
+    root = etree.HTML(page)
+    return LongManDefinitionService().process(root.xpath(XPATH))
+
+
+def as_dicts(page):
+    return shared_keys(json.loads(json.dumps(to_primitive(as_models(page)))))
+
+
+def retained(build, pages, words):
+    """
+    :return: (retained bytes, peak bytes) once the definitions of every word are kept
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    kept = [build(pages[index % len(pages)]) for index in range(words)]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current - start, peak - start
+
+
+def main(words=10000):
+    pages = [load_fixture(fixture) for fixture in FIXTURES]
+    assert to_primitive(as_models(pages[1])) == as_dicts(pages[1]), "both shapes must hold the same definitions"
+
+    print(f"definitions of {words} words, fixtures: {', '.join(FIXTURES)}")
+    print(f"{'shape':>8} {'retained MiB':>14} {'peak MiB':>10} {'bytes/word':>12}")
+
+    results = {}
+    for name, build in (('dicts', as_dicts), ('models', as_models)):
+        size, peak = retained(build, pages, words)
+        results[name] = size
+        print(f"{name:>8} {size / 2 ** 20:>14.2f} {peak / 2 ** 20:>10.2f} {size / words:>12.0f}")
+
+    print(f"saved: {1 - results['models'] / results['dicts']:.0%}")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Header-only crawls, `-a fields=hwd,pos,british_pron,american_pron`, against crawls of every field.
+
+Two levels are timed on every fixture: the definition extraction of the already parsed page, where the projected
+walk stops at the head of each entry, and the whole `load_item` of a fresh response, page parsing included, where
+the family words and the corpus are not queried at all.
+
+    python -m benchmarks.projection [fields] [repeat]
+"""
+import sys
+
+from lxml import etree
+
+from dictionary_crawlers.projection import Projection
+from dictionary_crawlers.services import LongManDefinitionService
+from dictionary_crawlers.spiders.longman import LongmanDictionarySpider
+
+from .common import load_fixture, make_response, measure, report
+from .suite import FIXTURES
+
+HEADER_FIELDS = 'hwd,pos,british_pron,american_pron'
+XPATH = LongmanDictionarySpider.item_loader_xpath['definition']
+
+
+def spider(fields=None):
+    from scrapy.utils.project import get_project_settings
+
+    instance = LongmanDictionarySpider(fields=fields)
+    instance.settings = get_project_settings()
+    return instance
+
+
+def main(fields=HEADER_FIELDS, repeat=300):
+    pages = {fixture: load_fixture(fixture) for fixture in FIXTURES}
+    elements = {fixture: etree.HTML(page).xpath(XPATH) for fixture, page in pages.items()}
+    projection = Projection.parse(fields)
+
+    def extract(service):
+        return lambda: [service.process(entries) for entries in elements.values()]
+
+    report(
+        f"definition extraction, fields={fields}, {len(pages)} pages per call",
+        measure(extract(LongManDefinitionService()), repeat=repeat),
+        measure(extract(LongManDefinitionService(projection)), repeat=repeat),
+        unit='calls/sec',
+    )
+
+    def load(instance):
+        return lambda: [instance.load_item(make_response(page, word)) for word, page in pages.items()]
+
+    report(
+        f"load_item, fields={fields}, {len(pages)} pages per call",
+        measure(load(spider()), repeat=repeat // 3),
+        measure(load(spider(fields)), repeat=repeat // 3),
+        unit='calls/sec',
+    )
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Load throughput of `SQLiteExportPipeline` on a synthetic crawl, in rows per second.
+
+Every word of the dataset reuses the item of one of the fixture pages under its own word, so the rows are the ones a
+real crawl writes, audio urls aside: they are shared by the copies of a page. The "before" run commits every item on
+its own, the "after" run batches `SQLITE_EXPORT_BATCH_SIZE` items per transaction. Both include the index build.
+
+    python -m benchmarks.sqlite_export [words] [batch size]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from scrapy import Spider
+from scrapy.crawler import Crawler
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from dictionary_crawlers.pipelines import SQLiteExportPipeline
+from dictionary_crawlers.spiders.longman import LongmanDictionarySpider
+
+from .common import load_fixture, make_response
+from .suite import FIXTURES
+
+
+def fixture_items():
+    """
+    :return: the items of the fixture pages, as the export pipelines get them
+    """
+    spider = LongmanDictionarySpider()
+    spider.settings = Settings()
+    return [dict(spider.load_item(make_response(load_fixture(fixture), fixture))) for fixture in FIXTURES]
+
+
+def load(items, words, path, batch_size):
+    """
+    :return: (rows, seconds) of the load of `words` items, indexes included
+    """
+    stats = MemoryStatsCollector(Crawler(Spider, Settings()))
+    pipeline = SQLiteExportPipeline(stats, path, batch_size=batch_size)
+
+    started = time.perf_counter()
+    pipeline.open_spider(None)
+    for index in range(words):
+        pipeline.process_item({**items[index % len(items)], 'word': f'word-{index}'}, None)
+    pipeline.close_spider(None)
+    elapsed = time.perf_counter() - started
+
+    return stats.get_value('sqlite_export/rows'), elapsed
+
+
+def main(words=100000, batch_size=1000):
+    items = fixture_items()
+
+    with tempfile.TemporaryDirectory(prefix='sqlite-export-') as directory:
+        results = {}
+        for name, size in (('a transaction per item', 1), (f'{batch_size} items per transaction', batch_size)):
+            path = os.path.join(directory, f'{size}.sqlite')
+            rows, elapsed = load(items, words, path, size)
+            results[name] = rows / elapsed
+            print(f"{name}: {rows} rows of {words} words in {elapsed:.1f}s, "
+                  f"{os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+    before, after = results.values()
+    print(f"{'rows/sec':>10}")
+    for name, rate in results.items():
+        print(f"{rate:>10.0f}  {name}")
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Time to the definitions of a single word, `dictionary_crawlers.lookup` against `scrapy crawl longman -a word=...`.
+
+The fixture pages are served by a local keep-alive server, so the network is left out and only the start-up and
+the extraction are compared. Each cold run is a new python process, timed from its start to its exit; warm lookups
+reuse the process and the connection of the first one. Audio downloads are disabled for the crawl, as the lookup
+doesn't download them either.
+
+    python -m benchmarks.startup [--runs 5] [--word market]
+"""
+import argparse
+import http.server
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .common import FIXTURES_DIR
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PYTHON_START = "pass"
+LOOKUP = """
+import sys
+from dictionary_crawlers.lookup import Lookup
+assert Lookup(base_url=sys.argv[1])(sys.argv[2])['definition']
+"""
+CRAWL = """
+import sys
+from dictionary_crawlers.spiders.longman import LongmanDictionarySpider
+LongmanDictionarySpider.base_url = sys.argv[1]
+LongmanDictionarySpider.allowed_domains = []
+from scrapy.cmdline import execute
+execute(['scrapy', 'crawl', 'longman', '-a', f'word={sys.argv[2]}', *sys.argv[3:]])
+"""
+CRAWL_PIPELINES = (
+    '{"dictionary_crawlers.pipelines.ParsedFieldsPipeline": 50, '
+    '"dictionary_crawlers.pipelines.JsonLinesExportPipeline": 300}'
+)
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = os.path.join(FIXTURES_DIR, f"{self.path.rsplit('/', 1)[-1]}.html")
+        body = b''
+        if os.path.exists(path):
+            with open(path, 'rb') as fh:
+                body = fh.read()
+
+        self.send_response(200 if body else 404)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    """
+    :return: the server and the dictionary url of the fixtures
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/dictionary/'
+
+
+def cold(code, args, runs, directory):
+    """
+    :param code: python code run by `python -c`
+    :param args: its arguments
+    :param runs:
+    :param directory: working directory of the runs, `settings.py` writes its log file there
+    :return: wall-clock seconds of every run
+    """
+    env = {**os.environ, 'PYTHONPATH': PROJECT_DIR, 'SCRAPY_SETTINGS_MODULE': 'dictionary_crawlers.settings'}
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code, *args], cwd=directory, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def warm(url, word, runs):
+    """
+    :return: seconds of every lookup after the first one, in this process
+    """
+    from dictionary_crawlers.lookup import Lookup
+
+    lookup = Lookup(base_url=url)
+    lookup(word)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        lookup(word)
+        timings.append(time.perf_counter() - started)
+    lookup.close()
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="cold runs of every route")
+    parser.add_argument('--word', default='market', help="one of the fixtures")
+    args = parser.parse_args(argv)
+
+    server, url = serve()
+    try:
+        with tempfile.TemporaryDirectory(prefix='startup-') as directory:
+            crawl_args = [
+                url, args.word, '-s', 'LOG_LEVEL=ERROR', '-s', f'EXPORT_DIR={directory}/exports',
+                '-s', f'ITEM_PIPELINES={CRAWL_PIPELINES}',
+            ]
+            results = {
+                'python start-up': cold(PYTHON_START, [], args.runs, directory),
+                'lookup, cold': cold(LOOKUP, [url, args.word], args.runs, directory),
+                'lookup, warm': warm(url, args.word, args.runs * 20),
+                'scrapy crawl': cold(CRAWL, crawl_args, args.runs, directory),
+            }
+    finally:
+        server.shutdown()
+
+    print(f"time to the definitions of '{args.word}', local server")
+    print(f"{'route':<18} {'runs':>6} {'p50 ms':>10} {'min ms':>10} {'max ms':>10}")
+    for name, timings in results.items():
+        print(f"{name:<18} {len(timings):>6} {statistics.median(timings) * 1000:>10.1f} "
+              f"{min(timings) * 1000:>10.1f} {max(timings) * 1000:>10.1f}")
+
+    speedup = statistics.median(results['scrapy crawl']) / statistics.median(results['lookup, cold'])
+    print(f"lookup, cold is {speedup:.1f}x faster than scrapy crawl")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Offline parser benchmark suite.
+
+Every parser stage runs separately over every fixture page: `LongManFamilyWordProcessor`,
+`LongManDefinitionService` and `LongManCorpusService`. The Cambridge and Oxford definition services run
+over their own pages. The page is parsed beforehand, the way it is when the spider callback runs. The
+suite reports throughput and p50/p95/p99 latencies, then compares the p50 of each (stage, page) pair
+with `baseline.json`. It exits with status 1 when a pair is slower than the baseline by more than the
+tolerance.
+
+Stages run in several interleaved rounds and the fastest round is kept, which filters out most of
+the noise of shared machines. The p50s are also scaled by a fixed calibration workload. A baseline
+recorded on a faster or slower box then still compares fairly.
+
+A slow spell of the machine can still outlast the rounds of a stage. The pairs found slower are measured
+again, alone with the calibration workload so both see the same spell, and a pair is a regression only
+when every one of these `--confirm` runs finds it slower too.
+
+    python -m benchmarks.suite                     # compare with the stored baseline
+    python -m benchmarks.suite --update-baseline   # record a new baseline on this machine
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from lxml import etree
+
+from dictionary_crawlers.processors import LongManFamilyWordProcessor
+from dictionary_crawlers.services import (
+    CambridgeDefinitionService,
+    LongManCorpusService,
+    LongManDefinitionService,
+    OxfordDefinitionService,
+)
+from dictionary_crawlers.spiders.cambridge import CambridgeDictionarySpider
+from dictionary_crawlers.spiders.longman import LongmanDictionarySpider
+from dictionary_crawlers.spiders.oxford import OxfordDictionarySpider
+
+from .common import FIXTURES_DIR, load_fixture
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# short word, multi-homograph, phrasal verb and corpus-heavy pages
+FIXTURES = ('dog', 'market', 'bank', 'give-up', 'run')
+
+CALIBRATION = 'calibration'
+
+XPATH = LongmanDictionarySpider.item_loader_xpath
+
+
+def family_stage(root):
+    texts = [str(text) for text in root.xpath(XPATH['family_word'])]
+    return lambda: LongManFamilyWordProcessor()(texts)
+
+
+def definition_stage(root):
+    elements = root.xpath(XPATH['definition'])
+    return lambda: LongManDefinitionService().process(elements)
+
+
+def corpus_stage(root):
+    elements = root.xpath(XPATH['corpus'])
+    return lambda: LongManCorpusService().process(elements)
+
+
+STAGES = {
+    'family_word': family_stage,
+    'definition': definition_stage,
+    'corpus': corpus_stage,
+}
+
+
+def source_definition_stage(service_cls, spider_cls):
+    """
+    :param service_cls: the definition service of a dictionary
+    :param spider_cls: its spider, for the xpath of its entries
+    :return: a stage factory
+    """
+    xpath = spider_cls.item_loader_xpath['definition']
+
+    def stage(root):
+        elements = root.xpath(xpath)
+        return lambda: service_cls().process(elements)
+
+    return stage
+
+
+# pages of the other dictionaries, only their definitions are extracted
+SOURCE_FIXTURES = {
+    'cambridge-market': source_definition_stage(CambridgeDefinitionService, CambridgeDictionarySpider),
+    'oxford-market': source_definition_stage(OxfordDefinitionService, OxfordDictionarySpider),
+}
+
+
+def percentile(samples: list, pct: float):
+    """
+    :param samples: sorted samples
+    :param pct: in [0, 100]
+    :return: nearest-rank percentile
+    """
+    rank = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+def sample(call, repeat: int):
+    samples = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        started = clock()
+        call()
+        samples.append(clock() - started)
+    return samples
+
+
+def run_stage(call, repeat: int, warmup: int = 20):
+    """
+    :return: throughput (calls/sec) and latency percentiles in microseconds
+    """
+    for _ in range(warmup):
+        call()
+
+    samples = sorted(sample(call, repeat))
+
+    return {
+        'throughput': round(len(samples) / (sum(samples) / 1e9), 1),
+        'p50_us': round(percentile(samples, 50) / 1e3, 2),
+        'p95_us': round(percentile(samples, 95) / 1e3, 2),
+        'p99_us': round(percentile(samples, 99) / 1e3, 2),
+    }
+
+
+def calibration_stage():
+    """
+    a fixed parse-and-query workload, its p50 scales the baseline to the speed of this machine
+    """
+    page = load_fixture('market')
+    return lambda: etree.HTML(page).xpath("//span")
+
+
+def build_calls():
+    """
+    :return: the calibration workload and every stage, keyed by "stage/page"
+    """
+    calls = {CALIBRATION: calibration_stage()}
+    for fixture in FIXTURES:
+        root = etree.HTML(load_fixture(fixture))
+        for stage, factory in STAGES.items():
+            calls[f'{stage}/{fixture}'] = factory(root)
+    for fixture, factory in SOURCE_FIXTURES.items():
+        calls[f'definition/{fixture}'] = factory(etree.HTML(load_fixture(fixture)))
+    return calls
+
+
+def run(calls: dict, repeat: int, rounds: int):
+    """
+    :param calls: see `build_calls`
+    :return: the fastest round of every call
+    """
+    results = {}
+    for _ in range(rounds):
+        for name, call in calls.items():
+            result = run_stage(call, repeat)
+            if name not in results or result['p50_us'] < results[name]['p50_us']:
+                results[name] = result
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, scale: float = 1.0, min_delta_us: float = 0.0):
+    """
+    :param scale: current calibration / baseline calibration
+    :param min_delta_us: slowdowns below this many microseconds are timer noise, not regressions
+    :return: the (name, scaled baseline p50, current p50) of every regression
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]['p50_us'] * scale
+        current = result['p50_us']
+        if current > expected * (1 + tolerance) and current - expected > min_delta_us:
+            regressions.append((name, expected, current))
+    return regressions
+
+
+def confirm(calls: dict, regressions: list, baseline: dict, args):
+    """
+    measures the regressed pairs again, see the module.
+
+    :param calls: see `build_calls`
+    :param regressions: see `compare`
+    :param baseline: the stored baseline
+    :param args: the suite options
+    :return: the regressions found again by every confirmation run
+    """
+    for attempt in range(args.confirm):
+        if not regressions:
+            break
+        print(f"confirming {len(regressions)} regression(s), run {attempt + 1} of {args.confirm}")
+
+        names = [name for name, _, _ in regressions]
+        results = run({name: calls[name] for name in (CALIBRATION, *names)}, args.repeat, args.rounds)
+        scale = results.pop(CALIBRATION)['p50_us'] / baseline['calibration_us']
+        regressions = compare(results, baseline['results'], args.tolerance, scale, args.min_delta_us)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.4, help="allowed p50 slowdown, 0.4 means 40%%")
+    parser.add_argument('--min-delta-us', type=float, default=10.0, help="ignore smaller absolute slowdowns")
+    parser.add_argument('--confirm', type=int, default=3, help="runs which must find a regression again")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    calls = build_calls()
+    results = run(calls, args.repeat, args.rounds)
+    calibration = results.pop(CALIBRATION)['p50_us']
+
+    print(f"fixtures: {FIXTURES_DIR}, calibration: {calibration:.2f}us")
+    print(f"{'stage/page':<28} {'calls/sec':>12} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['throughput']:>12.1f} {result['p50_us']:>10.2f} "
+              f"{result['p95_us']:>10.2f} {result['p99_us']:>10.2f}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as fh:
+            json.dump({'calibration_us': calibration, 'results': results}, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --update-baseline first")
+        return 1
+
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    scale = calibration / baseline['calibration_us']
+    regressions = compare(results, baseline['results'], args.tolerance, scale, args.min_delta_us)
+    regressions = confirm(calls, regressions, baseline, args)
+
+    for name, expected, current in regressions:
+        print(f"REGRESSION {name}: p50 {expected:.2f}us -> {current:.2f}us "
+              f"(+{(current / expected - 1) * 100:.0f}%, tolerance {args.tolerance * 100:.0f}%)")
+
+    if regressions:
+        return 1
+
+    print("no regression against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
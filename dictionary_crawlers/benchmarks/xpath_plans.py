@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Compiled extraction plans vs. string xpath queries.
+
+The "before" run swaps every plan of the processors (`__PLAN__`, `__TEXT_PLAN__`, ...) and their
+`__SELECT__` for ones that call `element.xpath(<string>)`, so both runs share the same traversal code
+and only differ in how expressions are evaluated.
+
+    python -m benchmarks.xpath_plans [fixture] [repeat]
+"""
+import sys
+from unittest import mock
+
+from lxml import etree
+
+from dictionary_crawlers.services import longman
+from dictionary_crawlers.services.base import ExtractionPlan
+
+from .common import dictentries, load_fixture, measure, report
+
+PLANNED_PROCESSORS = (
+    longman.HeaderProcessor,
+    longman.SubHeaderProcessor,
+    longman.RefProcessor,
+    longman.ExampleProcessor,
+    longman.GrammarExampleProcessor,
+    longman.CollocationExampleProcessor,
+    longman.IdocProcessor,
+)
+
+
+def _interpreted(expression):
+    return lambda element: element.xpath(expression)
+
+
+def _interpreted_patches():
+    patches = []
+    for processor in PLANNED_PROCESSORS:
+        for name, plan in vars(processor).items():
+            if isinstance(plan, ExtractionPlan):
+                interpreted = {key: _interpreted(xpath) for key, xpath in plan.expressions.items()}
+                patches.append(mock.patch.object(processor, name, interpreted))
+        if hasattr(processor, '__SELECT__'):
+            patches.append(mock.patch.object(processor, '__SELECT__', staticmethod(_interpreted(processor.__XPATH__))))
+    return patches
+
+
+def parse_page(entries):
+    for entry in entries:
+        longman.IdocProcessor(etree.HTML(entry)).process()
+
+
+def main(fixture='market', repeat=300):
+    entries = dictentries(load_fixture(fixture))
+
+    patches = _interpreted_patches()
+    for patch in patches:
+        patch.start()
+    try:
+        before = measure(lambda: parse_page(entries), repeat=repeat)
+    finally:
+        for patch in patches:
+            patch.stop()
+
+    after = measure(lambda: parse_page(entries), repeat=repeat)
+
+    report(f"IdocProcessor on '{fixture}' ({len(entries)} dictentries)", before, after)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
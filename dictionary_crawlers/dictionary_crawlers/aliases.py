@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Inflected and variant forms (`markets`, `colors`...) lead to the page of another word, their canonical entry.
+Enable `ALIASES_ENABLED` to remember them in `ALIASES_DIR`, one store per spider: an alias is learned when the page
+of a word was reached through a redirect, or when the headword (`hwd`) of its first entry is another word. The item
+of the canonical word is kept along, and a later request of the alias reuses it instead of downloading and parsing
+the same page again. Resolved aliases are counted in the crawl stats (`aliases/hit`, `aliases/miss`).
+"""
+import json
+import time
+from logging import getLogger
+
+from .cache import SQLiteStore
+
+logger = getLogger(__name__)
+
+__all__ = ('AliasStore',)
+
+
+class AliasStore(SQLiteStore):
+    table = 'aliases'
+    schema = "alias TEXT PRIMARY KEY, canonical TEXT NOT NULL, via TEXT, updated REAL"
+    prefix = 'aliases'
+
+    def __init__(self, directory, stats=None):
+        """
+
+        :param directory: one directory per spider
+        :param stats:
+        """
+        super(AliasStore, self).__init__(directory, stats)
+        # the items of the canonical words, in their JSON shape
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS items (canonical TEXT PRIMARY KEY, payload TEXT, updated REAL)"
+        )
+
+    def learn(self, alias, canonical, via):
+        """
+        :param alias: a requested word
+        :param canonical: the word of the page it led to
+        :param via: "redirect" or "hwd"
+        :return:
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO aliases (alias, canonical, via, updated) VALUES (?, ?, ?, ?)",
+            (alias, canonical, via, time.time())
+        )
+        self.written()
+        self.inc_stat(f'learned/{via}')
+
+    def resolve(self, word):
+        """
+        :param word: a normalized word
+        :return: its canonical word when the word is an alias whose canonical item is stored, None otherwise
+        """
+        row = self.connection.execute(
+            "SELECT aliases.canonical FROM aliases JOIN items ON items.canonical = aliases.canonical "
+            "WHERE aliases.alias = ?", (word,)
+        ).fetchone()
+        self.record(row is not None)
+        return row[0] if row is not None else None
+
+    def has_item(self, canonical):
+        return self.connection.execute("SELECT 1 FROM items WHERE canonical = ?", (canonical,)).fetchone() is not None
+
+    def item(self, canonical):
+        """
+        :param canonical:
+        :return: the stored item of the canonical word, or None
+        """
+        row = self.connection.execute("SELECT payload FROM items WHERE canonical = ?", (canonical,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def store(self, canonical, item):
+        """
+        :param canonical:
+        :param item: the item of the canonical page, in its JSON shape
+        :return:
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO items (canonical, payload, updated) VALUES (?, ?, ?)",
+            (canonical, json.dumps(item, ensure_ascii=False), time.time())
+        )
+        self.written()
+        self.inc_stat('items_stored')
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM aliases").fetchone()[0]
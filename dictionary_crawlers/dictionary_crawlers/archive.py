@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+An archive of the raw crawled pages, so the extraction can run again offline, see `scrapy reparse`.
+
+Enable it with `ARCHIVE_ENABLED = True`, pages are appended to segments in `ARCHIVE_DIR`. As in WARC, every record
+is its own gzip member: a JSON header line (url, status, word, source spider, content type, fetch time) followed by
+the body, so a record is read with a single seek and a single decompression. A segment is closed once it holds
+`ARCHIVE_SEGMENT_MAX_BYTES` bytes, and gets its final name only then; its index (`<segment>.idx`) is written next
+to it: a header followed by fixed-size records, (word hash, offset, length) of every record in append order.
+A segment left as `.part` by a crash is still readable, its records are found by scanning it.
+"""
+import gzip
+import os
+import struct
+import time
+import zlib
+from logging import getLogger
+
+import ujson
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import TextResponse
+
+from .wordindex import CHUNK_SIZE, key_hash
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'ArchiveWriter',
+    'PageArchive',
+    'read_record',
+    'segment_spans',
+    'segments',
+)
+
+MAGIC = b'DCPA'
+VERSION = 1
+# magic, version, records
+HEADER = struct.Struct('<4sHQ')
+# word hash, record offset, record length
+RECORD = struct.Struct('<QQI')
+
+SEGMENT_EXTENSION = '.pages.gz'
+INDEX_EXTENSION = '.idx'
+
+
+def index_path(segment_path):
+    return segment_path + INDEX_EXTENSION
+
+
+def segments(directory):
+    """
+    :param directory: `ARCHIVE_DIR`
+    :return: paths of the segments, closed or left by a crash, in crawl order
+    """
+    return [
+        os.path.join(directory, name) for name in sorted(os.listdir(directory))
+        if name.endswith((SEGMENT_EXTENSION, SEGMENT_EXTENSION + '.part'))
+    ]
+
+
+def scan_segment(path):
+    """
+    :param path: a segment without index
+    :return: (offset, length) of every complete record
+    """
+    spans = []
+    with open(path, 'rb') as fh:
+        offset = 0
+        pending = b''
+        while True:
+            decompressor = zlib.decompressobj(wbits=31)
+            consumed = 0
+            while not decompressor.eof:
+                chunk = pending or fh.read(CHUNK_SIZE)
+                pending = b''
+                if not chunk:
+                    break
+                decompressor.decompress(chunk)
+                consumed += len(chunk) - len(decompressor.unused_data)
+                pending = decompressor.unused_data
+
+            if not decompressor.eof:
+                # end of the file, or a record cut by a crash
+                return spans
+
+            spans.append((offset, consumed))
+            offset += consumed
+
+
+def segment_spans(path):
+    """
+    :param path: a segment
+    :return: (offset, length) of its records, from its index when it has one
+    """
+    if not os.path.exists(index_path(path)):
+        return scan_segment(path)
+
+    with open(index_path(path), 'rb') as fh:
+        data = fh.read()
+    magic, version, size = HEADER.unpack_from(data, 0)
+    assert magic == MAGIC and version == VERSION, f"`{index_path(path)}` is not a page archive index!"
+    return [RECORD.unpack_from(data, HEADER.size + position * RECORD.size)[1:] for position in range(size)]
+
+
+def read_record(fh, offset, length):
+    """
+    :param fh: the segment, opened in binary mode
+    :param offset:
+    :param length:
+    :return: (header, body) of the record
+    """
+    fh.seek(offset)
+    data = gzip.decompress(fh.read(length))
+    header, _, body = data.partition(b'\n')
+    return ujson.loads(header), body
+
+
+class ArchiveWriter:
+
+    def __init__(self, directory, prefix, max_bytes=256 * 1024 * 1024, compress_level=6):
+        """
+
+        :param directory: where the segments are written
+        :param prefix: name of the segments, before their number
+        :param max_bytes: bytes (as written to disk) per segment
+        :param compress_level:
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+
+        os.makedirs(directory, exist_ok=True)
+        self.segment = None
+        self.segment_path = None
+        self.segment_index = 0
+        self.records = []
+        self.offset = 0
+
+    def write(self, header, body):
+        """
+        :param header: JSON-serializable description of the page
+        :param body: raw bytes of the page
+        :return: size of the record on disk
+        """
+        if self.segment is None:
+            self.open_segment()
+
+        data = gzip.compress(ujson.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n' + body,
+                             compresslevel=self.compress_level)
+        self.segment.write(data)
+        self.records.append((key_hash(header.get('word') or ''), self.offset, len(data)))
+        self.offset += len(data)
+
+        if self.offset >= self.max_bytes:
+            self.close_segment()
+        return len(data)
+
+    def open_segment(self):
+        self.segment_path = os.path.join(self.directory, f"{self.prefix}-{self.segment_index:05d}{SEGMENT_EXTENSION}")
+        self.segment = open(f"{self.segment_path}.part", 'wb')
+        self.segment_index += 1
+        self.records = []
+        self.offset = 0
+
+    def close_segment(self):
+        if self.segment is None:
+            return
+
+        self.segment.close()
+        temporary_path = index_path(self.segment_path) + '.part'
+        with open(temporary_path, 'wb') as fh:
+            fh.write(HEADER.pack(MAGIC, VERSION, len(self.records)))
+            for record in self.records:
+                fh.write(RECORD.pack(*record))
+        os.replace(temporary_path, index_path(self.segment_path))
+        os.replace(f"{self.segment_path}.part", self.segment_path)
+
+        logger.info(f"archived {len(self.records)} pages to {self.segment_path}")
+        self.segment = None
+
+    def close(self):
+        self.close_segment()
+
+
+class PageArchive:
+    """
+    Appends the pages of the crawled words to the archive, as they were downloaded (or answered by the recrawl
+    cache). Audio and other responses without a word are left out.
+    """
+
+    def __init__(self, stats, directory, max_bytes=256 * 1024 * 1024, compress_level=6):
+        """
+
+        :param stats: crawler stats collector
+        :param directory: `ARCHIVE_DIR`
+        :param max_bytes: bytes per segment
+        :param compress_level:
+        """
+        self.stats = stats
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ARCHIVE_ENABLED'):
+            raise NotConfigured
+
+        extension = cls(
+            crawler.stats,
+            settings.get('ARCHIVE_DIR', 'archive'),
+            max_bytes=settings.getint('ARCHIVE_SEGMENT_MAX_BYTES', 256 * 1024 * 1024),
+            compress_level=settings.getint('ARCHIVE_GZIP_LEVEL', 6),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.writer = ArchiveWriter(
+            self.directory, f"{spider.name}-{time.strftime('%Y%m%dT%H%M%S')}",
+            max_bytes=self.max_bytes, compress_level=self.compress_level,
+        )
+
+    def response_received(self, response, request, spider):
+        word = request.meta.get('word')
+        # an alias is answered without its page, see `ALIASES_ENABLED`
+        if not word or response.status != 200 or not isinstance(response, TextResponse) or 'alias' in response.flags:
+            return
+
+        header = {
+            'url': response.url,
+            'status': response.status,
+            'word': word,
+            # the spider whose extraction applies, the fan-out spider crawls the pages of the others
+            'source': request.meta.get('source') or spider.name,
+            'content_type': response.headers.get('Content-Type', b'').decode('latin-1'),
+            'fetched': time.time(),
+        }
+        size = self.writer.write(header, response.body)
+        self.stats.inc_value('archive/pages')
+        self.stats.inc_value('archive/bytes', size)
+        self.stats.inc_value('archive/raw_bytes', len(response.body))
+
+    def spider_closed(self, spider):
+        self.writer.close()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Persistent caches for weekly re-crawls, each stored in its own sqlite file under `RECRAWL_CACHE_DIR`.
+
+- `PageCache` keeps the validators (ETag/Last-Modified) and the compressed body of every page,
+  so unchanged pages are answered with a 304 and served from disk.
+- `ParseCache` maps a content hash of the `dictentry` html to the extracted definitions,
+  so unchanged entries skip `LongManDefinitionService` entirely.
+
+Both are LRU bounded: pages by their total compressed size, definitions by their count.
+
+- `LookupCache` is the disk tier of the lookup server, words and their items, or their absence until a TTL,
+  see `dictionary_crawlers.server`.
+
+- `AudioIndex` maps the audio urls, without their `?version=` query, to the files already stored,
+  it is never evicted, see `DictionaryFilePipeline`.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+from logging import getLogger
+
+from lxml import etree
+
+from .models import to_primitive
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'PageCache',
+    'ParseCache',
+    'LookupCache',
+    'AudioIndex',
+)
+
+
+class SQLiteStore:
+    """
+    A sqlite table in its own file, writes are committed in batches.
+    """
+    table = None
+    schema = None
+    prefix = None
+    commit_every = 100
+
+    def __init__(self, directory, stats=None):
+        """
+
+        :param directory: cache directory, every store keeps its own file in it
+        :param stats: crawler stats collector
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.stats = stats
+        self.connection = sqlite3.connect(os.path.join(directory, f'{self.table}.sqlite'))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({self.schema})")
+        self.pending = 0
+
+    def written(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.connection.commit()
+            self.pending = 0
+
+    def inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(f'{self.prefix}/{key}', count)
+
+    def record(self, hit):
+        """
+        :param hit: whether the lookup was answered from the cache
+        """
+        if self.stats is None:
+            return
+        self.inc_stat('hit' if hit else 'miss')
+        hits = self.stats.get_value(f'{self.prefix}/hit', 0)
+        misses = self.stats.get_value(f'{self.prefix}/miss', 0)
+        self.stats.set_value(f'{self.prefix}/hit_rate', round(hits / (hits + misses), 4))
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class LRUStore(SQLiteStore):
+    """
+    A store whose rows carry a `used` counter, the least recently used rows are evicted first.
+    """
+    evict_batch = 64
+
+    def __init__(self, directory, stats=None):
+        super(LRUStore, self).__init__(directory, stats)
+        self.connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_used ON {self.table} (used)")
+        self.clock = self.connection.execute(f"SELECT COALESCE(MAX(used), 0) FROM {self.table}").fetchone()[0]
+
+    def tick(self):
+        self.clock += 1
+        return self.clock
+
+    def evict(self, key_column, keep, count=None):
+        """
+        :param key_column:
+        :param keep: key of the row just written, it is never evicted
+        :param count: number of rows to evict, `evict_batch` by default
+        :return: number of evicted rows
+        """
+        evicted = self.connection.execute(
+            f"DELETE FROM {self.table} WHERE {key_column} IN "
+            f"(SELECT {key_column} FROM {self.table} WHERE {key_column} != ? ORDER BY used LIMIT ?)",
+            (keep, count or self.evict_batch)
+        ).rowcount
+        self.inc_stat('evicted', evicted)
+        return evicted
+
+
+class PageCache(LRUStore):
+    table = 'pages'
+    schema = "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, size INTEGER, used INTEGER"
+    prefix = 'recrawl_cache'
+
+    def __init__(self, directory, max_bytes, stats=None):
+        """
+
+        :param directory:
+        :param max_bytes: bound of the total compressed size of the stored pages
+        :param stats:
+        """
+        super(PageCache, self).__init__(directory, stats)
+        self.max_bytes = max_bytes
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def validators(self, url):
+        """
+        :param url:
+        :return: (etag, last_modified) or None when the page is not cached
+        """
+        return self.connection.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+
+    def body(self, url):
+        """
+        :param url:
+        :return: the stored body, or None when it was evicted meanwhile
+        """
+        row = self.connection.execute("SELECT body FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute("UPDATE pages SET used = ? WHERE url = ?", (self.tick(), url))
+        self.written()
+        return zlib.decompress(row[0])
+
+    def store(self, url, etag, last_modified, body):
+        """
+        :param url:
+        :param etag: ETag header value or None
+        :param last_modified: Last-Modified header value or None
+        :param body:
+        :return:
+        """
+        compressed = zlib.compress(body)
+        previous = self.connection.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, size, used) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, compressed, len(compressed), self.tick())
+        )
+        self.size += len(compressed) - (previous[0] if previous else 0)
+
+        # the stored page is kept, even alone above the bound
+        while self.size > self.max_bytes and self.evict('url', url):
+            self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+        self.written()
+        self.inc_stat('stored')
+
+
+class ParseCache(LRUStore):
+    table = 'definitions'
+    schema = "digest TEXT PRIMARY KEY, payload TEXT, used INTEGER"
+    prefix = 'parse_cache'
+
+    def __init__(self, directory, max_entries, stats=None):
+        """
+
+        :param directory:
+        :param max_entries: bound of the number of stored definitions
+        :param stats:
+        """
+        super(ParseCache, self).__init__(directory, stats)
+        self.max_entries = max_entries
+        self.count = self.connection.execute("SELECT COUNT(*) FROM definitions").fetchone()[0]
+
+    @staticmethod
+    def key(entries, projection=None, version=None):
+        """
+        :param entries: `dictentry` elements or their html
+        :param projection: the `Projection` the entries are extracted with, projected definitions are cached apart
+        :param version: the service and its version, e.g. "LongManDefinitionService/2", a parser fix makes new keys
+        :return: a digest of their content
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        if version is not None:
+            digest.update(f"{version}\n".encode('utf-8'))
+        if projection is not None:
+            digest.update(repr(projection).encode('utf-8'))
+        for entry in entries:
+            if not isinstance(entry, str):
+                # serialized the way `Selector.get()` does, elements and their html hash alike
+                entry = etree.tostring(entry, method='html', encoding='unicode', with_tail=False)
+            digest.update(entry.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, digest):
+        """
+        :param digest:
+        :return: the cached definitions, in their JSON shape, or None
+        """
+        row = self.connection.execute("SELECT payload FROM definitions WHERE digest = ?", (digest,)).fetchone()
+        self.record(row is not None)
+        if row is None:
+            return None
+
+        self.connection.execute("UPDATE definitions SET used = ? WHERE digest = ?", (self.tick(), digest))
+        self.written()
+        return json.loads(row[0])
+
+    def put(self, definitions, digest):
+        """
+        :param definitions: stored in their JSON shape
+        :param digest:
+        :return: the definitions, so `put` can be chained on a Deferred
+        """
+        exists = self.connection.execute("SELECT 1 FROM definitions WHERE digest = ?", (digest,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO definitions (digest, payload, used) VALUES (?, ?, ?)",
+            (digest, json.dumps(to_primitive(definitions)), self.tick())
+        )
+        self.count += 0 if exists else 1
+
+        if self.count > self.max_entries:
+            self.count -= self.evict('digest', digest, self.count - self.max_entries)
+
+        self.written()
+        return definitions
+
+
+class LookupCache(LRUStore):
+    table = 'lookups'
+    schema = "word TEXT PRIMARY KEY, payload TEXT, expires REAL, used INTEGER"
+    prefix = 'lookup_cache/disk'
+    # a server may be stopped at any time, and its writes are few
+    commit_every = 1
+
+    def __init__(self, directory, max_entries, stats=None):
+        """
+
+        :param directory:
+        :param max_entries: bound of the number of stored words
+        :param stats:
+        """
+        super(LookupCache, self).__init__(directory, stats)
+        self.max_entries = max_entries
+        self.count = self.connection.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+
+    def get(self, word, now):
+        """
+        :param word: normalized word
+        :param now: epoch seconds, expired entries are misses
+        :return: (item or None when the word doesn't exist, expiry or None), or None when the word is not cached
+        """
+        row = self.connection.execute("SELECT payload, expires FROM lookups WHERE word = ?", (word,)).fetchone()
+        if row is not None and row[1] is not None and row[1] <= now:
+            row = None
+        self.record(row is not None)
+        if row is None:
+            return None
+
+        self.connection.execute("UPDATE lookups SET used = ? WHERE word = ?", (self.tick(), word))
+        self.written()
+        return (None if row[0] is None else json.loads(row[0])), row[1]
+
+    def put(self, word, item, expires=None):
+        """
+        :param word: normalized word
+        :param item: the item in its JSON shape, None when the word doesn't exist
+        :param expires: epoch seconds, never when None
+        :return:
+        """
+        exists = self.connection.execute("SELECT 1 FROM lookups WHERE word = ?", (word,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO lookups (word, payload, expires, used) VALUES (?, ?, ?, ?)",
+            (word, None if item is None else json.dumps(item), expires, self.tick())
+        )
+        self.count += 0 if exists else 1
+
+        if self.count > self.max_entries:
+            self.count -= self.evict('word', word, self.count - self.max_entries)
+
+        self.written()
+
+
+class AudioIndex(SQLiteStore):
+    table = 'audio'
+    schema = "url TEXT PRIMARY KEY, path TEXT, checksum TEXT"
+
+    def get(self, url):
+        """
+        :param url: normalized url
+        :return: (path, checksum) of the stored file or None
+        """
+        return self.connection.execute("SELECT path, checksum FROM audio WHERE url = ?", (url,)).fetchone()
+
+    def add(self, url, path, checksum):
+        """
+        :param url: normalized url
+        :param path: path of the file in `FILES_STORE`
+        :param checksum:
+        :return:
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO audio (url, path, checksum) VALUES (?, ?, ?)", (url, path, checksum)
+        )
+        self.written()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Progress of a long crawl, word by word, so a restarted crawl skips the words already crawled.
+
+`CheckpointPipeline` marks the scraped words as done (or not found) once their items are exported, and the spider
+marks the failed ones, see the `word_failed` signal. Marks are buffered and written in batches of
+`CHECKPOINT_BATCH_SIZE`, or every `CHECKPOINT_FLUSH_SECONDS`; the spider flushes the export and then the marks on a
+timer too. A crash loses the marks of the last `CHECKPOINT_FLUSH_SECONDS` at most, and these words are crawled again.
+"""
+import time
+from logging import getLogger
+
+from .cache import SQLiteStore
+
+logger = getLogger(__name__)
+
+__all__ = ('ProgressStore',)
+
+
+class ProgressStore(SQLiteStore):
+    table = 'progress'
+    schema = "word TEXT PRIMARY KEY, status TEXT NOT NULL, attempts INTEGER NOT NULL, error TEXT, updated REAL"
+    prefix = 'checkpoint'
+    # words whose crawl is over, they are skipped on restart
+    COMPLETED = ('done', 'not_found')
+
+    def __init__(self, directory, batch_size=1000, flush_seconds=30.0, stats=None):
+        """
+
+        :param directory: one directory per spider
+        :param batch_size: marks buffered before a write
+        :param flush_seconds: buffered marks are written after this delay, whatever their number
+        :param stats:
+        """
+        super(ProgressStore, self).__init__(directory, stats)
+        self.connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_status ON {self.table} (status)")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        # word -> (status, error), the last mark of a word wins
+        self.buffer = {}
+        self.flushed = time.monotonic()
+
+    def mark(self, word, status, error=None):
+        """
+        :param word:
+        :param status: "done", "not_found" or "failed"
+        :param error: why the word failed
+        :return:
+        """
+        self.buffer[word] = (status, error)
+        self.inc_stat(f'marked/{status}')
+
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.flushed >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            now = time.time()
+            self.connection.executemany(
+                "INSERT INTO progress (word, status, attempts, error, updated) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT (word) DO UPDATE SET status = excluded.status, attempts = attempts + 1, "
+                "error = excluded.error, updated = excluded.updated",
+                ((word, status, error, now) for word, (status, error) in self.buffer.items()),
+            )
+            self.connection.commit()
+            self.inc_stat('batches')
+            self.buffer = {}
+        self.flushed = time.monotonic()
+
+    def completed(self, word):
+        """
+        :param word:
+        :return: True when the crawl of the word is over, in this crawl or a previous one
+        """
+        if word in self.buffer:
+            return self.buffer[word][0] in self.COMPLETED
+        row = self.connection.execute("SELECT status FROM progress WHERE word = ?", (word,)).fetchone()
+        return row is not None and row[0] in self.COMPLETED
+
+    def words(self, status):
+        """
+        :param status:
+        :return: the words whose last mark is `status`
+        """
+        self.flush()
+        return [word for word, in self.connection.execute("SELECT word FROM progress WHERE status = ?", (status,))]
+
+    def failures(self):
+        """
+        :return: (word, attempts, error) of the failed words
+        """
+        self.flush()
+        return self.connection.execute("SELECT word, attempts, error FROM progress WHERE status = 'failed'").fetchall()
+
+    def counts(self):
+        self.flush()
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM progress GROUP BY status"))
+
+    def close(self):
+        self.flush()
+        super(ProgressStore, self).close()
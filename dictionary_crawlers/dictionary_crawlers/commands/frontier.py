@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import time
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from ..frontier import open_frontier
+from ..wordlist import WordStream, read_wordlist
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return "[options] status | push <wordlist> ..."
+
+    def short_desc(self):
+        return "Report the progress of a shared frontier, or push word lists to it"
+
+    def long_desc(self):
+        return (
+            "status: queued, leased and completed words, and the throughput of every worker. "
+            "push: queue the words of the word lists which are not known yet."
+        )
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument("-u", "--url", help="frontier url (default: FRONTIER_URL)")
+        parser.add_argument("--window", type=float, default=60.0, help="seconds of the recent throughput")
+
+    def run(self, args, opts):
+        url = opts.url or self.settings.get('FRONTIER_URL')
+        if not url:
+            raise UsageError("no frontier, set `FRONTIER_URL` or use --url")
+        if not args or args[0] not in ('status', 'push') or (args[0] == 'push' and len(args) < 2):
+            raise UsageError()
+
+        frontier = open_frontier(url)
+        try:
+            if args[0] == 'push':
+                for path in args[1:]:
+                    print(f"{path}: {frontier.push(WordStream()(read_wordlist(path)))} new words")
+            else:
+                self.status(frontier, opts.window)
+        finally:
+            frontier.close()
+
+    @staticmethod
+    def status(frontier, window):
+        counts = frontier.counts()
+        print(f"queued {counts['queued']}, leased {counts['leased']}, completed {counts['completed']}")
+
+        now = time.time()
+        print(f"{'worker':<32} {'leased':>8} {'completed':>10} {'words/min':>10} {'recent':>9} {'idle s':>8}")
+        for worker, status in frontier.workers(window).items():
+            print(
+                f"{worker:<32} {status['leased']:>8} {status['completed']:>10} {status['per_min']:>10} "
+                f"{status['recent_per_min']:>9} {now - status['last_seen']:>8.0f}"
+            )
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import sys
+
+import ujson
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from ..wordindex import WordIndex, build_index
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return "[options] [word ...]"
+
+    def short_desc(self):
+        return "Index the exported shards, or look words up in them"
+
+    def long_desc(self):
+        return (
+            "Without words, index the shards of EXPORT_DIR which are not indexed yet. "
+            "With words, print their most recent items of a spider as JSON lines."
+        )
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument("-d", "--dir", dest="directory", help="shards directory (default: EXPORT_DIR)")
+        parser.add_argument("--spider", default='longman', help="look up the items of this spider (default: longman)")
+        parser.add_argument("--homnum", help="keep only the entries of this homnum")
+        parser.add_argument("--rebuild", action="store_true", help="index every shard again")
+
+    def run(self, args, opts):
+        directory = opts.directory or self.settings.get('EXPORT_DIR')
+        if not directory:
+            raise UsageError("no shards directory, set `EXPORT_DIR` or use --dir")
+
+        if not args:
+            for name, items in build_index(directory, rebuild=opts.rebuild).items():
+                print(f"{name}: {items} items")
+            return
+
+        index = WordIndex(directory, spider=opts.spider)
+        try:
+            for word in args:
+                item = index.get(word, homnum=opts.homnum)
+                if item is None:
+                    print(f"{word}: not found", file=sys.stderr)
+                    self.exitcode = 1
+                else:
+                    print(ujson.dumps(item, ensure_ascii=False))
+        finally:
+            index.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import time
+
+from scrapy import Spider
+from scrapy.commands import ScrapyCommand
+from scrapy.crawler import Crawler
+from scrapy.exceptions import UsageError
+from scrapy.statscollectors import MemoryStatsCollector
+
+from ..pipelines import JsonLinesExportPipeline
+from ..reparse import reparse
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {'LOG_LEVEL': 'INFO'}
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Extract the items of the archived pages again, without downloading them"
+
+    def long_desc(self):
+        return (
+            "Runs the extraction of the spiders over the pages of ARCHIVE_DIR, in parallel worker processes, "
+            "and exports the items as a crawl would, one set of shards per spider."
+        )
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument("-d", "--dir", dest="directory", help="archive directory (default: ARCHIVE_DIR)")
+        parser.add_argument("-o", "--output", help="shards directory (default: EXPORT_DIR)")
+        parser.add_argument("-j", "--workers", type=int, help="worker processes (default: number of cores)")
+        parser.add_argument("--source", action="append", help="parse only the pages of this spider (repeatable)")
+        parser.add_argument("--fields", help="comma separated fields to extract, as `-a fields=...` of a crawl")
+        parser.add_argument("--chunk-size", type=int, default=64, help="pages handed to a worker at once")
+
+    def run(self, args, opts):
+        if args:
+            raise UsageError()
+
+        directory = opts.directory or self.settings.get('ARCHIVE_DIR')
+        if not directory:
+            raise UsageError("no archive directory, set `ARCHIVE_DIR` or use --dir")
+        if opts.output:
+            self.settings.set('EXPORT_DIR', opts.output, priority='cmdline')
+
+        stats = MemoryStatsCollector(Crawler(Spider, self.settings))
+        spider_loader = self.crawler_process.spider_loader
+        exporters = {}
+        pages = 0
+
+        started = time.monotonic()
+        try:
+            for items, failed in reparse(directory, self.settings, sources=opts.source, workers=opts.workers,
+                                         chunk_size=opts.chunk_size, fields=opts.fields):
+                stats.inc_value('reparse/failed', failed)
+                for source, item in items:
+                    if source not in exporters:
+                        exporters[source] = JsonLinesExportPipeline.from_settings(self.settings, stats)
+                        exporters[source].open_spider(spider_loader.load(source))
+                    exporters[source].process_item(item, None)
+                    stats.inc_value(f'reparse/{source}/items')
+                    pages += 1
+        finally:
+            for exporter in exporters.values():
+                exporter.close_spider(None)
+
+        elapsed = time.monotonic() - started
+        print(f"{pages} pages parsed in {elapsed:.1f}s ({pages / max(elapsed, 1e-6):.1f} pages/sec), "
+              f"{stats.get_value('reparse/failed', 0)} failed")
+        for key, value in sorted(stats.get_stats().items()):
+            print(f"  {key}: {value}")
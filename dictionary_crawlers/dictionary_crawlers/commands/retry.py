@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import os
+
+from scrapy.commands import BaseRunSpiderCommand
+from scrapy.exceptions import UsageError
+
+from ..checkpoint import ProgressStore
+
+
+class Command(BaseRunSpiderCommand):
+    requires_project = True
+
+    def syntax(self):
+        return "[options] <spider>"
+
+    def short_desc(self):
+        return "Crawl again the words which failed in the checkpointed crawls of a spider"
+
+    def long_desc(self):
+        return (
+            "Runs the spider on the words marked as failed in CHECKPOINT_DIR/<spider>, their marks are updated. "
+            "--list prints them instead."
+        )
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument("--list", action="store_true", help="print the failed words and their last error")
+
+    def process_options(self, args, opts):
+        super(Command, self).process_options(args, opts)
+        self.settings.set('CHECKPOINT_ENABLED', True, priority='cmdline')
+
+    def run(self, args, opts):
+        if len(args) != 1:
+            raise UsageError()
+        name = args[0]
+
+        if opts.list:
+            store = ProgressStore(os.path.join(self.settings.get('CHECKPOINT_DIR'), name))
+            try:
+                for word, attempts, error in store.failures():
+                    print(f"{word}\t{attempts}\t{error}")
+            finally:
+                store.close()
+            return
+
+        crawl_defer = self.crawler_process.crawl(name, retry='1', **opts.spargs)
+
+        if getattr(crawl_defer, 'result', None) is not None and issubclass(crawl_defer.result.type, Exception):
+            self.exitcode = 1
+        else:
+            self.crawler_process.start()
+            if self.crawler_process.bootstrap_failed:
+                self.exitcode = 1
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import asyncio
+
+from scrapy.commands import ScrapyCommand
+
+from ..server import LookupServer
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Serve single word lookups over HTTP, with a memory and a disk cache"
+
+    def long_desc(self):
+        return (
+            "GET /words/<word> answers the item of the word, GET /metrics the cache hits and misses and the "
+            "latencies. See the LOOKUP_* settings."
+        )
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument("--host", help="address to listen on (default: LOOKUP_HOST)")
+        parser.add_argument("--port", type=int, help="port to listen on (default: LOOKUP_PORT)")
+
+    def run(self, args, opts):
+        server = LookupServer.from_settings(self.settings)
+        try:
+            asyncio.run(server.serve(
+                opts.host or self.settings.get('LOOKUP_HOST', '127.0.0.1'),
+                opts.port or self.settings.getint('LOOKUP_PORT', 8080),
+            ))
+        finally:
+            server.close()
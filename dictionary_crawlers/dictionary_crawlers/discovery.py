@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Discovery crawl: the words found on a crawled page (family words, crossref targets...) are scheduled too.
+
+Every scheduled word is recorded in a `VisitedSet`: a bloom filter answers most lookups from a bounded amount of
+memory and an exact sqlite table settles its "maybe" answers, so there are no false positives. The table lives in
+`JOBDIR` when the crawl is persisted, a resumed crawl goes on with the same visited words and budget.
+"""
+import hashlib
+import math
+from logging import getLogger
+
+from .cache import SQLiteStore
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'BloomFilter',
+    'VisitedSet',
+    'Discovery',
+)
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.001):
+        """
+
+        :param capacity: expected number of keys, more keys raise the false positive rate
+        :param error_rate: false positive rate at capacity
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class VisitedSet(SQLiteStore):
+    table = 'visited'
+    schema = "word TEXT PRIMARY KEY, depth INTEGER"
+    prefix = 'discovery'
+
+    def __init__(self, directory, capacity=1000000, error_rate=0.001, stats=None):
+        """
+
+        :param directory:
+        :param capacity: words the bloom filter is sized for
+        :param error_rate:
+        :param stats:
+        """
+        super(VisitedSet, self).__init__(directory, stats)
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.size = 0
+
+        # words of a resumed crawl
+        for word, in self.connection.execute("SELECT word FROM visited"):
+            self.bloom.add(word)
+            self.size += 1
+
+    def add(self, word, depth):
+        """
+        :param word: normalized word
+        :param depth:
+        :return: False when the word was already visited
+        """
+        if word in self.bloom:
+            if self.connection.execute("SELECT 1 FROM visited WHERE word = ?", (word,)).fetchone():
+                return False
+            self.inc_stat('bloom_false_positive')
+
+        self.connection.execute("INSERT INTO visited (word, depth) VALUES (?, ?)", (word, depth))
+        self.written()
+        self.bloom.add(word)
+        self.size += 1
+        return True
+
+    def __len__(self):
+        return self.size
+
+
+class Discovery:
+
+    def __init__(self, visited, budget=None, frequencies=None, stats=None):
+        """
+
+        :param visited: `VisitedSet`
+        :param budget: stop scheduling words once this many are scheduled, seeds included
+        :param frequencies: {word: rank}, frequent words are crawled first; otherwise shallow words are
+        :param stats:
+        """
+        self.visited = visited
+        self.budget = budget
+        self.frequencies = frequencies
+        self.stats = stats
+
+    @property
+    def exhausted(self):
+        return self.budget is not None and len(self.visited) >= self.budget
+
+    def priority(self, word, depth):
+        """
+        :return: scrapy request priority, higher is crawled first
+        """
+        if not self.frequencies:
+            return -depth
+
+        rank = self.frequencies.get(word)
+        # unknown words come after every ranked word, the shallow ones first
+        return -rank if rank is not None else -(len(self.frequencies) + depth)
+
+    def admit(self, word, depth):
+        """
+        :param word: normalized word
+        :param depth: link distance from the seeds
+        :return: the request priority of the word, or None when it must not be scheduled
+        """
+        if self.exhausted:
+            if self.stats is not None:
+                self.stats.inc_value('discovery/over_budget')
+            return None
+
+        if not self.visited.add(word, depth):
+            if self.stats is not None:
+                self.stats.inc_value('discovery/duplicate')
+            return None
+
+        if self.stats is not None:
+            self.stats.inc_value('discovery/scheduled')
+            self.stats.max_value('discovery/max_depth', depth)
+        return self.priority(word, depth)
+
+    def close(self):
+        self.visited.close()
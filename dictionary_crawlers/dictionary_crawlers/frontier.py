@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+A frontier of words shared by several crawl processes, see the `frontier` spider argument.
+
+Workers lease batches of words for `FRONTIER_LEASE_SECONDS`. A word which is not completed in time (the worker
+crashed or hangs) goes back to the queue and is leased again, so a word may be crawled twice but its completion is
+recorded once: the first completion wins, the later ones are ignored.
+
+Backends:
+
+- `SQLiteFrontier`, a single sqlite file (`sqlite:///path/frontier.db`, or just the path), for the workers of
+  one machine,
+- `RedisFrontier`, a Redis-compatible server (`redis://host:6379/0`), for workers on several machines. It needs
+  the `redis` package and a server running Lua scripts.
+"""
+import os
+import socket
+import sqlite3
+import time
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'Frontier',
+    'SQLiteFrontier',
+    'RedisFrontier',
+    'open_frontier',
+    'default_worker',
+)
+
+
+def default_worker():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def open_frontier(url):
+    """
+    :param url: `sqlite:///path`, `redis://...`, or the path of a sqlite file
+    :return: the frontier of the url's backend
+    """
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisFrontier(url)
+    if url.startswith('sqlite://'):
+        url = url[len('sqlite://'):]
+    return SQLiteFrontier(url)
+
+
+class Frontier:
+    """
+    The frontier interface, every method is safe to call from several processes at once.
+    """
+
+    def push(self, words):
+        """
+        :param words: normalized words, the already known ones are ignored
+        :return: number of queued words
+        """
+        raise NotImplementedError
+
+    def lease(self, worker, count, ttl):
+        """
+        re-queues the expired leases, then leases up to `count` queued words.
+
+        :param worker: worker name
+        :param count:
+        :param ttl: seconds before the lease expires
+        :return: the leased words
+        """
+        raise NotImplementedError
+
+    def complete(self, worker, words, status='done'):
+        """
+        :param worker: worker name
+        :param words: words crawled by the worker
+        :param status: e.g. "done", "not_found", "failed"
+        :return: the words whose completion was recorded by this call
+        """
+        raise NotImplementedError
+
+    def counts(self):
+        """
+        :return: {"queued": n, "leased": n, "completed": n}
+        """
+        raise NotImplementedError
+
+    def workers(self, window=60):
+        """
+        :param window: seconds of the recent throughput
+        :return: {worker: {"leased", "completed", "first_seen", "last_seen", "per_min", "recent_per_min"}}
+        """
+        raise NotImplementedError
+
+    @property
+    def drained(self):
+        counts = self.counts()
+        return counts['queued'] == 0 and counts['leased'] == 0
+
+    def close(self):
+        pass
+
+
+class SQLiteFrontier(Frontier):
+    schema = (
+        "CREATE TABLE IF NOT EXISTS words ("
+        " word TEXT PRIMARY KEY, state INTEGER NOT NULL, worker TEXT, lease_until REAL,"
+        " attempts INTEGER NOT NULL DEFAULT 0, status TEXT, completed_at REAL)",
+        "CREATE INDEX IF NOT EXISTS words_state ON words (state, lease_until)",
+        "CREATE INDEX IF NOT EXISTS words_completed ON words (worker, completed_at)",
+        "CREATE TABLE IF NOT EXISTS workers ("
+        " worker TEXT PRIMARY KEY, leased INTEGER NOT NULL DEFAULT 0, completed INTEGER NOT NULL DEFAULT 0,"
+        " first_seen REAL, last_seen REAL)",
+    )
+    QUEUED, LEASED, COMPLETED = 0, 1, 2
+
+    def __init__(self, path, timeout=30.0):
+        """
+
+        :param path: sqlite file, shared by the workers
+        :param timeout: seconds a worker waits for the lock of another one
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # autocommit, every change is an explicit transaction seen by the other workers right away
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.schema:
+            self.connection.execute(statement)
+
+    def transaction(self):
+        """
+        :return: a cursor holding the write lock until `COMMIT`
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        return cursor
+
+    def push(self, words, batch_size=10000):
+        queued = 0
+        batch = []
+
+        def flush():
+            cursor = self.transaction()
+            try:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO words (word, state) VALUES (?, ?)", ((word, self.QUEUED) for word in batch),
+                )
+                inserted = cursor.rowcount
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            return inserted
+
+        for word in words:
+            batch.append(word)
+            if len(batch) >= batch_size:
+                queued += flush()
+                batch = []
+        if batch:
+            queued += flush()
+
+        return queued
+
+    def lease(self, worker, count, ttl):
+        now = time.time()
+        cursor = self.transaction()
+        try:
+            cursor.execute(
+                "UPDATE words SET state = ?, worker = NULL WHERE state = ? AND lease_until < ?",
+                (self.QUEUED, self.LEASED, now),
+            )
+            if cursor.rowcount:
+                logger.info(f"re-queued {cursor.rowcount} words of expired leases")
+
+            words = [word for word, in cursor.execute(
+                "SELECT word FROM words WHERE state = ? ORDER BY rowid LIMIT ?", (self.QUEUED, count),
+            )]
+            cursor.executemany(
+                "UPDATE words SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 WHERE word = ?",
+                ((self.LEASED, worker, now + ttl, word) for word in words),
+            )
+            self._seen(cursor, worker, now, leased=len(words))
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+        return words
+
+    def complete(self, worker, words, status='done'):
+        now = time.time()
+        completed = []
+        cursor = self.transaction()
+        try:
+            for word in words:
+                # whoever holds the lease, the first completion is the one recorded
+                cursor.execute(
+                    "UPDATE words SET state = ?, worker = ?, status = ?, completed_at = ?, lease_until = NULL "
+                    "WHERE word = ? AND state != ?",
+                    (self.COMPLETED, worker, status, now, word, self.COMPLETED),
+                )
+                if cursor.rowcount:
+                    completed.append(word)
+            self._seen(cursor, worker, now, completed=len(completed))
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+        return completed
+
+    @staticmethod
+    def _seen(cursor, worker, now, leased=0, completed=0):
+        cursor.execute(
+            "INSERT INTO workers (worker, leased, completed, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (worker) DO UPDATE SET leased = leased + excluded.leased, "
+            "completed = completed + excluded.completed, last_seen = excluded.last_seen",
+            (worker, leased, completed, now, now),
+        )
+
+    def counts(self):
+        counts = dict(self.connection.execute("SELECT state, COUNT(*) FROM words GROUP BY state"))
+        return {
+            'queued': counts.get(self.QUEUED, 0),
+            'leased': counts.get(self.LEASED, 0),
+            'completed': counts.get(self.COMPLETED, 0),
+        }
+
+    def workers(self, window=60):
+        recent = dict(self.connection.execute(
+            "SELECT worker, COUNT(*) FROM words WHERE state = ? AND completed_at >= ? GROUP BY worker",
+            (self.COMPLETED, time.time() - window),
+        ))
+        workers = {}
+        for worker, leased, completed, first_seen, last_seen in self.connection.execute(
+                "SELECT worker, leased, completed, first_seen, last_seen FROM workers ORDER BY worker"):
+            workers[worker] = {
+                'leased': leased,
+                'completed': completed,
+                'first_seen': first_seen,
+                'last_seen': last_seen,
+                'per_min': round(completed * 60 / max(last_seen - first_seen, 1), 2),
+                'recent_per_min': round(recent.get(worker, 0) * 60 / window, 2),
+            }
+        return workers
+
+    def close(self):
+        self.connection.close()
+
+
+class RedisFrontier(Frontier):
+    """
+    Keys, under `prefix`: `queue` (list), `known` (set of pushed words), `leases` (sorted set by expiry),
+    `owners` (hash word -> worker), `completed` (hash word -> status), `workers` (set),
+    `worker:<name>` (hash of counters) and `recent:<name>` (sorted set of completion times).
+    """
+    LEASE = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+    for _, word in ipairs(expired) do
+        redis.call('ZREM', KEYS[2], word)
+        redis.call('HDEL', KEYS[3], word)
+        redis.call('RPUSH', KEYS[1], word)
+    end
+    local words = {}
+    for i = 1, tonumber(ARGV[2]) do
+        local word = redis.call('LPOP', KEYS[1])
+        if not word then break end
+        if redis.call('HEXISTS', KEYS[4], word) == 0 then
+            redis.call('ZADD', KEYS[2], ARGV[3], word)
+            redis.call('HSET', KEYS[3], word, ARGV[4])
+            table.insert(words, word)
+        end
+    end
+    return words
+    """
+    COMPLETE = """
+    local completed = {}
+    for i, word in ipairs(ARGV) do
+        if i > 3 and redis.call('HSETNX', KEYS[1], word, ARGV[2]) == 1 then
+            redis.call('ZREM', KEYS[2], word)
+            redis.call('HDEL', KEYS[3], word)
+            redis.call('ZADD', KEYS[4], ARGV[3], word)
+            table.insert(completed, word)
+        end
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', tonumber(ARGV[3]) - 3600)
+    return completed
+    """
+
+    def __init__(self, url, prefix='frontier'):
+        """
+
+        :param url: e.g. redis://localhost:6379/0
+        :param prefix: of every key, frontiers of different crawls use different prefixes
+        """
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("a redis frontier needs the `redis` package, `pip install redis`") from None
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._lease = self.client.register_script(self.LEASE)
+        self._complete = self.client.register_script(self.COMPLETE)
+
+    def key(self, *parts):
+        return ':'.join((self.prefix, *parts))
+
+    def push(self, words, batch_size=10000):
+        queued = 0
+        batch = []
+
+        def flush():
+            pipeline = self.client.pipeline()
+            for word in batch:
+                pipeline.sadd(self.key('known'), word)
+            added = [word for word, new in zip(batch, pipeline.execute()) if new]
+            if added:
+                self.client.rpush(self.key('queue'), *added)
+            return len(added)
+
+        for word in words:
+            batch.append(word)
+            if len(batch) >= batch_size:
+                queued += flush()
+                batch = []
+        if batch:
+            queued += flush()
+
+        return queued
+
+    def lease(self, worker, count, ttl):
+        now = time.time()
+        words = self._lease(
+            keys=[self.key('queue'), self.key('leases'), self.key('owners'), self.key('completed')],
+            args=[now, count, now + ttl, worker],
+        )
+        self._seen(worker, now, leased=len(words))
+        return words
+
+    def complete(self, worker, words, status='done'):
+        now = time.time()
+        words = list(words)
+        if not words:
+            return []
+
+        completed = self._complete(
+            keys=[self.key('completed'), self.key('leases'), self.key('owners'), self.key('recent', worker)],
+            args=[worker, status, now, *words],
+        )
+        self._seen(worker, now, completed=len(completed))
+        return completed
+
+    def _seen(self, worker, now, leased=0, completed=0):
+        key = self.key('worker', worker)
+        pipeline = self.client.pipeline()
+        pipeline.sadd(self.key('workers'), worker)
+        pipeline.hsetnx(key, 'first_seen', now)
+        pipeline.hset(key, 'last_seen', now)
+        pipeline.hincrby(key, 'leased', leased)
+        pipeline.hincrby(key, 'completed', completed)
+        pipeline.execute()
+
+    def counts(self):
+        pipeline = self.client.pipeline()
+        pipeline.llen(self.key('queue'))
+        pipeline.zcard(self.key('leases'))
+        pipeline.hlen(self.key('completed'))
+        queued, leased, completed = pipeline.execute()
+        return {'queued': queued, 'leased': leased, 'completed': completed}
+
+    def workers(self, window=60):
+        now = time.time()
+        workers = {}
+        for worker in sorted(self.client.smembers(self.key('workers'))):
+            counters = self.client.hgetall(self.key('worker', worker))
+            first_seen, last_seen = float(counters['first_seen']), float(counters['last_seen'])
+            completed = int(counters.get('completed', 0))
+            recent = self.client.zcount(self.key('recent', worker), now - window, '+inf')
+            workers[worker] = {
+                'leased': int(counters.get('leased', 0)),
+                'completed': completed,
+                'first_seen': first_seen,
+                'last_seen': last_seen,
+                'per_min': round(completed * 60 / max(last_seen - first_seen, 1), 2),
+                'recent_per_min': round(recent * 60 / window, 2),
+            }
+        return workers
+
+    def close(self):
+        self.client.close()
@@ -3,4 +3,7 @@
 # vim: ts=4: sw=4: et
 
 from .base import * # NOQA
-from .longman import * # NOQA
\ No newline at end of file
+from .longman import * # NOQA
+from .cambridge import * # NOQA
+from .oxford import * # NOQA
+from .dictionaries import * # NOQA
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Define here the models for your scraped items
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/items.html
+
+import scrapy
+
+from .. import processors
+from ..models import to_primitive
+
+
+class CambridgeItem(scrapy.Item):
+    word = scrapy.Field()
+    definition = scrapy.Field(
+        input_processor=processors.CambridgeDefinitionProcessor(),
+        parsed_element=True,
+        serializer=to_primitive,
+    )
+    audio_files = scrapy.Field()
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Define here the models for your scraped items
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/items.html
+
+import scrapy
+from itemadapter import ItemAdapter
+
+from ..models import to_primitive
+
+
+def source_to_primitive(item):
+    """
+    :param item: the item of a dictionary, or None when it did not answer
+    :return:
+    """
+    return None if item is None else to_primitive(ItemAdapter(item).asdict())
+
+
+class DictionariesItem(scrapy.Item):
+    """
+    The items of every dictionary for one word, see `DictionariesSpider`.
+    """
+    word = scrapy.Field()
+    # source -> "ok", "not_found", "timeout" or "error"
+    sources = scrapy.Field()
+    longman = scrapy.Field(serializer=source_to_primitive)
+    cambridge = scrapy.Field(serializer=source_to_primitive)
+    oxford = scrapy.Field(serializer=source_to_primitive)
+    audio_files = scrapy.Field()
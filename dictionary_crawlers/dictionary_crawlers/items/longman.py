@@ -11,6 +11,7 @@
 import scrapy
 
 from .. import processors
+from ..models import to_primitive
 
 
 class LongManItem(scrapy.Item):
@@ -21,5 +22,15 @@ class LongManItem(scrapy.Item):
         input_processor=processors.LongManFamilyWordProcessor()
     )
     definition = scrapy.Field(
-        input_processor=processors.LongManDefinitionProcessor()
+        input_processor=processors.LongManDefinitionProcessor(),
+        # the processor receives the parsed `dictentry` elements instead of re-parsing their html
+        parsed_element=True,
+        # `Entry` models, turned into their JSON shape by the feed exporters
+        serializer=to_primitive,
     )
+    corpus = scrapy.Field(
+        input_processor=processors.LongManCorpusProcessor(),
+        parsed_element=True,
+    )
+    # stored pronunciations and example audio, see `DictionaryFilePipeline`
+    audio_files = scrapy.Field()
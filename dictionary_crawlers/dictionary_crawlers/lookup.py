@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Single word lookups from python, without the crawl machinery.
+
+`scrapy crawl longman -a word=market` starts the reactor, the engine and every middleware, extension and pipeline
+before the first request. `lookup` fetches the page over a kept-alive connection and runs the same Longman
+extraction (`LONGMAN_ITEM_XPATH` and the processors of `LongManItem`) on it. Scrapy and twisted are never imported,
+and the extraction code is only imported by the first lookup:
+
+    from dictionary_crawlers.lookup import lookup
+    lookup('market')['definition']['1']['senses']
+
+The result has the JSON shape of an exported item, without the audio files, which are not downloaded.
+"""
+import gzip
+import http.client
+import threading
+from logging import getLogger
+from urllib.parse import urljoin, urlsplit
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'Lookup',
+    'lookup',
+)
+
+REDIRECTS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+def load_extractors():
+    """
+    :return: base url, {field: xpath}, {field: input processor} of the Longman pages
+    """
+    from .processors import LongManCorpusProcessor, LongManDefinitionProcessor, LongManFamilyWordProcessor
+    from .services.longman import LONGMAN_DICTIONARY_URL, LONGMAN_ITEM_XPATH
+
+    processors = {
+        'family_word': LongManFamilyWordProcessor(),
+        'definition': LongManDefinitionProcessor(),
+        'corpus': LongManCorpusProcessor(),
+    }
+    return LONGMAN_DICTIONARY_URL, LONGMAN_ITEM_XPATH, processors
+
+
+class Lookup:
+    """
+    Fetches and extracts Longman pages, one connection is kept open per host. Lookups of a `Lookup` are
+    serialized, use one instance per thread for concurrent lookups.
+    """
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, '
+                      'like Gecko) Chrome/85.0.4183.102 Safari/537.36',
+        'Accept-Encoding': 'gzip',
+    }
+
+    def __init__(self, base_url=None, timeout=10.0, corpus_max_examples=100, fields=None):
+        """
+
+        :param base_url: url the words are appended to, the Longman dictionary by default
+        :param timeout: seconds of a request
+        :param corpus_max_examples: corpus examples kept, as `CORPUS_MAX_EXAMPLES`
+        :param fields: comma separated fields to extract, as `-a fields=...` of the spiders, all of them when None
+        """
+        from .projection import Projection
+
+        self.base_url = base_url
+        self.timeout = timeout
+        self.projection = Projection.parse(fields)
+        self.context = {'corpus_max_examples': corpus_max_examples, 'projection': self.projection}
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.xpaths = None
+        self.processors = None
+
+    def connection(self, scheme, netloc):
+        if (scheme, netloc) not in self.connections:
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            self.connections[scheme, netloc] = cls(netloc, timeout=self.timeout)
+        return self.connections[scheme, netloc]
+
+    def request(self, url):
+        """
+        :param url:
+        :return: (status, response, body) of the url, reconnecting once when the kept-alive connection was closed
+        """
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+
+        for attempt in range(2):
+            connection = self.connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', path, headers=self.headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                connection.close()
+                if attempt:
+                    raise
+                continue
+
+            if response.getheader('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            return response.status, response, body
+
+    def fetch(self, url):
+        """
+        :param url:
+        :return: the body of the page, None when it doesn't exist
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response, body = self.request(url)
+            if status in REDIRECTS:
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            if status == 404:
+                return None
+            if status != 200:
+                raise http.client.HTTPException(f"{url} answered {status}")
+            return body
+
+        raise http.client.HTTPException(f"{url} redirects more than {MAX_REDIRECTS} times")
+
+    def extract(self, word, body):
+        """
+        :param word: the requested word
+        :param body: the html of its page
+        :return: the item of the page, as it is exported
+        """
+        from lxml import etree
+
+        from .models import to_primitive
+
+        root = etree.fromstring(body, etree.HTMLParser(encoding='utf-8'))
+        item = {}
+        if root is not None:
+            for field, xpath in self.xpaths.items():
+                if self.projection is not None and not self.projection.wants(field):
+                    continue
+                value = self.processors[field](root.xpath(xpath), loader_context=self.context)
+                # empty values are left out, as an item loader does
+                if value:
+                    item[field] = to_primitive(value)
+        item['word'] = word
+        return item
+
+    def __call__(self, word):
+        """
+        :param word: a raw word, e.g. "Street Market"
+        :return: the item of the word, None when the dictionary doesn't have it: its page is missing, or has none
+            of the fields of the projection (the definition without one), see `projection.found`
+        """
+        from .wordlist import normalize
+
+        word = normalize(word)
+        if not word:
+            return None
+
+        with self.lock:
+            if self.processors is None:
+                base_url, self.xpaths, self.processors = load_extractors()
+                self.base_url = self.base_url or base_url
+
+            body = self.fetch(self.base_url + word)
+
+        if body is None:
+            return None
+
+        from .projection import found
+
+        item = self.extract(word, body)
+        return item if found(item, self.projection) else None
+
+    def close(self):
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections = {}
+
+
+_default = None
+
+
+def lookup(word):
+    """
+    :param word: a raw word
+    :return: the item of the word from Longman, see `Lookup`
+    """
+    global _default
+    if _default is None:
+        _default = Lookup()
+    return _default(word)
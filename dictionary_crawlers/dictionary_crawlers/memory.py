@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Memory of long crawls: where it grows, and a soft ceiling on it.
+
+`MemoryMonitor`, enabled by `MEMORY_MONITOR_ENABLED`, traces the allocations with tracemalloc
+(`MEMORY_MONITOR_FRAMES` frames each) and takes a snapshot every `MEMORY_MONITOR_INTERVAL` seconds. A snapshot is
+compared with the previous one and with the one taken when the spider opened, and the growth is charged to the
+innermost frame of the project (`dictionary_crawlers/...`) in the traceback of every allocation, so an item kept by
+a pipeline is charged to the project line which created it rather than to scrapy. The trees of lxml are allocated
+by libxml2, out of sight of tracemalloc: they are counted instead, as live elements and the documents they keep
+alive, along with the item loaders, the requests, responses, items and selectors tracked by scrapy
+(`scrapy.utils.trackref`), and the queues of the engine and of the media pipelines. Every snapshot is written as a
+text report to `MEMORY_MONITOR_DIR/<spider>-<time>/`, its figures go to the crawl stats (`memory/*`). Tracing slows
+the crawl down, it is meant to find a leak, not to run on every crawl.
+
+`MemoryCeiling`, enabled by `MEMORY_SOFT_LIMIT_MB`, pauses the scheduling of new requests while the RSS of the
+process is above the limit: the requests in progress complete and their items go through the pipelines. Scheduling
+resumes once the RSS is back under `MEMORY_RESUME_RATIO` of the limit, or after `MEMORY_MAX_PAUSE` seconds, freed
+memory is not always handed back to the system.
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from logging import getLogger
+
+from lxml import etree
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.loader import ItemLoader
+from scrapy.utils.trackref import live_refs
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'rss',
+    'live_objects',
+    'attribute',
+    'growth',
+    'MemoryMonitor',
+    'MemoryCeiling',
+)
+
+MB = 2 ** 20
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(PACKAGE_DIR)
+# the allocations of the monitor itself, the snapshots included, are left out
+OWN_FILES = (tracemalloc.__file__, __file__)
+
+
+def rss():
+    """
+    :return: resident set size of the process in bytes, its peak where /proc is missing
+    """
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def live_objects():
+    """
+    :return: name -> live instances: lxml elements and their documents, item loaders, the objects tracked by scrapy
+    """
+    elements = 0
+    loaders = 0
+    # root id -> root, held until the end of the scan so an id is not reused
+    documents = {}
+    for obj in gc.get_objects():
+        if isinstance(obj, etree._Element):
+            elements += 1
+            root = obj.getroottree().getroot()
+            documents[id(root)] = root
+        elif isinstance(obj, ItemLoader):
+            loaders += 1
+
+    counts = {
+        'lxml_documents': len(documents),
+        'lxml_elements': elements,
+        'item_loaders': loaders,
+    }
+    counts.update(sorted((cls.__name__, len(refs)) for cls, refs in live_refs.items() if refs))
+    return counts
+
+
+def queues(crawler):
+    """
+    :param crawler:
+    :return: name -> size of the engine queues and of the buffers of the media pipelines
+    """
+    engine = crawler.engine
+    sizes = {}
+    if engine is None:
+        return sizes
+
+    if engine.slot is not None:
+        sizes['engine/inprogress'] = len(engine.slot.inprogress)
+        sizes['scheduler'] = len(engine.slot.scheduler)
+    sizes['downloader/active'] = len(engine.downloader.active)
+    if engine.scraper.slot is not None:
+        sizes['scraper/active'] = len(engine.scraper.slot.active)
+        sizes['scraper/itemproc'] = engine.scraper.slot.itemproc_size
+
+    for pipeline in engine.scraper.itemproc.middlewares:
+        name = type(pipeline).__name__
+        info = getattr(pipeline, 'spiderinfo', None)
+        if info is not None:
+            sizes[f'{name}/downloading'] = len(info.downloading)
+            sizes[f'{name}/downloaded'] = len(info.downloaded)
+            sizes[f'{name}/waiting'] = sum(len(waiting) for waiting in info.waiting.values())
+        if isinstance(getattr(pipeline, 'canonical_urls', None), dict):
+            sizes[f'{name}/canonical_urls'] = len(pipeline.canonical_urls)
+    return sizes
+
+
+def project_frame(traceback):
+    """
+    :param traceback: of an allocation, oldest frame first
+    :return: (module path, line) of its innermost frame in the project, None when it has none
+    """
+    for frame in reversed(traceback):
+        if frame.filename.startswith(PACKAGE_DIR):
+            return os.path.relpath(frame.filename, PROJECT_DIR), frame.lineno
+    return None
+
+
+def attribute(snapshot):
+    """
+    :param snapshot: a tracemalloc snapshot
+    :return: memory per project line, per project module and per line out of the project, as
+        {"path:line": [bytes, blocks]}
+    """
+    lines, modules, others = (defaultdict(lambda: [0, 0]) for _ in range(3))
+    # grouped once, comparing whole snapshots groups both of them again on every comparison
+    for statistic in snapshot.statistics('traceback'):
+        innermost = statistic.traceback[-1]
+        if innermost.filename in OWN_FILES:
+            continue
+
+        frame = project_frame(statistic.traceback)
+        if frame is None:
+            targets = (others[f"{innermost.filename}:{innermost.lineno}"],)
+        else:
+            targets = (lines[f"{frame[0]}:{frame[1]}"], modules[frame[0]])
+
+        for memory in targets:
+            memory[0] += statistic.size
+            memory[1] += statistic.count
+    return lines, modules, others
+
+
+def growth(now, before):
+    """
+    :param now: see `attribute`
+    :param before: the same, of an earlier snapshot
+    :return: the growth between them, in the same shape, unchanged keys left out
+    """
+    growths = []
+    for new, old in zip(now, before):
+        changes = {}
+        for key in new.keys() | old.keys():
+            size, blocks = new.get(key, (0, 0))
+            old_size, old_blocks = old.get(key, (0, 0))
+            if size != old_size or blocks != old_blocks:
+                changes[key] = [size - old_size, blocks - old_blocks]
+        growths.append(changes)
+    return tuple(growths)
+
+
+def largest(growths, top):
+    """
+    :param growths: see `growth`
+    :param top:
+    :return: the `top` largest growths, largest first
+    """
+    return sorted(growths.items(), key=lambda pair: pair[1][0], reverse=True)[:top]
+
+
+class MemoryMonitor:
+    """
+    Periodic tracemalloc snapshots and live object counts, reported to disk and to the stats.
+    """
+
+    def __init__(self, crawler, directory, interval=300.0, frames=16, top=20):
+        """
+
+        :param crawler:
+        :param directory: `MEMORY_MONITOR_DIR`
+        :param interval: seconds between two snapshots
+        :param frames: frames kept per allocation, deep enough to reach the project code through scrapy
+        :param top: lines per section of the reports
+        """
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.directory = directory
+        self.interval = interval
+        self.frames = frames
+        self.top = top
+
+        self.report_dir = None
+        self.task = None
+        self.started_tracing = False
+        self.started = None
+        self.snapshots = 0
+        # (attribution, live counts) when the spider opened, and of the previous snapshot
+        self.first = None
+        self.previous = None
+        self.max_rss = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('MEMORY_MONITOR_ENABLED'):
+            raise NotConfigured
+
+        extension = cls(
+            crawler,
+            settings.get('MEMORY_MONITOR_DIR', 'memory'),
+            interval=settings.getfloat('MEMORY_MONITOR_INTERVAL', 300.0),
+            frames=settings.getint('MEMORY_MONITOR_FRAMES', 16),
+            top=settings.getint('MEMORY_MONITOR_TOP', 20),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.report_dir = os.path.join(self.directory, f"{spider.name}-{time.strftime('%Y%m%dT%H%M%S')}")
+        os.makedirs(self.report_dir, exist_ok=True)
+
+        # already traced with `PYTHONTRACEMALLOC`, the tracing is left as it is
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+
+        self.started = time.monotonic()
+        self.first = self.previous = self.take()
+
+        if self.interval:
+            from twisted.internet import task
+
+            self.task = task.LoopingCall(self.snapshot, spider)
+            self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        self.snapshot(spider)
+
+        self.first = self.previous = None
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def take(self):
+        """
+        :return: (attribution, live counts) of now, see `attribute`
+        """
+        gc.collect()
+        counts = live_objects()
+        return attribute(tracemalloc.take_snapshot()), counts
+
+    def snapshot(self, spider):
+        """
+        takes a snapshot, writes its report and updates the stats.
+
+        :param spider:
+        :return:
+        """
+        started = time.monotonic()
+        attribution, counts = self.take()
+        previous, first = self.previous, self.first
+        self.previous = (attribution, counts)
+        self.snapshots += 1
+
+        current_rss = rss()
+        self.max_rss = max(self.max_rss, current_rss)
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        sizes = queues(self.crawler)
+
+        since_previous = growth(attribution, previous[0])
+        since_first = growth(attribution, first[0])
+
+        path = os.path.join(self.report_dir, f"snapshot-{self.snapshots:04d}.txt")
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(self.report(
+                current_rss, traced, traced_peak, counts, previous[1], first[1], sizes, since_previous, since_first
+            ))
+
+        self.stats.set_value('memory/snapshots', self.snapshots)
+        self.stats.set_value('memory/rss_mb', round(current_rss / MB, 1))
+        self.stats.set_value('memory/rss_max_mb', round(self.max_rss / MB, 1))
+        self.stats.set_value('memory/traced_mb', round(traced / MB, 1))
+        self.stats.set_value('memory/traced_peak_mb', round(traced_peak / MB, 1))
+        for name, count in counts.items():
+            self.stats.set_value(f'memory/live/{name}', count)
+        for name, size in sizes.items():
+            self.stats.set_value(f'memory/queue/{name}', size)
+        self.stats.set_value('memory/growth', {
+            line: size for line, (size, blocks) in largest(since_first[0], self.top) if size > 0
+        })
+
+        lines = largest(since_previous[0], 3)
+        spider.logger.info(
+            f"memory snapshot {self.snapshots}: rss {current_rss / MB:.1f} MiB, traced {traced / MB:.1f} MiB, "
+            f"{counts['lxml_documents']} lxml documents, growth "
+            + (', '.join(f"{line} {size / MB:+.2f} MiB" for line, (size, blocks) in lines) or 'none')
+            + f", report {path} in {time.monotonic() - started:.1f}s"
+        )
+
+    def report(self, current_rss, traced, traced_peak, counts, previous_counts, first_counts, sizes,
+               since_previous, since_first):
+        """
+        :return: the text report of a snapshot
+        """
+        out = [
+            f"snapshot {self.snapshots}, {time.strftime('%Y-%m-%d %H:%M:%S')}, "
+            f"{time.monotonic() - self.started:.0f}s into the crawl",
+            f"rss {current_rss / MB:.1f} MiB (max {self.max_rss / MB:.1f} MiB), "
+            f"traced {traced / MB:.1f} MiB (peak {traced_peak / MB:.1f} MiB)",
+            "",
+            f"{'live objects':<40} {'now':>10} {'previous':>10} {'start':>10}",
+        ]
+        for name, count in counts.items():
+            out.append(
+                f"{name:<40} {count:>10} {count - previous_counts.get(name, 0):>+10} "
+                f"{count - first_counts.get(name, 0):>+10}"
+            )
+
+        out += ["", f"{'queues':<40} {'size':>10}"]
+        out += [f"{name:<40} {size:>10}" for name, size in sizes.items()]
+
+        for title, (lines, modules, others) in (
+            ('since the previous snapshot', since_previous),
+            ('since the spider opened', since_first),
+        ):
+            for section, growths in (
+                ('by project module', modules),
+                ('by project line', lines),
+                ('out of the project, by innermost line', others),
+            ):
+                out += ["", f"growth {title}, {section}"]
+                out += [
+                    f"{size / 1024:>+12.1f} KiB {blocks:>+10} blocks  {name}"
+                    for name, (size, blocks) in largest(growths, self.top)
+                ]
+        return '\n'.join(out) + '\n'
+
+
+class MemoryCeiling:
+    """
+    Pauses the scheduling while the RSS is above `MEMORY_SOFT_LIMIT_MB`.
+    """
+
+    def __init__(self, crawler, limit, resume_ratio=0.9, max_pause=300.0, interval=5.0):
+        """
+
+        :param crawler:
+        :param limit: bytes
+        :param resume_ratio: scheduling resumes under this share of the limit
+        :param max_pause: seconds, scheduling resumes after them whatever the RSS
+        :param interval: seconds between two checks
+        """
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.limit = limit
+        self.resume_ratio = resume_ratio
+        self.max_pause = max_pause
+        self.interval = interval
+
+        self.task = None
+        self.paused_at = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        limit = settings.getfloat('MEMORY_SOFT_LIMIT_MB')
+        if not limit:
+            raise NotConfigured
+
+        extension = cls(
+            crawler,
+            limit * MB,
+            resume_ratio=settings.getfloat('MEMORY_RESUME_RATIO', 0.9),
+            max_pause=settings.getfloat('MEMORY_MAX_PAUSE', 300.0),
+            interval=settings.getfloat('MEMORY_CHECK_INTERVAL', 5.0),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        from twisted.internet import task
+
+        self.stats.set_value('memory/soft_limit_mb', round(self.limit / MB, 1))
+        self.task = task.LoopingCall(self.check)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        if self.paused_at is not None:
+            self.resume()
+
+    def check(self):
+        current_rss = rss()
+
+        if self.paused_at is None:
+            if current_rss > self.limit:
+                self.pause(current_rss)
+            return
+
+        paused = time.monotonic() - self.paused_at
+        if current_rss <= self.limit * self.resume_ratio:
+            logger.info(f"rss {current_rss / MB:.1f} MiB after {paused:.0f}s, scheduling resumed")
+            self.resume()
+        elif paused >= self.max_pause:
+            logger.warning(
+                f"rss still {current_rss / MB:.1f} MiB after {paused:.0f}s, scheduling resumed above the soft limit"
+            )
+            self.stats.inc_value('memory/pause_timeouts')
+            self.resume()
+
+    def pause(self, current_rss):
+        self.crawler.engine.pause()
+        self.paused_at = time.monotonic()
+        self.stats.inc_value('memory/pauses')
+        logger.warning(
+            f"rss {current_rss / MB:.1f} MiB above the soft limit of {self.limit / MB:.0f} MiB, scheduling paused "
+            f"until it is under {self.limit * self.resume_ratio / MB:.0f} MiB"
+        )
+        # the requests in progress and their items are still processed, the collection can release what they held
+        gc.collect()
+
+    def resume(self):
+        engine = self.crawler.engine
+        engine.unpause()
+        # the next requests are scheduled now rather than at the next heartbeat of the engine
+        if engine.slot is not None:
+            engine.slot.nextcall.schedule()
+
+        self.stats.inc_value('memory/paused_seconds', round(time.monotonic() - self.paused_at, 1))
+        self.paused_at = None
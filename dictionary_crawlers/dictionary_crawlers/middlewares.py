@@ -3,7 +3,14 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
+
 from scrapy import signals
+from scrapy.http import HtmlResponse
+from twisted.internet.error import TimeoutError
+
+from .cache import PageCache
+from .throttle import AdaptiveThrottle
 
 # useful for handling different item types with a single interface
 
@@ -60,11 +67,30 @@ class DictionaryCrawlersDownloaderMiddleware:
     # scrapy acts as if the downloader middleware does not modify the
     # passed objects.
 
+    def __init__(self, page_cache=None, throttle=None):
+        # validators and bodies of the previous crawls, see `RECRAWL_CACHE_ENABLED`
+        self.page_cache = page_cache
+        # per slot concurrency and delay, see `THROTTLE_ENABLED`
+        self.throttle = throttle
+
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
-        s = cls()
+        page_cache = None
+        if crawler.settings.getbool('RECRAWL_CACHE_ENABLED'):
+            page_cache = PageCache(
+                crawler.settings.get('RECRAWL_CACHE_DIR'),
+                max_bytes=crawler.settings.getint('RECRAWL_CACHE_MAX_BYTES'),
+                stats=crawler.stats,
+            )
+
+        throttle = None
+        if crawler.settings.getbool('THROTTLE_ENABLED'):
+            throttle = AdaptiveThrottle.from_crawler(crawler)
+
+        s = cls(page_cache, throttle)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_request(self, request, spider):
@@ -77,8 +103,39 @@ class DictionaryCrawlersDownloaderMiddleware:
         # - or return a Request object
         # - or raise IgnoreRequest: process_exception() methods of
         #   installed downloader middleware will be called
+        if request.meta.get('alias_of'):
+            # the spider reuses the item of the canonical word, see `ALIASES_ENABLED`
+            return HtmlResponse(url=request.url, body=b'', encoding='utf-8', request=request, flags=['alias'])
+
+        deadline = request.meta.get('deadline')
+        if deadline is not None:
+            # epoch seconds bounding every attempt of the request, its retries included
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                request.meta['dont_retry'] = True
+                raise TimeoutError(string=f"deadline of {request.url} passed")
+            request.meta['download_timeout'] = min(request.meta.get('download_timeout', remaining), remaining)
+
+        if not self.cacheable(request):
+            return None
+
+        validators = self.page_cache.validators(request.url)
+        if validators is not None:
+            etag, last_modified = validators
+            if etag:
+                request.headers.setdefault('If-None-Match', etag)
+            if last_modified:
+                request.headers.setdefault('If-Modified-Since', last_modified)
+
         return None
 
+    def cacheable(self, request):
+        """
+        :param request:
+        :return: whether the page cache handles the request, only the pages of a word are cached (not the audio)
+        """
+        return self.page_cache is not None and bool(request.meta.get('word')) and not request.meta.get('dont_cache')
+
     def process_response(self, request, response, spider):
         # Called with the response returned from the downloader.
 
@@ -86,6 +143,41 @@ class DictionaryCrawlersDownloaderMiddleware:
         # - return a Response object
         # - return a Request object
         # - or raise IgnoreRequest
+        if 'alias' in response.flags:
+            return response
+
+        if self.throttle is not None:
+            self.throttle.observe_response(request, response)
+
+        if not self.cacheable(request):
+            return response
+
+        if response.status == 304:
+            body = self.page_cache.body(request.url)
+            self.page_cache.record(body is not None)
+            if body is None:
+                # evicted since the conditional request was sent, fetch it again
+                request.headers.pop('If-None-Match', None)
+                request.headers.pop('If-Modified-Since', None)
+                return request.replace(dont_filter=True, meta={**request.meta, 'dont_cache': True})
+
+            return HtmlResponse(
+                url=response.url, status=200, headers=response.headers, body=body,
+                request=request, flags=response.flags + ['recrawl_cache'],
+            )
+
+        if response.status == 200:
+            self.page_cache.record(False)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self.page_cache.store(
+                    request.url,
+                    etag.decode('latin-1') if etag else None,
+                    last_modified.decode('latin-1') if last_modified else None,
+                    response.body,
+                )
+
         return response
 
     def process_exception(self, request, exception, spider):
@@ -96,7 +188,12 @@ class DictionaryCrawlersDownloaderMiddleware:
         # - return None: continue processing this exception
         # - return a Response object: stops process_exception() chain
         # - return a Request object: stops process_exception() chain
-        pass
+        if self.throttle is not None:
+            self.throttle.observe_exception(request, exception)
 
     def spider_opened(self, spider):
         spider.logger.info('Spider opened: %s' % spider.name)
+
+    def spider_closed(self, spider):
+        if self.page_cache is not None:
+            self.page_cache.close()
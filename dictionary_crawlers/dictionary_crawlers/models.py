@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Compact models of the parsed definitions.
+
+Entries, senses and examples are slotted objects instead of nested dicts: the keys are not repeated in every
+object, small repeated values (`[countable]`, ` noun`, sense numbers...) are interned, and audio urls keep an
+id of their shared prefix plus their own suffix. `to_primitive` turns them back into the usual JSON shape,
+the export pipelines call it right before encoding an item.
+"""
+import sys
+
+__all__ = (
+    'Audio',
+    'CrossRef',
+    'Example',
+    'GrammarExample',
+    'Sense',
+    'Entry',
+    'to_primitive',
+)
+
+# audio url prefix <-> id, shared by every audio of the process
+AUDIO_PREFIX_IDS = {}
+AUDIO_PREFIXES = []
+
+
+def to_primitive(value):
+    """
+    :param value: a model, or dicts, lists and tuples holding models
+    :return: the same value made of dicts, lists and strings only
+    """
+    if isinstance(value, (Model, Audio)):
+        return value.to_primitive()
+    if isinstance(value, dict):
+        return {key: to_primitive(sub_value) for key, sub_value in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_primitive(sub_value) for sub_value in value]
+    return value
+
+
+class Audio:
+    __slots__ = ('prefix', 'suffix')
+
+    def __init__(self, url):
+        """
+
+        :param url: e.g. https://www.ldoceonline.com/media/english/exaProns/p008-001623339.mp3?version=1.2.14
+        """
+        head, separator, self.suffix = url.rpartition('/')
+        prefix = head + separator
+
+        if prefix not in AUDIO_PREFIX_IDS:
+            AUDIO_PREFIX_IDS[prefix] = len(AUDIO_PREFIXES)
+            AUDIO_PREFIXES.append(sys.intern(prefix))
+
+        self.prefix = AUDIO_PREFIX_IDS[prefix]
+
+    @property
+    def url(self):
+        return AUDIO_PREFIXES[self.prefix] + self.suffix
+
+    def to_primitive(self):
+        return self.url
+
+    def __reduce__(self):
+        # prefix ids are per process, the url is split again on the other side
+        return Audio, (self.url,)
+
+    def __eq__(self, other):
+        return isinstance(other, Audio) and self.url == other.url
+
+    def __repr__(self):
+        return f"Audio({self.url!r})"
+
+
+def interned(value):
+    """
+    :param value: a small, often repeated string or None
+    :return:
+    """
+    # `str()` also turns lxml smart strings into plain ones, they can't be interned
+    return None if value is None else sys.intern(str(value))
+
+
+def as_audio(value):
+    """
+    :param value: an audio url, an `Audio` or None
+    :return:
+    """
+    return Audio(value) if value is not None and not isinstance(value, Audio) else value
+
+
+class Model:
+    """
+    Every slot is a constructor argument, in the order of `__slots__`.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_primitive(cls, primitive: dict):
+        """
+        :param primitive: the output of `to_primitive`
+        :return:
+        """
+        return cls(**primitive)
+
+    def to_primitive(self):
+        raise NotImplementedError
+
+    def __reduce__(self):
+        # strings are interned again when unpickled, e.g. coming back from a process pool
+        return self.__class__, tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_primitive()!r})"
+
+
+class CrossRef(Model):
+    __slots__ = ('example', 'link')
+
+    def __init__(self, example=None, link=None):
+        self.example = example
+        self.link = link
+
+    def to_primitive(self):
+        return {'example': self.example, 'link': self.link}
+
+
+class Example(Model):
+    __slots__ = ('example', 'audio')
+
+    def __init__(self, example=None, audio=None):
+        self.example = example
+        self.audio = as_audio(audio)
+
+    def to_primitive(self):
+        return {'example': self.example, 'audio': to_primitive(self.audio)}
+
+
+class GrammarExample(Model):
+    __slots__ = ('example', 'audio', 'text')
+
+    def __init__(self, example=None, audio=None, text=None):
+        self.example = example
+        self.audio = as_audio(audio)
+        self.text = text
+
+    def to_primitive(self):
+        return {'example': self.example, 'audio': to_primitive(self.audio), 'text': self.text}
+
+
+class Sense(Model):
+    __HEADER__ = ('number', 'active', 'geo', 'syn', 'main_def', 'sign_post', 'gram', 'field')
+    # item key -> model
+    __ITEMS__ = {
+        'refs': CrossRef,
+        'examples': Example,
+        'grammar_examples': GrammarExample,
+        'collocation_examples': Example,
+    }
+    __slots__ = __HEADER__ + tuple(__ITEMS__) + ('sub_senses',)
+
+    def __init__(self, number=None, active=None, geo=None, syn=None, main_def=None, sign_post=None, gram=None,
+                 field=None, refs=None, examples=None, grammar_examples=None, collocation_examples=None,
+                 sub_senses=None):
+        self.number = interned(number)
+        self.active = interned(active)
+        self.geo = interned(geo)
+        self.syn = syn
+        self.main_def = main_def
+        self.sign_post = interned(sign_post)
+        self.gram = interned(gram)
+        self.field = interned(field)
+        # tuples, a list over-allocates
+        self.refs = tuple(refs) if refs else None
+        self.examples = tuple(examples) if examples else None
+        self.grammar_examples = tuple(grammar_examples) if grammar_examples else None
+        self.collocation_examples = tuple(collocation_examples) if collocation_examples else None
+        self.sub_senses = tuple(sub_senses) if sub_senses else None
+
+    @classmethod
+    def from_primitive(cls, primitive: dict):
+        fields = dict(primitive.get('header', {}))
+        for key, model in cls.__ITEMS__.items():
+            if primitive.get(key):
+                fields[key] = [model.from_primitive(item) for item in primitive[key]]
+        if primitive.get('sub_senses'):
+            fields['sub_senses'] = [cls.from_primitive(sub_sense) for sub_sense in primitive['sub_senses']]
+        return cls(**fields)
+
+    def to_primitive(self):
+        definition = {}
+        header = {name: getattr(self, name) for name in self.__HEADER__ if getattr(self, name) is not None}
+        definition.update({'header': header}) if header else None
+        for name in self.__ITEMS__:
+            value = getattr(self, name)
+            definition.update({name: [item.to_primitive() for item in value]}) if value else None
+        if self.sub_senses:
+            definition['sub_senses'] = [sub_sense.to_primitive() for sub_sense in self.sub_senses]
+        return definition
+
+
+class Entry(Model):
+    __HEADER__ = ('hwd', 'hyphenation', 'homnum', 'pos', 'british_pron', 'american_pron')
+    __slots__ = __HEADER__ + ('senses',)
+
+    def __init__(self, hwd=None, hyphenation=None, homnum=None, pos=None, british_pron=None, american_pron=None,
+                 senses=()):
+        self.hwd = hwd
+        self.hyphenation = hyphenation
+        self.homnum = interned(homnum)
+        self.pos = interned(pos)
+        self.british_pron = as_audio(british_pron)
+        self.american_pron = as_audio(american_pron)
+        self.senses = tuple(senses)
+
+    @classmethod
+    def from_primitive(cls, primitive: dict):
+        fields = {name: primitive[name] for name in cls.__HEADER__ if name in primitive}
+        return cls(**fields, senses=[Sense.from_primitive(sense) for sense in primitive.get('senses', ())])
+
+    def to_primitive(self):
+        entry = {
+            name: to_primitive(getattr(self, name)) for name in self.__HEADER__ if getattr(self, name) is not None
+        }
+        entry['senses'] = [sense.to_primitive() for sense in self.senses]
+        return entry
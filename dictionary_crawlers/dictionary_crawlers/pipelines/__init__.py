@@ -3,4 +3,7 @@
 # vim: ts=4: sw=4: et
 
 from .base import *  # NOQA
+from .checkpoint import *  # NOQA
+from .export import *  # NOQA
 from .file import *  # NOQA
+from .sqlite import *  # NOQA
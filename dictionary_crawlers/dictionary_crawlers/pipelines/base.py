@@ -11,21 +11,53 @@
 # useful for handling different item types with a single interface
 from logging import getLogger
 
+import scrapy
+from twisted.internet.defer import Deferred, DeferredList
+
+from ..timing import timed
+
 logger = getLogger(__name__)
 
+__all__ = (
+    'ParsedFieldsPipeline',
+)
+
 
-class DictionaryCrawlersPipeline:
+class ParsedFieldsPipeline:
+    """
+    Waits for the fields whose extraction runs in the parse pool, see `dictionary_crawlers.pool`,
+    and puts their results in the item, or in the source items of a `DictionariesItem`.
+    """
+
+    @staticmethod
+    def pending_fields(item):
+        """
+        :param item:
+        :return: (item, key, Deferred) of the item and of the items it holds
+        """
+        for key, value in item.items():
+            if isinstance(value, Deferred):
+                yield item, key, value
+            elif isinstance(value, scrapy.Item):
+                yield from ParsedFieldsPipeline.pending_fields(value)
+
+    @timed('pipeline/parsed_fields')
     def process_item(self, item, spider):
         """
         :param item:
         :param spider:
-        :return:
+        :return: the item, or a Deferred firing with it once every pending field is extracted
         """
-        # logger.debug("******************* PIPELINE *******************")
-        # logger.debug("************************************************")
-        # for key, value in item.items():
-        #     logger.debug(f"key: {key}, value {value}")
-        # logger.debug("************************************************")
-        # logger.debug("************************************************")
-
-        return item
+        pending = list(self.pending_fields(item))
+
+        if not pending:
+            return item
+
+        def fill(results):
+            for (container, key, _), (_, value) in zip(pending, results):
+                container[key] = value
+            return item
+
+        deferred = DeferredList([value for _, _, value in pending], fireOnOneErrback=True, consumeErrors=True)
+        deferred.addCallbacks(fill, lambda failure: failure.value.subFailure)
+        return deferred
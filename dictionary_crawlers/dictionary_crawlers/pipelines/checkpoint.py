@@ -0,0 +1,64 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+from logging import getLogger
+
+from scrapy.exceptions import NotConfigured
+
+from ..signals import items_exported, word_failed
+from ..timing import timed
+
+logger = getLogger(__name__)
+
+__all__ = ('CheckpointPipeline',)
+
+
+class CheckpointPipeline:
+    """
+    Marks the words of the scraped items as done, or not found when they have no definition, and the failed
+    words as failed, in the progress store of the spider (see `dictionary_crawlers.checkpoint`). An item can stand
+    for a failed word as well, see `BaseSpider.failed`.
+
+    With the JSON lines export, a word is marked once its item is on disk, see `items_exported`; a crash never marks
+    a word whose item was lost. Without it, a word is marked once its item went through the pipelines.
+    """
+
+    def __init__(self, crawler):
+        if not crawler.settings.getbool('CHECKPOINT_ENABLED'):
+            raise NotConfigured("`CHECKPOINT_ENABLED` is not set")
+        crawler.signals.connect(self.word_failed, signal=word_failed)
+        crawler.signals.connect(self.items_exported, signal=items_exported)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    @timed('pipeline/checkpoint')
+    def process_item(self, item, spider):
+        """
+        :param item:
+        :param spider:
+        :return:
+        """
+        if spider.exporter is None:
+            self.mark(item, spider)
+        return item
+
+    def items_exported(self, items, spider):
+        for item in items:
+            self.mark(item, spider)
+
+    def mark(self, item, spider):
+        if spider.checkpoint is None or not item.get('word'):
+            return
+
+        error = spider.failed(item)
+        if error:
+            spider.checkpoint.mark(item['word'], 'failed', error=error)
+        else:
+            spider.checkpoint.mark(item['word'], 'done' if spider.found(item) else 'not_found')
+
+    def word_failed(self, word, failure, spider):
+        if spider.checkpoint is not None:
+            spider.checkpoint.mark(word, 'failed', error=repr(failure.value))
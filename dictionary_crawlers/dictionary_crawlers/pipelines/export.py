@@ -0,0 +1,285 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Streams the items to JSON lines shards in `EXPORT_DIR`, see `settings.py` for the other `EXPORT_*` settings.
+
+Items are turned into their JSON shape (`to_primitive`), encoded with `ujson` and written in batches.
+A shard is closed once it holds `EXPORT_SHARD_MAX_ITEMS` items or `EXPORT_SHARD_MAX_BYTES` bytes, and gets its final
+name only then, so a `.part` file is never complete. With `EXPORT_GZIP` every batch is written as its own gzip member,
+a shard is a valid gzip file at any batch boundary.
+
+A batch is synced to disk before `items_exported` is sent for its items, the checkpoint and the frontier mark their
+words then. A `.part` shard is locked while it is written, the ones left by a crashed crawl of the spider are cut
+after their last complete batch and renamed to their final name when the next crawl opens.
+"""
+import gzip
+import os
+import time
+import zlib
+from logging import getLogger
+
+import ujson
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+
+from ..models import to_primitive
+from ..signals import items_exported
+from ..timing import timed
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover, not on Windows
+    fcntl = None
+
+logger = getLogger(__name__)
+
+__all__ = ('JsonLinesExportPipeline',)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def try_lock(fh):
+    """
+    :param fh: an open file
+    :return: False when another process holds the lock of the file
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def complete_size(fh, compress):
+    """
+    :param fh: a shard open for reading
+    :param compress: whether its batches are gzip members
+    :return: the size of its complete batches, a crash may have cut the last one
+    """
+    if not compress:
+        # a batch ends with the end of its last line
+        end = fh.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - CHUNK_SIZE)
+            fh.seek(start)
+            index = fh.read(end - start).rfind(b'\n')
+            if index >= 0:
+                return start + index + 1
+            end = start
+        return 0
+
+    fh.seek(0)
+    size = offset = 0
+    decompressor = zlib.decompressobj(wbits=31)
+    for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+        while chunk:
+            try:
+                decompressor.decompress(chunk)
+            except zlib.error:
+                return size
+            if not decompressor.eof:
+                offset += len(chunk)
+                break
+
+            # the end of a member, its trailer checked
+            offset += len(chunk) - len(decompressor.unused_data)
+            size = offset
+            chunk = decompressor.unused_data
+            decompressor = zlib.decompressobj(wbits=31)
+    return size
+
+
+class JsonLinesExportPipeline:
+
+    def __init__(self, stats, directory, batch_size=500, max_items=100000, max_bytes=256 * 1024 * 1024,
+                 compress=False, compress_level=6, signals=None):
+        """
+
+        :param stats: crawler stats collector
+        :param directory: where the shards are written
+        :param batch_size: items buffered before a write
+        :param max_items: items per shard
+        :param max_bytes: bytes (as written to disk) per shard
+        :param compress: gzip the shards
+        :param compress_level:
+        :param signals: crawler signals, `items_exported` is sent once the items of a batch are on disk
+        """
+        self.stats = stats
+        self.directory = directory
+        self.batch_size = batch_size
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.compress_level = compress_level
+        self.signals = signals
+
+        self.spider = None
+        self.batch = []
+        # the items of `batch`
+        self.items = []
+        self.shard = None
+        self.shard_path = None
+        self.shard_index = 0
+        self.shard_items = 0
+        self.shard_bytes = 0
+        self.prefix = None
+        self.started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls.from_settings(crawler.settings, crawler.stats, crawler.signals)
+
+    @classmethod
+    def from_settings(cls, settings, stats, signals=None):
+        if not settings.get('EXPORT_DIR'):
+            raise NotConfigured("`EXPORT_DIR` is not set")
+
+        return cls(
+            stats,
+            settings.get('EXPORT_DIR'),
+            batch_size=settings.getint('EXPORT_BATCH_SIZE', 500),
+            max_items=settings.getint('EXPORT_SHARD_MAX_ITEMS', 100000),
+            max_bytes=settings.getint('EXPORT_SHARD_MAX_BYTES', 256 * 1024 * 1024),
+            compress=settings.getbool('EXPORT_GZIP'),
+            compress_level=settings.getint('EXPORT_GZIP_LEVEL', 6),
+            signals=signals,
+        )
+
+    def open_spider(self, spider):
+        os.makedirs(self.directory, exist_ok=True)
+        self.recover(spider.name)
+        self.spider = spider
+        self.prefix = f"{spider.name}-{time.strftime('%Y%m%dT%H%M%S')}"
+        self.started = time.monotonic()
+
+        if self.signals is not None:
+            # the checkpoint and the frontier wait for `items_exported` to mark the words of the items
+            spider.exporter = self
+
+    def close_spider(self, spider):
+        self.flush()
+        self.close_shard()
+
+    @timed('pipeline/export')
+    def process_item(self, item, spider):
+        """
+        :param item:
+        :param spider:
+        :return:
+        """
+        record = to_primitive(ItemAdapter(item).asdict())
+        self.batch.append(ujson.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.items.append(item)
+
+        if len(self.batch) >= self.batch_size or self.shard_items + len(self.batch) >= self.max_items:
+            self.flush()
+
+        return item
+
+    def flush(self):
+        """
+        writes the buffered items to the current shard and syncs it, then closes it when one of its bounds is reached.
+
+        :return:
+        """
+        if not self.batch:
+            return
+
+        data = b''.join(self.batch)
+        raw_size = len(data)
+        if self.compress:
+            data = gzip.compress(data, compresslevel=self.compress_level)
+
+        if self.shard is None:
+            self.open_shard()
+
+        self.shard.write(data)
+        self.shard.flush()
+        os.fsync(self.shard.fileno())
+        self.shard_items += len(self.batch)
+        self.shard_bytes += len(data)
+
+        self.stats.inc_value('export/items', len(self.batch))
+        self.stats.inc_value('export/bytes', len(data))
+        self.stats.inc_value('export/raw_bytes', raw_size)
+        self.stats.inc_value('export/batches')
+        items = self.items
+        self.batch = []
+        self.items = []
+
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stats.set_value('export/items_per_sec', round(self.stats.get_value('export/items') / elapsed, 2))
+        self.stats.set_value('export/bytes_per_sec', round(self.stats.get_value('export/bytes') / elapsed, 2))
+
+        if self.shard_items >= self.max_items or self.shard_bytes >= self.max_bytes:
+            self.close_shard()
+
+        if self.signals is not None:
+            self.signals.send_catch_log(items_exported, items=items, spider=self.spider)
+
+    def open_shard(self):
+        """
+        creates the next shard whose name is free, crawls of the spider started in the same second share the prefix.
+
+        :return:
+        """
+        extension = '.jsonl.gz' if self.compress else '.jsonl'
+        while True:
+            self.shard_path = os.path.join(self.directory, f"{self.prefix}-{self.shard_index:05d}{extension}")
+            self.shard_index += 1
+            try:
+                shard = open(f"{self.shard_path}.part", 'xb')
+            except FileExistsError:
+                continue
+
+            # a finished shard of another crawl, or the new one removed by the recovery of another crawl
+            # before it was locked
+            if os.path.exists(self.shard_path) or not try_lock(shard) or not os.path.exists(f"{self.shard_path}.part") \
+                    or not os.path.samestat(os.fstat(shard.fileno()), os.stat(f"{self.shard_path}.part")):
+                shard.close()
+                continue
+
+            self.shard = shard
+            self.shard_items = 0
+            self.shard_bytes = 0
+            return
+
+    def close_shard(self):
+        if self.shard is None:
+            return
+
+        self.shard.close()
+        os.replace(f"{self.shard_path}.part", self.shard_path)
+        self.stats.inc_value('export/shards')
+        logger.info(f"exported {self.shard_items} items to {self.shard_path}")
+        self.shard = None
+
+    def recover(self, name):
+        """
+        finalizes the `.part` shards of the spider left by a crashed crawl, up to their last complete batch. The ones
+        locked by a running crawl are left alone.
+
+        :param name: spider name
+        :return:
+        """
+        for file_name in sorted(os.listdir(self.directory)):
+            if not file_name.startswith(f"{name}-") or not file_name.endswith('.part'):
+                continue
+
+            path = os.path.join(self.directory, file_name)
+            with open(path, 'r+b') as fh:
+                if not try_lock(fh):
+                    continue
+                size = complete_size(fh, file_name.endswith('.gz.part'))
+                fh.truncate(size)
+                if size:
+                    os.replace(path, path[:-len('.part')])
+                else:
+                    os.remove(path)
+
+            self.stats.inc_value('export/recovered_shards' if size else 'export/removed_shards')
+            logger.warning(f"{'recovered' if size else 'removed'} the unfinished shard {path} ({size} bytes kept)")
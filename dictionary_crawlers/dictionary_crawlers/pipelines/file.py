@@ -4,20 +4,146 @@
 
 """
 @see: https://docs.scrapy.org/en/latest/topics/media-pipeline.html#topics-media-pipeline-enabling
+
+Audio urls are identified without their `?version=` query, so the same pronunciation is stored once:
+
+- urls already in the `AudioIndex` (`AUDIO_INDEX_DIR`) are never requested again,
+- duplicates within a crawl are requested with the same url, `MediaPipeline` downloads them once, the url is
+  only remembered until its download is recorded in the index,
+- downloads go through their own `AUDIO_DOWNLOAD_SLOT`, see `DOWNLOAD_SLOTS`, and don't starve the page fetches.
 """
+import hashlib
 import logging
+import os
+from urllib.parse import urlparse
 
+import scrapy
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
 from scrapy.pipelines.files import FilesPipeline
+from w3lib.url import url_query_cleaner
+
+from ..cache import AudioIndex
+from ..models import to_primitive
+from ..timing import timed
 
 logger = logging.getLogger(__name__)
 
+__all__ = ('DictionaryFilePipeline',)
+
+
+def normalize_audio_url(url):
+    """
+    :param url:
+    :return: the url without its `version` query
+    """
+    return url_query_cleaner(url, ('version',), remove=True)
+
 
 class DictionaryFilePipeline(FilesPipeline):
+    # keys of the definition whose values are audio urls
+    AUDIO_FIELDS = ('british_pron', 'american_pron', 'audio')
+
+    def __init__(self, store_uri, *args, **kwargs):
+        if not store_uri:
+            # `FilesPipeline` turns a missing store into a "None" directory
+            raise NotConfigured("`FILES_STORE` is not set")
+
+        super(DictionaryFilePipeline, self).__init__(store_uri, *args, **kwargs)
+        self.index = None
+        # normalized url -> url requested, for the downloads in progress only
+        self.canonical_urls = {}
+
+    def open_spider(self, spider):
+        super(DictionaryFilePipeline, self).open_spider(spider)
+        self.stats = spider.crawler.stats
+        self.slot = spider.settings.get('AUDIO_DOWNLOAD_SLOT')
+        self.index = AudioIndex(spider.settings.get('AUDIO_INDEX_DIR'), stats=self.stats)
+
+    def close_spider(self, spider):
+        self.index.close()
+
+    def audio_urls(self, value):
+        """
+        :param value: an item field
+        :return: the audio urls found in it, at any depth
+        """
+        if isinstance(value, dict):
+            for key, sub_value in value.items():
+                if key in self.AUDIO_FIELDS and sub_value:
+                    yield from [sub_value] if isinstance(sub_value, str) else sub_value
+                else:
+                    yield from self.audio_urls(sub_value)
+
+        elif isinstance(value, (list, tuple)):
+            for sub_value in value:
+                yield from self.audio_urls(sub_value)
+
+    def item_audio_urls(self, item):
+        """
+        :param item:
+        :return: {normalized url: url}
+        """
+        urls = {}
+        # `asdict` also turns the source items of a `DictionariesItem` into dicts
+        for url in self.audio_urls(to_primitive(ItemAdapter(item).asdict())):
+            urls.setdefault(normalize_audio_url(url), url)
+        return urls
+
+    @timed('pipeline/audio_requests')
+    def get_media_requests(self, item, info):
+        for normalized_url, url in self.item_audio_urls(item).items():
+            if self.index.get(normalized_url) is not None:
+                self.stats.inc_value('audio/skipped_existing')
+                continue
+
+            if normalized_url in self.canonical_urls:
+                # the same request as the first occurrence, whatever its version
+                self.stats.inc_value('audio/collapsed')
+            else:
+                self.canonical_urls[normalized_url] = url
+                self.stats.inc_value('audio/requested')
+
+            # the audio index already skips the known files, they would only evict pages from the recrawl cache
+            meta = {'dont_cache': True}
+            if self.slot:
+                meta['download_slot'] = self.slot
+            yield scrapy.Request(self.canonical_urls[normalized_url], meta=meta)
+
+    def file_path(self, request, response=None, info=None, *, item=None):
+        """
+        addressed by the normalized url, a new `?version=` doesn't make a new file.
+        """
+        normalized_url = normalize_audio_url(request.url)
+        extension = os.path.splitext(urlparse(normalized_url).path)[1]
+        return f"audio/{hashlib.sha1(normalized_url.encode('utf-8')).hexdigest()}{extension}"
 
     def file_downloaded(self, response, request, info, *, item=None):
         logger.debug("File Downloaded ............")
-        super(DictionaryFilePipeline, self).file_downloaded(response, request, info, item=None)
+        return super(DictionaryFilePipeline, self).file_downloaded(response, request, info, item=item)
 
+    @timed('pipeline/audio_completed')
     def item_completed(self, results, item, info):
         logger.info("File Completed ................")
-        super(DictionaryFilePipeline, self).item_completed(results, item, info)
+
+        files = {}
+        for ok, result in results:
+            if ok:
+                normalized_url = normalize_audio_url(result['url'])
+                self.index.add(normalized_url, result['path'], result['checksum'])
+                files[normalized_url] = result
+
+        for normalized_url, url in self.item_audio_urls(item).items():
+            # recorded in the index, or failed and requested again by the next item that has it
+            self.canonical_urls.pop(normalized_url, None)
+            if normalized_url not in files:
+                stored = self.index.get(normalized_url)
+                if stored is not None:
+                    path, checksum = stored
+                    files[normalized_url] = {'url': url, 'path': path, 'checksum': checksum, 'status': 'uptodate'}
+
+        adapter = ItemAdapter(item)
+        if self.files_result_field in adapter.field_names():
+            adapter[self.files_result_field] = list(files.values())
+
+        return item
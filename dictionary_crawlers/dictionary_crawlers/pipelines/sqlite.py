@@ -0,0 +1,296 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Loads the items into normalized sqlite tables at `SQLITE_EXPORT_PATH`, so they can be queried by part of speech,
+grammar, region or audio without reading the JSON shards:
+
+    words       (id, word, source)
+    entries     (id, word_id, position, hwd, hyphenation, homnum, pos, british_audio_id, american_audio_id)
+    senses      (id, entry_id, parent_id, position, number, active, geo, syn, main_def, sign_post, gram, field)
+    subsenses   a view of the senses which have a parent
+    examples    (id, sense_id, position, kind, example, text, audio_id), kind is "example", "grammar" or "collocation"
+    crossrefs   (id, sense_id, position, example, link)
+    audio       (id, url, path, checksum), urls without their `?version=` query, path once downloaded
+
+Rows are buffered and written with `executemany`, one transaction per `SQLITE_EXPORT_BATCH_SIZE` items. The ids are
+allocated here, so a batch needs no round trip to the database. The indexes are dropped when the spider opens and
+built again once the load is over, an indexed table is much slower to load.
+"""
+import os
+import sqlite3
+import time
+from logging import getLogger
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+
+from ..models import Sense, to_primitive
+from ..timing import timed
+from .file import normalize_audio_url
+
+logger = getLogger(__name__)
+
+__all__ = ('SQLiteExportPipeline',)
+
+# the entry headers stored as they are, the pronunciations are audio rows
+ENTRY_COLUMNS = ('hwd', 'hyphenation', 'homnum', 'pos')
+TABLES = {
+    'words': ('id', 'word', 'source'),
+    'entries': ('id', 'word_id', 'position', *ENTRY_COLUMNS, 'british_audio_id', 'american_audio_id'),
+    'senses': ('id', 'entry_id', 'parent_id', 'position', *Sense.__HEADER__),
+    'examples': ('id', 'sense_id', 'position', 'kind', 'example', 'text', 'audio_id'),
+    'crossrefs': ('id', 'sense_id', 'position', 'example', 'link'),
+    'audio': ('id', 'url', 'path', 'checksum'),
+}
+VIEWS = {
+    'subsenses': "SELECT * FROM senses WHERE parent_id IS NOT NULL",
+}
+INDEXES = {
+    'words_word': "words (word)",
+    'entries_word_id': "entries (word_id)",
+    'entries_hwd': "entries (hwd)",
+    'entries_pos': "entries (pos)",
+    'senses_entry_id': "senses (entry_id)",
+    'senses_parent_id': "senses (parent_id)",
+    'senses_gram': "senses (gram)",
+    'senses_geo': "senses (geo)",
+    'examples_sense_id': "examples (sense_id)",
+    'examples_audio_id': "examples (audio_id)",
+    'crossrefs_sense_id': "crossrefs (sense_id)",
+}
+# sense item -> example kind
+EXAMPLE_KINDS = {
+    'examples': 'example',
+    'grammar_examples': 'grammar',
+    'collocation_examples': 'collocation',
+}
+
+
+class SQLiteExportPipeline:
+
+    def __init__(self, stats, path, batch_size=1000):
+        """
+
+        :param stats: crawler stats collector
+        :param path: the database file, new items are appended to it
+        :param batch_size: items per transaction
+        """
+        self.stats = stats
+        self.path = path
+        self.batch_size = batch_size
+
+        self.connection = None
+        self.rows = {table: [] for table in TABLES}
+        # next id of every table
+        self.ids = {}
+        # normalized url -> audio id, and the audio ids without a stored file yet
+        self.audio_ids = {}
+        self.missing_files = set()
+        self.file_updates = []
+        self.items = 0
+        self.started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls.from_settings(crawler.settings, crawler.stats)
+
+    @classmethod
+    def from_settings(cls, settings, stats):
+        if not settings.get('SQLITE_EXPORT_PATH'):
+            raise NotConfigured("`SQLITE_EXPORT_PATH` is not set")
+
+        return cls(
+            stats,
+            settings.get('SQLITE_EXPORT_PATH'),
+            batch_size=settings.getint('SQLITE_EXPORT_BATCH_SIZE', 1000),
+        )
+
+    def open_spider(self, spider):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # transactions are explicit
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        for table, columns in TABLES.items():
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {', '.join(columns[1:])})"
+            )
+            self.ids[table] = self.connection.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+        for view, query in VIEWS.items():
+            self.connection.execute(f"CREATE VIEW IF NOT EXISTS {view} AS {query}")
+        for index in INDEXES:
+            self.connection.execute(f"DROP INDEX IF EXISTS {index}")
+
+        for audio_id, url, path in self.connection.execute("SELECT id, url, path FROM audio"):
+            self.audio_ids[url] = audio_id
+            if path is None:
+                self.missing_files.add(audio_id)
+
+        self.started = time.monotonic()
+
+    def close_spider(self, spider):
+        self.flush()
+
+        started = time.monotonic()
+        # the audio urls are unique, their index is needed by the next loads as well
+        self.connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS audio_url ON audio (url)")
+        for index, target in INDEXES.items():
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {target}")
+        self.connection.execute("ANALYZE")
+        self.connection.close()
+        logger.info(f"sqlite export indexed in {time.monotonic() - started:.1f}s: {self.path}")
+
+    @staticmethod
+    def text(value):
+        """
+        :param value: a header value, e.g. " noun"
+        :return: without its surrounding spaces, so it can be compared
+        """
+        return value.strip() if isinstance(value, str) else value
+
+    def next_id(self, table):
+        value = self.ids[table]
+        self.ids[table] += 1
+        return value
+
+    def audio_id(self, url, files):
+        """
+        :param url: an audio url, or None
+        :param files: normalized url -> stored file of the item, see `DictionaryFilePipeline`
+        :return: the id of its row
+        """
+        if not url:
+            return None
+
+        normalized_url = normalize_audio_url(url)
+        stored = files.get(normalized_url) or {}
+        audio_id = self.audio_ids.get(normalized_url)
+
+        if audio_id is None:
+            audio_id = self.audio_ids[normalized_url] = self.next_id('audio')
+            self.rows['audio'].append((audio_id, normalized_url, stored.get('path'), stored.get('checksum')))
+            if stored.get('path') is None:
+                self.missing_files.add(audio_id)
+
+        elif audio_id in self.missing_files and stored.get('path'):
+            self.missing_files.discard(audio_id)
+            self.file_updates.append((stored['path'], stored.get('checksum'), audio_id))
+
+        return audio_id
+
+    def add_sense(self, sense, entry_id, parent_id, position, files):
+        """
+        :param sense: a sense, in its JSON shape
+        :param entry_id:
+        :param parent_id: the sense holding this one, None for the senses of the entry
+        :param position:
+        :param files:
+        :return:
+        """
+        sense_id = self.next_id('senses')
+        header = sense.get('header') or {}
+        self.rows['senses'].append(
+            (sense_id, entry_id, parent_id, position, *(header.get(key) for key in Sense.__HEADER__))
+        )
+
+        for key, kind in EXAMPLE_KINDS.items():
+            for example_position, example in enumerate(sense.get(key) or (), start=1):
+                self.rows['examples'].append((
+                    self.next_id('examples'), sense_id, example_position, kind, example.get('example'),
+                    example.get('text'), self.audio_id(example.get('audio'), files),
+                ))
+
+        for ref_position, ref in enumerate(sense.get('refs') or (), start=1):
+            self.rows['crossrefs'].append(
+                (self.next_id('crossrefs'), sense_id, ref_position, ref.get('example'), ref.get('link'))
+            )
+
+        for sub_position, sub_sense in enumerate(sense.get('sub_senses') or (), start=1):
+            self.add_sense(sub_sense, entry_id, sense_id, sub_position, files)
+
+    def add(self, word, source, definitions, files):
+        """
+        :param word:
+        :param source: the spider whose item it is
+        :param definitions: the `definition` field
+        :param files: normalized url -> stored file of the item
+        :return:
+        """
+        word_id = self.next_id('words')
+        self.rows['words'].append((word_id, word, source))
+
+        for position, entry in to_primitive(definitions or {}).items():
+            entry_id = self.next_id('entries')
+            self.rows['entries'].append((
+                entry_id, word_id, int(position), *(self.text(entry.get(key)) for key in ENTRY_COLUMNS),
+                self.audio_id(entry.get('british_pron'), files), self.audio_id(entry.get('american_pron'), files),
+            ))
+            for sense_position, sense in enumerate(entry.get('senses') or (), start=1):
+                self.add_sense(sense, entry_id, None, sense_position, files)
+
+    @timed('pipeline/sqlite_export')
+    def process_item(self, item, spider):
+        """
+        :param item: the item of a dictionary, or a `DictionariesItem` holding the items of several
+        :param spider:
+        :return:
+        """
+        # only the stored fields are converted, `asdict` would walk the corpus and the family words too
+        adapter = ItemAdapter(item)
+        files = {normalize_audio_url(stored['url']): stored for stored in adapter.get('audio_files') or ()}
+
+        if 'sources' in adapter:
+            for source, status in adapter['sources'].items():
+                if status == 'ok':
+                    self.add(adapter['word'], source, ItemAdapter(adapter[source]).get('definition'), files)
+        else:
+            self.add(adapter.get('word'), spider.name if spider is not None else None, adapter.get('definition'), files)
+
+        self.items += 1
+        if self.items % self.batch_size == 0:
+            self.flush()
+
+        return item
+
+    def flush(self):
+        """
+        writes the buffered rows in a single transaction.
+
+        :return:
+        """
+        if not any(self.rows.values()) and not self.file_updates:
+            return
+
+        rows = 0
+        self.connection.execute("BEGIN")
+        try:
+            for table, columns in TABLES.items():
+                batch = self.rows[table]
+                if batch:
+                    self.connection.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", batch
+                    )
+                    self.stats.inc_value(f'sqlite_export/rows/{table}', len(batch))
+                    rows += len(batch)
+            if self.file_updates:
+                self.connection.executemany("UPDATE audio SET path = ?, checksum = ? WHERE id = ?", self.file_updates)
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        self.rows = {table: [] for table in TABLES}
+        self.file_updates = []
+
+        self.stats.inc_value('sqlite_export/rows', rows)
+        self.stats.inc_value('sqlite_export/transactions')
+        self.stats.set_value('sqlite_export/items', self.items)
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rows_per_sec = self.stats.get_value('sqlite_export/rows') / elapsed
+        self.stats.set_value('sqlite_export/rows_per_sec', round(rows_per_sec, 2))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+A bounded worker pool which runs CPU-heavy extraction off the Twisted reactor thread.
+
+Enable it with `PARSE_POOL_ENABLED = True`, see `settings.py` for the other `PARSE_POOL_*` settings.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from logging import getLogger
+
+from twisted.internet.defer import Deferred, DeferredSemaphore
+
+logger = getLogger(__name__)
+
+__all__ = ('ParsePool',)
+
+
+class ParsePool:
+    EXECUTORS = {
+        'thread': ThreadPoolExecutor,
+        'process': ProcessPoolExecutor,
+    }
+
+    def __init__(self, stats, kind='thread', size=None, queue_depth=None):
+        """
+
+        :param stats: crawler stats collector
+        :param kind: "thread" or "process"
+        :param size: number of workers, defaults to the number of cores
+        :param queue_depth: jobs waiting for a free worker, more jobs wait on the reactor without blocking it
+        """
+        assert kind in self.EXECUTORS, f"`PARSE_POOL_TYPE` must be one of {tuple(self.EXECUTORS)}!"
+
+        self.stats = stats
+        self.kind = kind
+        self.size = size or os.cpu_count() or 1
+        self.queue_depth = self.size * 2 if queue_depth is None else queue_depth
+        self.executor = self.EXECUTORS[kind](max_workers=self.size)
+        self.semaphore = DeferredSemaphore(self.size + self.queue_depth)
+
+        self.stats.set_value('parse_pool/type', self.kind)
+        self.stats.set_value('parse_pool/size', self.size)
+        self.stats.set_value('parse_pool/queue_depth', self.queue_depth)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        queue_depth = settings.get('PARSE_POOL_QUEUE_DEPTH')
+        return cls(
+            crawler.stats,
+            kind=settings.get('PARSE_POOL_TYPE', 'thread'),
+            size=settings.getint('PARSE_POOL_SIZE') or None,
+            queue_depth=None if queue_depth is None else int(queue_depth),
+        )
+
+    def submit(self, func, *args):
+        """
+        :param func: must be picklable for a process pool
+        :param args: must be picklable for a process pool
+        :return: a Deferred fired on the reactor thread with the result of `func(*args)`
+        """
+        self.stats.inc_value('parse_pool/submitted')
+        deferred = self.semaphore.run(self._submit, func, *args)
+        self._update_gauges()
+        return deferred
+
+    def _submit(self, func, *args):
+        from twisted.internet import reactor
+
+        deferred = Deferred()
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda done: reactor.callFromThread(self._resolve, deferred, done))
+        self._update_gauges()
+        return deferred
+
+    def _resolve(self, deferred, future):
+        exception = future.exception()
+        if exception is None:
+            self.stats.inc_value('parse_pool/completed')
+            deferred.callback(future.result())
+        else:
+            self.stats.inc_value('parse_pool/failed')
+            deferred.errback(exception)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        in_flight = self.semaphore.limit - self.semaphore.tokens
+        waiting = len(self.semaphore.waiting)
+        # jobs handed to the executor, running or queued behind the workers
+        self.stats.set_value('parse_pool/in_flight', in_flight)
+        self.stats.max_value('parse_pool/in_flight_max', in_flight)
+        # jobs held back on the reactor because the executor queue is full
+        self.stats.set_value('parse_pool/waiting', waiting)
+        self.stats.max_value('parse_pool/waiting_max', waiting)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -4,3 +4,5 @@
 
 from .base import *  # NOQA
 from .longman import *  # NOQA
+from .cambridge import *  # NOQA
+from .oxford import *  # NOQA
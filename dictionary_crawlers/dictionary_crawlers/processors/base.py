@@ -4,14 +4,54 @@
 
 from logging import getLogger
 
-from itemloaders.processors import TakeFirst
-
 logger = getLogger(__name__)
 
 __all__ = (
-    "default_input_processor",
-    "default_output_processor"
+    "DefinitionProcessor",
 )
 
-default_input_processor = TakeFirst()
-default_output_processor = TakeFirst()
+
+class DefinitionProcessor:
+    """
+    Runs the `DefinitionService` of a dictionary over the selected elements, see `service_cls`.
+    """
+    service_cls = None
+
+    def __call__(self, iterable, loader_context=None, *args, **kwargs):
+        """
+
+        :param iterable: parsed elements (or their html)
+        :param loader_context: item loader context, a `parse_pool` in it moves the extraction off the reactor,
+            a `parse_cache` in it skips the extraction of entries seen in a previous crawl, a `projection` in it
+            restricts the extraction to its fields
+        :param args:
+        :param kwargs:
+        :return: the definitions, or a Deferred firing with them when a parse pool is used
+        """
+        loader_context = loader_context or {}
+        parse_pool = loader_context.get('parse_pool')
+        parse_cache = loader_context.get('parse_cache')
+        service = self.service_cls(loader_context.get('projection'))
+
+        entries = list(iterable)
+        digest = None
+
+        if parse_cache is not None:
+            digest = parse_cache.key(entries, service.projection, f"{self.service_cls.__name__}/{service.version}")
+            definitions = parse_cache.get(digest)
+            if definitions is not None:
+                return self.service_cls.load(definitions)
+
+        if parse_pool is not None:
+            deferred = parse_pool.submit(service.process, entries)
+            if digest is not None:
+                deferred.addCallback(parse_cache.put, digest)
+
+            # wrapped in a list, the item loader would otherwise iterate the Deferred itself
+            return [deferred]
+
+        definitions = service.process(entries)
+        if digest is not None:
+            parse_cache.put(definitions, digest)
+
+        return definitions
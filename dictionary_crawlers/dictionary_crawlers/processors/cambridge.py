@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import logging
+
+from ..services import CambridgeDefinitionService
+from ..timing import timed
+from .base import DefinitionProcessor
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'CambridgeDefinitionProcessor',
+)
+
+
+class CambridgeDefinitionProcessor(DefinitionProcessor):
+    service_cls = CambridgeDefinitionService
+
+    @timed('cambridge/definition')
+    def __call__(self, iterable, loader_context=None, *args, **kwargs):
+        """
+
+        :param iterable: parsed `entry-body__el` blocks (or their html)
+        :param loader_context: item loader context
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        return super(CambridgeDefinitionProcessor, self).__call__(iterable, loader_context, *args, **kwargs)
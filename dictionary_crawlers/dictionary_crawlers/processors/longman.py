@@ -7,18 +7,22 @@ import logging
 import re
 from collections import defaultdict
 
-from ..services import LongManDefinitionService
+from ..services import LongManCorpusService, LongManDefinitionService
+from ..timing import timed
+from .base import DefinitionProcessor
 
 logger = logging.getLogger(__name__)
 
 __all__ = (
     'LongManFamilyWordProcessor',
-    'LongManDefinitionProcessor'
+    'LongManDefinitionProcessor',
+    'LongManCorpusProcessor',
 )
 
 
 class LongManFamilyWordProcessor:
 
+    @timed('longman/family_word')
     def __call__(self, iterable, **kwargs):
         """
         :param iterable: xpath query result
@@ -49,15 +53,45 @@ class LongManFamilyWordProcessor:
         return dict(word_family)
 
 
-class LongManDefinitionProcessor:
+class LongManDefinitionProcessor(DefinitionProcessor):
+    service_cls = LongManDefinitionService
 
-    def __call__(self, iterable, *args, **kwargs):
+    @timed('longman/definition')
+    def __call__(self, iterable, loader_context=None, *args, **kwargs):
         """
 
-        :param iterable:
+        :param iterable: parsed `dictentry` elements (or their html)
+        :param loader_context: item loader context
         :param args:
         :param kwargs:
         :return:
         """
+        return super(LongManDefinitionProcessor, self).__call__(iterable, loader_context, *args, **kwargs)
 
-        return LongManDefinitionService(items=iterable).process()
\ No newline at end of file
+
+class LongManCorpusProcessor:
+
+    @timed('longman/corpus')
+    def __call__(self, iterable, loader_context=None, *args, **kwargs):
+        """
+
+        :param iterable: parsed `exaGroup` elements (or their html)
+        :param loader_context: item loader context, its `corpus_max_examples` (or `CORPUS_MAX_EXAMPLES` of its
+            `settings`) caps the examples
+        :param args:
+        :param kwargs:
+        :return: the corpus examples, or a Deferred firing with them when a parse pool is used
+        """
+        loader_context = loader_context or {}
+        parse_pool = loader_context.get('parse_pool')
+        settings = loader_context.get('settings')
+        limit = loader_context.get('corpus_max_examples')
+        if limit is None and settings is not None:
+            limit = settings.getint('CORPUS_MAX_EXAMPLES')
+        limit = limit or None
+
+        if parse_pool is not None:
+            # wrapped in a list, the item loader would otherwise iterate the Deferred itself
+            return [parse_pool.submit(LongManCorpusService().process, list(iterable), limit)]
+
+        return LongManCorpusService().process(iterable, limit)
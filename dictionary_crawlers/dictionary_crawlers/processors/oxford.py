@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import logging
+
+from ..services import OxfordDefinitionService
+from ..timing import timed
+from .base import DefinitionProcessor
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'OxfordDefinitionProcessor',
+)
+
+
+class OxfordDefinitionProcessor(DefinitionProcessor):
+    service_cls = OxfordDefinitionService
+
+    @timed('oxford/definition')
+    def __call__(self, iterable, loader_context=None, *args, **kwargs):
+        """
+
+        :param iterable: parsed `entry` blocks (or their html)
+        :param loader_context: item loader context
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        return super(OxfordDefinitionProcessor, self).__call__(iterable, loader_context, *args, **kwargs)
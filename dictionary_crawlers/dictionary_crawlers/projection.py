@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+The fields a crawl keeps, `-a fields=hwd,pos,british_pron` for instance. The projection is handed down to the
+extraction, so the subtrees of the other fields are never visited:
+
+- `family_word`, `definition`, `corpus`: item fields, loaded whole (`word` is always loaded)
+- `hwd`, `hyphenation`, `homnum`, `pos`, `british_pron`, `american_pron`: entry headers, they imply `definition`
+  with only these headers and without senses
+- `senses`: the senses of the entries
+- `refs`, `examples`, `grammar_examples`, `collocation_examples`: senses with only these items
+
+A header-only projection stops reading an entry at its head, its senses are never walked.
+"""
+from .models import Entry, Sense
+
+__all__ = (
+    'Projection',
+    'found',
+)
+
+ITEM_FIELDS = ('family_word', 'definition', 'corpus')
+SENSES = 'senses'
+
+
+class Projection:
+    __slots__ = ('item_fields', 'header', 'senses', 'sense_items')
+
+    def __init__(self, fields):
+        """
+
+        :param fields: requested field names, see the module
+        """
+        fields = frozenset(fields)
+        unknown = fields.difference(ITEM_FIELDS, Entry.__HEADER__, Sense.__ITEMS__, (SENSES,))
+        assert not unknown, f"unknown fields: {', '.join(sorted(unknown))}"
+
+        whole = 'definition' in fields
+        header = fields.intersection(Entry.__HEADER__)
+        sense_items = fields.intersection(Sense.__ITEMS__)
+
+        # None keeps all of them
+        self.header = None if whole or not header else header
+        self.senses = whole or SENSES in fields or bool(sense_items)
+        self.sense_items = None if whole or not sense_items else sense_items
+        self.item_fields = fields.intersection(ITEM_FIELDS).union(
+            ('definition',) if header or self.senses else ()
+        )
+
+    @classmethod
+    def parse(cls, value):
+        """
+        :param value: comma separated fields, e.g. "hwd,pos"
+        :return: the projection, None when no field is given, every field is then kept
+        """
+        fields = [field.strip() for field in (value or '').split(',') if field.strip()]
+        return cls(fields) if fields else None
+
+    def wants(self, field):
+        """
+        :param field: an item field
+        :return: True when the field is loaded
+        """
+        return field not in ITEM_FIELDS or field in self.item_fields
+
+    def wants_header(self, key):
+        """
+        :param key: an entry header
+        :return:
+        """
+        return self.header is None or key in self.header
+
+    def wants_sense_item(self, key):
+        """
+        :param key: a sense item, e.g. "examples"
+        :return:
+        """
+        return self.senses and (self.sense_items is None or key in self.sense_items)
+
+    def __repr__(self):
+        # stable across processes, it is part of the parse cache keys
+        parts = [
+            ','.join(sorted(self.item_fields)),
+            ','.join(sorted(self.header)) if self.header is not None else '*',
+            ('*' if self.sense_items is None else ','.join(sorted(self.sense_items))) if self.senses else '-',
+        ]
+        return f"Projection({';'.join(parts)})"
+
+
+def found(item, projection=None):
+    """
+    :param item: a scraped item, or its JSON shape
+    :param projection: the projection it was extracted with, None for the whole item
+    :return: True when the page has the word: a definition, or with a projection one of its loaded item fields
+    """
+    if projection is None:
+        return bool(item.get('definition'))
+    return any(item.get(field) for field in projection.item_fields)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Runs the extraction of the spiders again over the page archive (see `dictionary_crawlers.archive`), without any
+download: the records are split into chunks, and every chunk is parsed in a worker process.
+
+Each record is loaded by the spider it was crawled for, `LongmanDictionarySpider` for a `longman` page, be it crawled
+by `longman` or by the `dictionaries` fan-out. The items come out in archive order, whatever the number of workers,
+so two runs over the same archive are comparable line by line.
+"""
+import collections
+import os
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+
+from itemadapter import ItemAdapter
+from scrapy.http import HtmlResponse, Request
+from scrapy.settings import Settings
+from scrapy.spiderloader import SpiderLoader
+
+from .archive import read_record, segment_spans, segments
+from .models import to_primitive
+
+logger = getLogger(__name__)
+
+__all__ = ('reparse',)
+
+# per worker process, see `init_worker`
+_settings = None
+_fields = None
+_spiders = {}
+
+
+def init_worker(settings, fields=None):
+    """
+    :param settings: project settings, as a dict
+    :param fields: comma separated fields to extract, as `-a fields=...` of the spiders
+    :return:
+    """
+    global _settings, _fields
+    _settings = Settings(settings)
+    _fields = fields
+    _spiders.clear()
+
+
+def get_spider(name):
+    """
+    :param name: spider name
+    :return: an instance of the spider, only used to load items, None when the project has no such spider
+    """
+    if name not in _spiders:
+        try:
+            spider = SpiderLoader.from_settings(_settings).load(name)(fields=_fields)
+            spider.settings = _settings
+        except KeyError:
+            logger.warning(f"no spider named {name}, its pages are skipped")
+            spider = None
+        _spiders[name] = spider
+    return _spiders[name]
+
+
+def parse_chunk(path, spans, sources=None):
+    """
+    :param path: a segment
+    :param spans: (offset, length) of the records to parse
+    :param sources: spiders whose pages are parsed, all of them when None
+    :return: ((source, item) of the parsed records, as JSON-ready dicts, number of failed records)
+    """
+    items = []
+    failed = 0
+
+    with open(path, 'rb') as fh:
+        for offset, length in spans:
+            header, body = read_record(fh, offset, length)
+            spider = None if sources and header['source'] not in sources else get_spider(header['source'])
+            if spider is None:
+                continue
+
+            request = Request(header['url'], meta={'word': header['word']})
+            response = HtmlResponse(
+                url=header['url'], status=header['status'], headers={'Content-Type': header['content_type']},
+                body=body, request=request,
+            )
+            try:
+                item = spider.load_item(response)
+            except Exception:
+                logger.exception(f"{header['url']} at {os.path.basename(path)}:{offset} failed")
+                failed += 1
+                continue
+
+            items.append((header['source'], to_primitive(ItemAdapter(item).asdict())))
+
+    return items, failed
+
+
+def chunks(directory, chunk_size):
+    """
+    :param directory: `ARCHIVE_DIR`
+    :param chunk_size: records per chunk
+    :return: (segment, spans) of the chunks, in archive order
+    """
+    for path in segments(directory):
+        spans = segment_spans(path)
+        for start in range(0, len(spans), chunk_size):
+            yield path, spans[start:start + chunk_size]
+
+
+def reparse(directory, settings, sources=None, workers=None, chunk_size=64, fields=None):
+    """
+    :param directory: `ARCHIVE_DIR`
+    :param settings: project settings
+    :param sources: spiders whose pages are parsed, all of them when None
+    :param workers: worker processes, defaults to the number of cores; 1 parses in this process
+    :param chunk_size: records per chunk handed to a worker
+    :param fields: comma separated fields to extract, all of them when None
+    :return: (items, number of failed records) of every chunk, in archive order, see `parse_chunk`
+    """
+    settings = settings.copy_to_dict()
+    sources = frozenset(sources) if sources else None
+    tasks = chunks(directory, chunk_size)
+
+    if workers == 1:
+        init_worker(settings, fields)
+        for path, spans in tasks:
+            yield parse_chunk(path, spans, sources)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(settings, fields)) as executor:
+        # a few chunks ahead of every worker, the results wait in memory until their turn
+        futures = collections.deque()
+        for path, spans in tasks:
+            futures.append(executor.submit(parse_chunk, path, spans, sources))
+            if len(futures) >= workers * 4:
+                yield futures.popleft().result()
+
+        while futures:
+            yield futures.popleft().result()
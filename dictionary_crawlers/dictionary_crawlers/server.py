@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+A long-running asyncio HTTP service answering single word lookups, see `scrapy serve` and the `LOOKUP_*` settings.
+
+    GET /words/<word>   the item of the word (as `dictionary_crawlers.lookup` returns it), 404 when Longman
+                        doesn't know the word or its page has no definition, 502 when the upstream fetch failed
+    GET /metrics        hits and misses of every cache tier, coalesced lookups and latency histograms
+
+Answers come from an in-memory LRU of items, then from its disk tier (`LookupCache`), then from Longman. Concurrent
+requests of the same word wait for a single upstream fetch. Words which don't exist are cached too, until
+`not_found_ttl`. Fetches and extraction run in worker threads, each one keeping its own `Lookup` connection.
+"""
+import asyncio
+import collections
+import functools
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from urllib.parse import unquote
+
+import ujson
+
+from .cache import LookupCache
+from .lookup import Lookup
+from .timing import Histogram
+from .wordlist import normalize
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'LookupServer',
+)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 502: 'Bad Gateway'}
+
+
+class Metrics:
+    """
+    Counters shaped like a crawler stats collector, so the sqlite stores record into them, and latency histograms.
+    """
+
+    def __init__(self):
+        self.values = collections.Counter()
+        self.histograms = collections.defaultdict(Histogram)
+        self.started = time.time()
+
+    def get_value(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set_value(self, key, value):
+        self.values[key] = value
+
+    def inc_value(self, key, count=1):
+        self.values[key] += count
+
+    def observe(self, name, started):
+        """
+        :param name: histogram
+        :param started: `time.perf_counter()` at the start of the timed work
+        :return:
+        """
+        self.histograms[name].add((time.perf_counter() - started) * 1000)
+
+    def summary(self):
+        hits = self.values['lookup_cache/memory/hit'] + self.values['lookup_cache/disk/hit']
+        lookups = hits + self.values['lookup_cache/miss']
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'hit_rate': round(hits / lookups, 4) if lookups else 0,
+            **self.values,
+            'latency': {name: histogram.summary() for name, histogram in self.histograms.items()},
+        }
+
+
+class MemoryCache:
+    """
+    The in-memory LRU of items, entries of words which don't exist expire.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        # word -> (item, expiry)
+        self.entries = collections.OrderedDict()
+
+    def get(self, word, now):
+        """
+        :return: (item, expiry), or None when the word is not cached
+        """
+        entry = self.entries.get(word)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self.entries[word]
+            return None
+
+        self.entries.move_to_end(word)
+        return entry
+
+    def put(self, word, item, expires=None):
+        self.entries[word] = (item, expires)
+        self.entries.move_to_end(word)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class LookupServer:
+
+    def __init__(self, cache_dir, base_url=None, max_entries=10000, disk_max_entries=1000000, not_found_ttl=86400.0,
+                 workers=8, timeout=10.0):
+        """
+
+        :param cache_dir: directory of the disk tier
+        :param base_url: url the words are appended to, the Longman dictionary by default
+        :param max_entries: items kept in memory
+        :param disk_max_entries: items kept on disk
+        :param not_found_ttl: seconds a word which doesn't exist is answered from the caches
+        :param workers: concurrent upstream fetches
+        :param timeout: seconds of an upstream fetch
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.not_found_ttl = not_found_ttl
+        self.metrics = Metrics()
+        self.memory = MemoryCache(max_entries)
+        self.disk = LookupCache(cache_dir, disk_max_entries, stats=self.metrics)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lookup')
+        self.local = threading.local()
+        # word -> Future of its upstream lookup
+        self.in_flight = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.get('LOOKUP_CACHE_DIR', 'lookup-cache'),
+            base_url=settings.get('LOOKUP_BASE_URL') or None,
+            max_entries=settings.getint('LOOKUP_MEMORY_ENTRIES', 10000),
+            disk_max_entries=settings.getint('LOOKUP_DISK_ENTRIES', 1000000),
+            not_found_ttl=settings.getfloat('LOOKUP_NOT_FOUND_TTL', 86400),
+            workers=settings.getint('LOOKUP_WORKERS', 8),
+            timeout=settings.getfloat('LOOKUP_TIMEOUT', 10),
+        )
+
+    def fetch(self, word):
+        """
+        runs in a worker thread.
+
+        :param word: normalized word
+        :return: its item, None when it doesn't exist
+        """
+        if not hasattr(self.local, 'lookup'):
+            self.local.lookup = Lookup(base_url=self.base_url, timeout=self.timeout)
+        return self.local.lookup(word)
+
+    async def get(self, word):
+        """
+        :param word: normalized word
+        :return: its item, None when it doesn't exist
+        """
+        now = time.time()
+        entry = self.memory.get(word, now)
+        self.metrics.inc_value(f"lookup_cache/memory/{'hit' if entry is not None else 'miss'}")
+        if entry is None:
+            entry = self.disk.get(word, now)
+            if entry is not None:
+                self.memory.put(word, *entry)
+        if entry is not None:
+            return entry[0]
+
+        self.metrics.inc_value('lookup_cache/miss')
+        future = self.in_flight.get(word)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self.fetch, word)
+            # called before the waiters resume, they find the caches filled
+            future.add_done_callback(functools.partial(self.fetched, word, time.perf_counter()))
+            self.in_flight[word] = future
+        else:
+            self.metrics.inc_value('lookup/coalesced')
+
+        # a cancelled request leaves the fetch running for the other ones
+        return await asyncio.shield(future)
+
+    def fetched(self, word, started, future):
+        """
+        caches the result of an upstream lookup, failures are not cached.
+
+        :param word:
+        :param started: `time.perf_counter()` when the fetch was submitted
+        :param future:
+        :return:
+        """
+        del self.in_flight[word]
+        self.metrics.observe('upstream', started)
+
+        if future.cancelled() or future.exception() is not None:
+            self.metrics.inc_value('lookup/upstream/failed')
+            return
+
+        item = future.result()
+        expires = None if item is not None else time.time() + self.not_found_ttl
+        self.memory.put(word, item, expires)
+        self.disk.put(word, item, expires)
+        self.metrics.inc_value(f"lookup/upstream/{'found' if item is not None else 'not_found'}")
+
+    async def answer(self, method, path):
+        """
+        :param method:
+        :param path: request target
+        :return: (status, JSON-serializable body)
+        """
+        if method != 'GET':
+            return 405, {'error': f"{method} is not allowed"}
+
+        path = path.split('?', 1)[0]
+        if path == '/metrics':
+            return 200, {**self.metrics.summary(), 'memory_entries': len(self.memory.entries),
+                         'disk_entries': self.disk.count, 'in_flight': len(self.in_flight)}
+
+        if not path.startswith('/words/'):
+            return 404, {'error': f"no route for {path}"}
+
+        word = normalize(unquote(path[len('/words/'):]))
+        if not word:
+            return 400, {'error': "no word"}
+
+        started = time.perf_counter()
+        try:
+            item = await self.get(word)
+        except Exception as exc:
+            logger.warning(f"lookup of {word} failed: {exc!r}")
+            return 502, {'word': word, 'error': repr(exc)}
+        finally:
+            self.metrics.observe('request', started)
+
+        if item is None:
+            return 404, {'word': word, 'error': "not found"}
+        return 200, item
+
+    async def handle(self, reader, writer):
+        """
+        serves the requests of a connection, kept alive unless the client asks otherwise.
+
+        :param reader:
+        :param writer:
+        :return:
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    status, body, version = 400, {'error': "malformed request line"}, 'HTTP/1.0'
+                else:
+                    status, body = await self.answer(method, path)
+
+                keep_alive = (
+                    headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1'
+                    else headers.get('connection', '').lower() == 'keep-alive'
+                )
+                data = ujson.dumps(body, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        """
+        :param host:
+        :param port:
+        :return: once SIGINT or SIGTERM is received
+        """
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f"lookup server listening on {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, server.close)
+
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                logger.info("lookup server stopped")
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.disk.close()
@@ -3,3 +3,5 @@
 # vim: ts=4: sw=4: et
 
 from .longman import *  # NOQA
+from .cambridge import *  # NOQA
+from .oxford import *  # NOQA
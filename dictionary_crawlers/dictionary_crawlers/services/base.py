@@ -1,4 +1,45 @@
-__all__ = ('ProcessMixin',)
+from collections.abc import Mapping
+from functools import lru_cache
+
+from lxml import etree
+
+from ..models import Entry
+
+__all__ = ('ProcessMixin', 'ExtractionPlan', 'compile_xpath', 'DefinitionService')
+
+
+@lru_cache(maxsize=None)
+def compile_xpath(expression: str):
+    """
+    compile an xpath expression once, identical expressions share the same compiled object.
+
+    :param expression: xpath expression
+    :return: etree.XPath
+    """
+    return etree.XPath(expression, smart_strings=False)
+
+
+class ExtractionPlan(Mapping):
+    """
+    a read-only `key -> etree.XPath` mapping compiled from a `key -> expression` mapping.
+    """
+
+    def __init__(self, mapping: dict):
+        """
+
+        :param mapping: key -> xpath expression
+        """
+        self.expressions = dict(mapping)
+        self._compiled = {key: compile_xpath(xpath) for key, xpath in self.expressions.items()}
+
+    def __getitem__(self, key):
+        return self._compiled[key]
+
+    def __iter__(self):
+        return iter(self._compiled)
+
+    def __len__(self):
+        return len(self._compiled)
 
 
 class ProcessMixin:
@@ -31,3 +72,77 @@ class ProcessMixin:
         :return:
         """
         return ''.join([base_url, *href])
+
+
+class DefinitionService(ProcessMixin):
+    """
+    Extracts the `Entry` models of a dictionary page, the subclasses implement `entries`.
+    """
+    # part of the `ParseCache` key, bump it whenever the definitions extracted by the service change
+    version = 1
+
+    def __init__(self, projection=None):
+        """
+
+        :param projection: the `Projection` of the crawl, the entries keep only its fields; all of them when None
+        """
+        self.projection = projection
+
+    @property
+    def header_keys(self):
+        """
+        :return: the entry headers to extract, all of them when None
+        """
+        return None if self.projection is None else self.projection.header
+
+    @property
+    def senses(self):
+        """
+        :return: False when the senses are not extracted
+        """
+        return self.projection is None or self.projection.senses
+
+    @property
+    def sense_items(self):
+        """
+        :return: the sense items to extract, e.g. "examples", all of them when None
+        """
+        return None if self.projection is None else self.projection.sense_items
+
+    def entries(self, root):
+        """
+
+        :param root: a parsed element selected by the spider
+        :return: its `Entry` models
+        """
+        raise NotImplementedError
+
+    def process(self, iterable):
+        """
+
+        :param iterable: elements already parsed by the spider, or their serialized html
+        :return: `Entry` models keyed by their position, starting from "1"
+        """
+        definitions = {}
+
+        for element in iterable:
+            if isinstance(element, str):
+                iterable_item = element.strip()
+                root = etree.HTML(iterable_item) if iterable_item else None
+            else:
+                root = element
+
+            if root is not None:
+                for entry in self.entries(root):
+                    definitions[str(len(definitions) + 1)] = entry
+
+        return definitions
+
+    @staticmethod
+    def load(definitions: dict):
+        """
+
+        :param definitions: the JSON shape of `process` output, e.g. from the parse cache
+        :return: `Entry` models keyed by their position
+        """
+        return {key: Entry.from_primitive(entry) for key, entry in definitions.items()}
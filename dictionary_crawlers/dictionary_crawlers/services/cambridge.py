@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import logging
+
+from ..models import Entry, Example, Sense
+from ..timing import timed
+from .base import DefinitionService, ExtractionPlan, ProcessMixin
+
+logger = logging.getLogger(__name__)
+
+CAMBRIDGE_SITE_URL = "https://dictionary.cambridge.org"
+
+__all__ = (
+    'CambridgeDefinitionService',
+)
+
+
+class CambridgeHeaderProcessor(ProcessMixin):
+    __XPATH_MAPPING__ = {
+        'hwd': ".//span[@class='hw dhw']//text()",
+        'pos': ".//span[@class='pos dpos']//text()",
+        'british_pron': ".//span[contains(@class, 'uk dpron-i')]//source[@type='audio/mpeg']/@src",
+        'american_pron': ".//span[contains(@class, 'us dpron-i')]//source[@type='audio/mpeg']/@src",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+    __AUDIO__ = ('british_pron', 'american_pron')
+
+    @timed('cambridge/header')
+    def __call__(self, root, keys=None, *args, **kwargs):
+        """
+
+        :param root: an `entry-body__el` block, or its `pos-header`
+        :param keys: the headers to extract, all of them when None
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        header = {}
+        for key, xpath in self.__PLAN__.items():
+            if keys is not None and key not in keys:
+                continue
+            value = xpath(root)
+            if value:
+                # audio sources are relative to the site
+                header[key] = self._join_url(CAMBRIDGE_SITE_URL, value[:1]) if key in self.__AUDIO__ else value[0]
+        return header
+
+
+class CambridgeSenseProcessor(ProcessMixin):
+    __XPATH_MAPPING__ = {
+        'block': ".//div[contains(@class, 'ddef_block')]",
+        # the guide word of the sense group holding the definition block, e.g. "BUYING AND SELLING"
+        'sign_post': (
+            "ancestor::div[contains(@class, 'dsense')][1]/h3//span[contains(@class, 'dsense_gw')]/span//text()"
+        ),
+        'main_def': "div[contains(@class, 'ddef_h')]/div[contains(@class, 'ddef_d')]//text()",
+        'gram': "div[contains(@class, 'ddef_h')]//span[contains(@class, 'dgram')]//text()",
+        'geo': "div[contains(@class, 'ddef_h')]//span[contains(@class, 'dregion')]//text()",
+        'field': "div[contains(@class, 'ddef_h')]//span[contains(@class, 'dlab')]//text()",
+        'example': "div[contains(@class, 'ddef_b')]/div[contains(@class, 'dexamp')]",
+        'example_text': "span[contains(@class, 'deg')]//text()",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+    __HEADER__ = ('sign_post', 'main_def', 'gram', 'geo', 'field')
+
+    @timed('cambridge/senses')
+    def __call__(self, root, items=None, *args, **kwargs):
+        """
+
+        :param root: an `entry-body__el` block
+        :param items: the sense items to extract, only "examples" on Cambridge, all of them when None
+        :param args:
+        :param kwargs:
+        :return: a `Sense` per definition block, numbered in document order
+        """
+        senses = []
+        for number, block in enumerate(self.__PLAN__['block'](root), start=1):
+            header = {}
+            for key in self.__HEADER__:
+                # definitions end with a colon when examples follow
+                value = self._join(self.__PLAN__[key](block)).rstrip(':').strip()
+                header.update({key: value}) if value else None
+
+            examples = [
+                Example(example=self._join(self.__PLAN__['example_text'](example)))
+                for example in self.__PLAN__['example'](block)
+            ] if items is None or 'examples' in items else []
+            senses.append(Sense(number=str(number), examples=examples, **header))
+        return senses
+
+
+class CambridgeDefinitionService(DefinitionService):
+    __XPATH_MAPPING__ = {
+        'entry': "descendant-or-self::div[contains(@class, 'entry-body__el')]",
+        'head': ".//div[contains(@class, 'pos-header')]",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+    __HEADER__ = CambridgeHeaderProcessor()
+    __SENSES__ = CambridgeSenseProcessor()
+
+    def entries(self, root):
+        """
+
+        :param root: an `entry-body__el` block, or an element holding them
+        :return:
+        """
+        definitions = []
+
+        for html in self.__PLAN__['entry'](root):
+            head = self.__PLAN__['head'](html)
+            headers = self.__HEADER__(head[0] if head else html, self.header_keys)
+
+            if headers:
+                senses = self.__SENSES__(html, self.sense_items) if self.senses else []
+                definitions.append(Entry(**headers, senses=senses))
+
+        return definitions
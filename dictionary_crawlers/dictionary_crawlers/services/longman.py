@@ -2,36 +2,53 @@ import logging
 
 from lxml import etree
 
-from .base import ProcessMixin
+from ..models import CrossRef, Entry, Example, GrammarExample, Sense
+from ..timing import timed
+from .base import DefinitionService, ExtractionPlan, ProcessMixin, compile_xpath
 
 logger = logging.getLogger(__name__)
 
 LONGMAN_SITE_URL = "https://www.ldoceonline.com"
+LONGMAN_DICTIONARY_URL = f"{LONGMAN_SITE_URL}/dictionary/"
+# the fields of a word page, loaded by `LongmanDictionarySpider` and `dictionary_crawlers.lookup`
+LONGMAN_ITEM_XPATH = {
+    'family_word': "//div[@class='wordfams']//text()",
+    'definition': "//span[@class='dictentry']",
+    'corpus': "//span[contains(@class, 'exaGroup')]",
+}
 
-__all__ = ('LongManDefinitionService',)
+__all__ = (
+    'LongManDefinitionService',
+    'LongManCorpusService',
+)
 
 
 class HeaderProcessor(ProcessMixin):
     __XPATH_MAPPING__ = {
-        'hwd': "//span[@class='HWD']//text()",
-        'hyphenation': "//span[@class='HYPHENATION']//text()",
-        'homnum': "//span[@class='HOMNUM']//text()",
-        'pos': "//span[@class='POS']//text()",
-        'british_pron': "//span[contains(@class, 'brefile')]/@data-src-mp3",
-        'american_pron': "//span[contains(@class, 'amefile')]/@data-src-mp3",
+        'hwd': ".//span[@class='HWD']//text()",
+        'hyphenation': ".//span[@class='HYPHENATION']//text()",
+        'homnum': ".//span[@class='HOMNUM']//text()",
+        'pos': ".//span[@class='POS']//text()",
+        'british_pron': ".//span[contains(@class, 'brefile')]/@data-src-mp3",
+        'american_pron': ".//span[contains(@class, 'amefile')]/@data-src-mp3",
     }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
 
-    def __call__(self, root, *args, **kwargs):
+    @timed('longman/header')
+    def __call__(self, root, keys=None, *args, **kwargs):
         """
 
-        :param root:
+        :param root: an entry or its `Head` span, every query is scoped to it
+        :param keys: the headers to extract, all of them when None
         :param args:
         :param kwargs:
         :return:
         """
         header = {}
-        for key, xpath in self.__XPATH_MAPPING__.items():
-            value = root.xpath(xpath)
+        for key, xpath in self.__PLAN__.items():
+            if keys is not None and key not in keys:
+                continue
+            value = xpath(root)
             header.update({key: self._first(value)}) if value else None
         return header
 
@@ -47,6 +64,28 @@ class SubHeaderProcessor(ProcessMixin):
         'gram': "span[@class='GRAM']//text()",
         'field': "span[@class='FIELD']//text()",
     }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+
+    # the same fields, read from a single span while walking a sense
+    __CLASS_MAPPING__ = {
+        'ACTIV': 'active',
+        'GEO': 'geo',
+        'SYN': 'syn',
+        'DEF': 'main_def',
+        'SIGNPOST': 'sign_post',
+        'GRAM': 'gram',
+        'FIELD': 'field',
+    }
+    __TEXT_PLAN__ = ExtractionPlan({
+        'number': ".//text()",
+        'active': ".//text()",
+        'geo': ".//text()",
+        'syn': "text()",
+        'main_def': ".//text()",
+        'sign_post': ".//text()",
+        'gram': ".//text()",
+        'field': ".//text()",
+    })
 
     def __call__(self, root, *args, **kwargs):
         """
@@ -57,14 +96,38 @@ class SubHeaderProcessor(ProcessMixin):
         :return:
         """
         header = {}
-        for key, xpath in self.__XPATH_MAPPING__.items():
-            value = root.xpath(xpath)
+        for key, xpath in self.__PLAN__.items():
+            value = xpath(root)
             header.update({key: self._join(value)}) if value else None
         return header
 
+    def extract(self, key, element):
+        """
+
+        :param key: header field
+        :param element: the span which holds the field
+        :return: text nodes of the field
+        """
+        return self.__TEXT_PLAN__[key](element)
+
+    def build(self, parts: dict):
+        """
+
+        :param parts: header field -> collected text nodes
+        :return: the header, in the same shape `__call__` returns
+        """
+        return {key: self._join(parts[key]) for key in self.__XPATH_MAPPING__ if key in parts}
+
 
 class RefProcessor(ProcessMixin):
-    __XPATH__ = "span[@class='Crossref']/a"
+    __XPATH__ = "span[@class='Crossref']"
+    __XPATH_MAPPING__ = {
+        'anchor': "a",
+        'example': "@title",
+        'link': "@href",
+    }
+    __SELECT__ = compile_xpath(__XPATH__)
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
 
     def __call__(self, root, *args, **kwargs):
         """
@@ -75,16 +138,32 @@ class RefProcessor(ProcessMixin):
         :return:
         """
         items = []
-        for cross_ref in root.xpath(self.__XPATH__):
-            items.append({
-                'example': self._join(cross_ref.xpath("@title")),
-                'link': self._join_url(LONGMAN_SITE_URL, cross_ref.xpath("@href"))
-            })
+        for cross_ref in self.__SELECT__(root):
+            items.extend(self.extract(cross_ref))
         return items
 
+    @timed('longman/sense/refs')
+    def extract(self, element):
+        """
+
+        :param element: a `Crossref` span
+        :return:
+        """
+        for anchor in self.__PLAN__['anchor'](element):
+            yield CrossRef(
+                example=self._join(self.__PLAN__['example'](anchor)),
+                link=self._join_url(LONGMAN_SITE_URL, self.__PLAN__['link'](anchor)),
+            )
+
 
 class ExampleProcessor(ProcessMixin):
     __XPATH__ = "span[@class='EXAMPLE']"
+    __XPATH_MAPPING__ = {
+        'example': "text()",
+        'audio': "span[1]//@data-src-mp3",
+    }
+    __SELECT__ = compile_xpath(__XPATH__)
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
 
     def __call__(self, root, *args, **kwargs):
         """
@@ -94,18 +173,33 @@ class ExampleProcessor(ProcessMixin):
         :param kwargs:
         :return:
         """
-
         items = []
-        for example in root.xpath():
-            items.append({
-                'example': self._join(example.xpath("text()")),
-                'audio': self._first(example.xpath("span[1]//@data-src-mp3"))
-            })
+        for example in self.__SELECT__(root):
+            items.extend(self.extract(example))
         return items
 
+    @timed('longman/sense/examples')
+    def extract(self, element):
+        """
+
+        :param element: an `EXAMPLE` span
+        :return:
+        """
+        yield Example(
+            example=self._join(self.__PLAN__['example'](element)),
+            audio=self._first(self.__PLAN__['audio'](element)),
+        )
+
 
 class GrammarExampleProcessor(ProcessMixin):
     __XPATH__ = "span[@class='GramExa']"
+    __XPATH_MAPPING__ = {
+        'example': "span[1]//text()",
+        'audio': "span[2]//@data-src-mp3",
+        'text': "span[2]/text()",
+    }
+    __SELECT__ = compile_xpath(__XPATH__)
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
 
     def __call__(self, root, *args, **kwargs):
         """
@@ -116,17 +210,32 @@ class GrammarExampleProcessor(ProcessMixin):
         :return:
         """
         items = []
-        for grammar_example in root.xpath(self.__XPATH__):
-            items.append({
-                'example': self._join(grammar_example.xpath("span[1]//text()")),
-                'audio': self._first(grammar_example.xpath("span[2]//@data-src-mp3")),
-                'text': self._join(grammar_example.xpath("span[2]/text()"))
-            })
+        for grammar_example in self.__SELECT__(root):
+            items.extend(self.extract(grammar_example))
         return items
 
+    @timed('longman/sense/grammar_examples')
+    def extract(self, element):
+        """
+
+        :param element: a `GramExa` span
+        :return:
+        """
+        yield GrammarExample(
+            example=self._join(self.__PLAN__['example'](element)),
+            audio=self._first(self.__PLAN__['audio'](element)),
+            text=self._join(self.__PLAN__['text'](element)),
+        )
+
 
 class CollocationExampleProcessor(ProcessMixin):
     __XPATH__ = "span[@class='ColloExa']"
+    __XPATH_MAPPING__ = {
+        'example': "span[1]//text()",
+        'audio': "span[2]//@data-src-mp3",
+    }
+    __SELECT__ = compile_xpath(__XPATH__)
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
 
     def __call__(self, root, *args, **kwargs):
         """
@@ -137,104 +246,228 @@ class CollocationExampleProcessor(ProcessMixin):
         :return:
         """
         items = []
-        for collocation_example in root.xpath(self.__XPATH__):
-            items.append({
-                'example': self._join(collocation_example.xpath("span[1]//text()")),
-                'audio': self._first(collocation_example.xpath("span[2]//@data-src-mp3"))
-            })
+        for collocation_example in self.__SELECT__(root):
+            items.extend(self.extract(collocation_example))
         return items
 
+    @timed('longman/sense/collocation_examples')
+    def extract(self, element):
+        """
+
+        :param element: a `ColloExa` span
+        :return:
+        """
+        yield Example(
+            example=self._join(self.__PLAN__['example'](element)),
+            audio=self._first(self.__PLAN__['audio'](element)),
+        )
+
 
 class IdocProcessor:
+    """
+    Walks every `ldoceEntry` subtree once and dispatches each span on its class:
+    `Head` to the header processor, `Sense` and `Subsense` to the sense walker, and
+    the example/crossref spans of a sense to their processors.
+    """
+    __XPATH_MAPPING__ = {
+        'entry': ".//span[@class='ldoceEntry Entry']",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+    __HEADER__ = HeaderProcessor()
+    __SUB_HEADER__ = SubHeaderProcessor()
+
+    # span class -> (key, processor)
     __EXAMPLE_ITEMS__ = {
-        "header": SubHeaderProcessor(),
-        "refs": RefProcessor(),
-        "examples": ExampleProcessor(),
-        "grammar_examples": GrammarExampleProcessor(),
-        "collocation_examples": CollocationExampleProcessor()
+        "Crossref": ("refs", RefProcessor()),
+        "EXAMPLE": ("examples", ExampleProcessor()),
+        "GramExa": ("grammar_examples", GrammarExampleProcessor()),
+        "ColloExa": ("collocation_examples", CollocationExampleProcessor()),
     }
+    __HEAD__ = 'Head'
+    __SENSE__ = 'Sense'
+    __SUB_SENSE__ = 'Subsense'
 
-    def __init__(self, root):
+    def __init__(self, root, projection=None):
         """
 
-        :param root:
+        :param root: a parsed document or any element holding `ldoceEntry` spans
+        :param projection: the `Projection` of the crawl, the spans of the other fields are skipped
         """
         self.root = root
+        self.header_keys = None
+        self.senses = True
+        self.example_items = self.__EXAMPLE_ITEMS__
 
-    @staticmethod
-    def __extract_header__(root):
-        return HeaderProcessor()(root)
+        if projection is not None:
+            self.header_keys = projection.header
+            self.senses = projection.senses
+            self.example_items = {
+                class_name: item for class_name, item in self.__EXAMPLE_ITEMS__.items()
+                if projection.wants_sense_item(item[0])
+            }
 
-    @staticmethod
-    def __extract_sense(root):
-        definition = {}
-        for key, processor in IdocProcessor.__EXAMPLE_ITEMS__.items():
-            processed_items = processor(root)
-            definition.update({key: processed_items}) if processed_items else None
-        return definition
+    def __extract_header__(self, root):
+        return self.__HEADER__(root, self.header_keys)
 
-    def process(self):
+    @staticmethod
+    @timed('longman/sense')
+    def __extract_sense(root, example_items=__EXAMPLE_ITEMS__):
         """
+        one pass over the direct children of a `Sense` or `Subsense` span.
 
+        :param root:
+        :param example_items: span class -> (key, processor) of the extracted items, the other ones are skipped
         :return:
         """
-        definitions = []
+        header_parts = {}
+        items = {}
+        sub_senses = []
 
-        for html in self.root.xpath("//span[@class='ldoceEntry Entry']"):
-            headers = self.__extract_header__(html)
+        for position, child in enumerate(root.iterchildren('span')):
+            class_name = child.get('class')
 
-            if headers:
-                senses = []
-                for sense in html.xpath("//span[@class='Sense']"):
-                    sense_item = self.__extract_sense(sense)
+            if position == 0:
+                header_parts['number'] = IdocProcessor.__SUB_HEADER__.extract('number', child)
+
+            if class_name in SubHeaderProcessor.__CLASS_MAPPING__:
+                key = SubHeaderProcessor.__CLASS_MAPPING__[class_name]
+                header_parts.setdefault(key, []).extend(IdocProcessor.__SUB_HEADER__.extract(key, child))
+
+            elif class_name in example_items:
+                key, processor = example_items[class_name]
+                items.setdefault(key, []).extend(processor.extract(child))
 
-                    sub_senses = []
-                    for sub_sense in sense.xpath("span[@class='Subsense']"):
-                        sub_senses.append(self.__extract_sense(sub_sense))
+            elif class_name == IdocProcessor.__SUB_SENSE__:
+                sub_senses.append(IdocProcessor.__extract_sense(child, example_items))
 
-                    sense_item.update({'sub_senses': sub_senses}) if sub_senses else None
-                    senses.append(sense_item)
+        return Sense(**IdocProcessor.__SUB_HEADER__.build(header_parts), **items, sub_senses=sub_senses)
 
-                headers['senses'] = senses
-                definitions.append(headers)
+    def __walk_entry(self, entry):
+        """
+        :param entry: an `ldoceEntry` span
+        :return: (head, senses), senses nested in wrapper spans are collected in document order; without senses
+            the walk stops at the head
+        """
+        head = None
+        senses = []
+        stack = [iter(entry.iterchildren('span'))]
+
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                continue
+
+            class_name = child.get('class', '')
+            if class_name == self.__SENSE__:
+                if self.senses:
+                    senses.append(self.__extract_sense(child, self.example_items))
+            elif head is None and self.__HEAD__ in class_name.split():
+                head = child
+                if not self.senses:
+                    break
+            else:
+                stack.append(iter(child.iterchildren('span')))
+
+        return head, senses
+
+    @timed('longman/idoc')
+    def process(self):
+        """
+
+        :return: an `Entry` per `ldoceEntry` span
+        """
+        definitions = []
+
+        for html in self.__PLAN__['entry'](self.root):
+            head, senses = self.__walk_entry(html)
+            headers = self.__extract_header__(html if head is None else head)
+
+            if headers:
+                definitions.append(Entry(**headers, senses=senses))
 
         return definitions
 
 
 class CorpusProcessor(ProcessMixin):
+    """
+    Streams the corpus examples of `exaGroup` elements, group by group.
+    """
+    __XPATH_MAPPING__ = {
+        'title': "span[@class='title']//text()",
+        'example': "span[contains(@class, 'cexa1g')]",
+        'text': ".//text()",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
 
-    def __init__(self, root):
-        self.root = root
+    def __init__(self, groups, limit=None):
+        """
 
-    def process(self):
-        corpus = {}
+        :param groups: `exaGroup` elements
+        :param limit: stop after this many examples in total
+        """
+        self.groups = groups
+        self.limit = limit
+
+    def __iter__(self):
+        """
+        :return: (title, examples) of every group, until the limit is reached
+        """
+        remaining = self.limit
+
+        for group in self.groups:
+            if remaining is not None and remaining <= 0:
+                return
 
-        for html in self.root.xpath(f"//span[contains(@class, 'exaGroup')]"):
-            title = self._first(html.xpath("//span[@class='title']//text()"))
+            title = self._first(self.__PLAN__['title'](group))
             examples = []
-            for elem in html.xpath(f"//span[contains(@class, 'cexa1g')]"):
-                example = self._join(elem.xpath("string()"))
+            for elem in self.__PLAN__['example'](group):
+                if remaining is not None and len(examples) >= remaining:
+                    break
+                example = self._join(self.__PLAN__['text'](elem))
                 # remove the first dot
                 examples.append(example[1:].strip())
 
-            corpus[title] = examples
+            if remaining is not None:
+                remaining -= len(examples)
 
+            yield title, examples
 
-class LongManDefinitionService(ProcessMixin):
 
-    def process(self, iterable):
+class LongManDefinitionService(DefinitionService):
+
+    def entries(self, root):
         """
 
-        :param iterable:
+        :param root: a `dictentry` element
         :return:
         """
-        definitions = {}
+        return IdocProcessor(root, self.projection).process()
 
-        for idx, element in enumerate(iterable):
-            iterable_item = element.strip() if isinstance(element, str) else None
 
-            if iterable_item:
-                root = etree.HTML(iterable_item)
-                idocs = IdocProcessor(root).process()
+class LongManCorpusService(ProcessMixin):
 
-        return definitions
+    def process(self, iterable, limit=None):
+        """
+
+        :param iterable: `exaGroup` elements already parsed by the spider, or their serialized html
+        :param limit: examples kept per word, all of them when None
+        :return: examples keyed by their group title
+        """
+        corpus = {}
+
+        for title, examples in CorpusProcessor(self.__groups(iterable), limit):
+            corpus.setdefault(title, []).extend(examples)
+
+        return corpus
+
+    @staticmethod
+    def __groups(iterable):
+        for element in iterable:
+            if isinstance(element, str):
+                iterable_item = element.strip()
+                if iterable_item:
+                    # the html is wrapped in <html><body>
+                    yield etree.HTML(iterable_item)[0][0]
+            else:
+                yield element
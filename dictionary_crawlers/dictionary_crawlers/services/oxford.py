@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import logging
+
+from ..models import CrossRef, Entry, Example, Sense
+from ..timing import timed
+from .base import DefinitionService, ExtractionPlan, ProcessMixin
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'OxfordDefinitionService',
+)
+
+
+class OxfordHeaderProcessor(ProcessMixin):
+    __XPATH_MAPPING__ = {
+        'hwd': ".//h1[contains(@class, 'headword')]//text()",
+        'pos': ".//span[@class='pos']//text()",
+        'british_pron': ".//div[contains(@class, 'phons_br')]/div[contains(@class, 'sound')]/@data-src-mp3",
+        'american_pron': ".//div[contains(@class, 'phons_n_am')]/div[contains(@class, 'sound')]/@data-src-mp3",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+
+    @timed('oxford/header')
+    def __call__(self, root, keys=None, *args, **kwargs):
+        """
+
+        :param root: the `webtop` block of an entry
+        :param keys: the headers to extract, all of them when None
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        header = {}
+        for key, xpath in self.__PLAN__.items():
+            if keys is not None and key not in keys:
+                continue
+            value = xpath(root)
+            if key == 'hwd':
+                value = [self._join(value)] if value else value
+            header.update({key: self._first(value)}) if value else None
+        return header
+
+
+class OxfordSenseProcessor(ProcessMixin):
+    __XPATH_MAPPING__ = {
+        # idioms and phrasal verbs have senses of their own, they are not senses of the headword
+        'sense': ".//li[@class='sense'][not(ancestor::div[@class='idioms'])][not(ancestor::span[@class='idm-g'])]",
+        'number': "@sensenum",
+        'sign_post': "ancestor::span[@class='shcut-g'][1]/h2[@class='shcut']//text()",
+        'main_def': "span[@class='def']//text()",
+        'gram': "span[@class='grammar']//text()",
+        'field': "span[@class='labels']//text()",
+        'ref': "span[@class='xrefs']//a[@class='Ref']",
+        'ref_text': ".//text()",
+        'ref_link': "@href",
+        'example': "ul[@class='examples']/li",
+        'example_text': "span[@class='x']//text()",
+        'example_audio': ".//@data-src-mp3",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+    __HEADER__ = ('number', 'sign_post', 'main_def', 'gram', 'field')
+
+    @timed('oxford/senses')
+    def __call__(self, root, items=None, *args, **kwargs):
+        """
+
+        :param root: an entry
+        :param items: the sense items to extract, "refs" and "examples", all of them when None
+        :param args:
+        :param kwargs:
+        :return: a `Sense` per `sense` item of the headword
+        """
+        senses = []
+        for sense in self.__PLAN__['sense'](root):
+            header = {}
+            for key in self.__HEADER__:
+                value = self._join(self.__PLAN__[key](sense))
+                header.update({key: value}) if value else None
+
+            refs = [
+                CrossRef(
+                    example=self._join(self.__PLAN__['ref_text'](ref)),
+                    link=self._first(self.__PLAN__['ref_link'](ref)),
+                )
+                for ref in self.__PLAN__['ref'](sense)
+            ] if items is None or 'refs' in items else []
+            examples = [
+                Example(
+                    example=self._join(self.__PLAN__['example_text'](example)),
+                    audio=self._first(self.__PLAN__['example_audio'](example)),
+                )
+                for example in self.__PLAN__['example'](sense)
+            ] if items is None or 'examples' in items else []
+            senses.append(Sense(refs=refs, examples=examples, **header))
+        return senses
+
+
+class OxfordDefinitionService(DefinitionService):
+    """
+    An Oxford page holds a single homograph, e.g. `market_1`, the others have pages of their own.
+    """
+    __XPATH_MAPPING__ = {
+        'entry': "descendant-or-self::div[@class='entry']",
+        'head': ".//div[contains(@class, 'webtop')]",
+    }
+    __PLAN__ = ExtractionPlan(__XPATH_MAPPING__)
+    __HEADER__ = OxfordHeaderProcessor()
+    __SENSES__ = OxfordSenseProcessor()
+
+    def entries(self, root):
+        """
+
+        :param root: the `entry` block of the page
+        :return:
+        """
+        definitions = []
+
+        for html in self.__PLAN__['entry'](root):
+            head = self.__PLAN__['head'](html)
+            headers = self.__HEADER__(head[0] if head else html, self.header_keys)
+
+            if headers:
+                senses = self.__SENSES__(html, self.sense_items) if self.senses else []
+                definitions.append(Entry(**headers, senses=senses))
+
+        return definitions
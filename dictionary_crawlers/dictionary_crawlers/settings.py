@@ -18,6 +18,7 @@ BOT_NAME = 'dictionary_crawlers'
 
 SPIDER_MODULES = ['dictionary_crawlers.spiders']
 NEWSPIDER_MODULE = 'dictionary_crawlers.spiders'
+COMMANDS_MODULE = 'dictionary_crawlers.commands'
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 # USER_AGENT = 'dictionary_crawlers (+http://www.yourdomain.com)'
@@ -27,6 +28,17 @@ ROBOTSTXT_OBEY = False
 
 MEDIA_ALLOW_REDIRECTS = True
 
+# Pronunciations and example audio, see `DictionaryFilePipeline`
+FILES_STORE = 'media'
+FILES_RESULT_FIELD = 'audio_files'
+# Index of the stored audio, kept across crawls
+AUDIO_INDEX_DIR = 'media'
+# Audio downloads get their own concurrency budget
+AUDIO_DOWNLOAD_SLOT = 'audio'
+DOWNLOAD_SLOTS = {
+    AUDIO_DOWNLOAD_SLOT: {'concurrency': 4, 'delay': 0},
+}
+
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 # CONCURRENT_REQUESTS = 32
 
@@ -60,22 +72,158 @@ SPIDER_MIDDLEWARES = {
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
-    'dictionary_crawlers.middlewares.DictionaryCrawlersDownloaderMiddleware': 543,
+    # above RetryMiddleware (550), the throttle must see the 429s and 5xx it retries
+    'dictionary_crawlers.middlewares.DictionaryCrawlersDownloaderMiddleware': 560,
 }
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-# EXTENSIONS = {
-#    'scrapy.extensions.telnet.TelnetConsole': None,
-# }
+EXTENSIONS = {
+    # 'scrapy.extensions.telnet.TelnetConsole': None,
+    'dictionary_crawlers.timing.TimingStats': 500,
+    'dictionary_crawlers.archive.PageArchive': 510,
+    'dictionary_crawlers.memory.MemoryMonitor': 520,
+    'dictionary_crawlers.memory.MemoryCeiling': 530,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
-    'dictionary_crawlers.pipelines.DictionaryCrawlersPipeline': 100,
+    'dictionary_crawlers.pipelines.ParsedFieldsPipeline': 50,
     'dictionary_crawlers.pipelines.DictionaryFilePipeline': 200,
+    'dictionary_crawlers.pipelines.JsonLinesExportPipeline': 300,
+    'dictionary_crawlers.pipelines.SQLiteExportPipeline': 310,
+    'dictionary_crawlers.pipelines.CheckpointPipeline': 400,
 }
 
+# JSON lines export, items are written in batches to size- or count-bounded shards
+EXPORT_DIR = 'exports'
+EXPORT_BATCH_SIZE = 500
+EXPORT_SHARD_MAX_ITEMS = 100000
+EXPORT_SHARD_MAX_BYTES = 256 * 1024 * 1024
+EXPORT_GZIP = True
+# EXPORT_GZIP_LEVEL = 6
+
+# Normalized sqlite tables of the entries, senses, examples, crossrefs and audio, loaded along the JSON lines export
+# when a path is set; one transaction per `SQLITE_EXPORT_BATCH_SIZE` items, the indexes are built at the end
+# SQLITE_EXPORT_PATH = 'exports/dictionary.sqlite'
+SQLITE_EXPORT_BATCH_SIZE = 1000
+
+# Discovery crawl (`-a discover=1`): family words and crossref targets are crawled too.
+# Visited words are kept in a bloom filter backed by an exact sqlite table.
+DISCOVERY_BLOOM_CAPACITY = 1000000
+DISCOVERY_BLOOM_ERROR_RATE = 0.001
+# Stop scheduling words past this number (`-a budget=...` overrides it)
+# DISCOVERY_WORD_BUDGET = 50000
+
+# Shared frontier (`-a frontier=...` overrides it): words leased per batch, and seconds before the words of
+# a worker which did not complete them are leased again
+# FRONTIER_URL = 'sqlite:///crawls/frontier.db'  # or 'redis://host:6379/0'
+FRONTIER_BATCH_SIZE = 100
+FRONTIER_LEASE_SECONDS = 600
+# Completions are written to the frontier in one transaction per batch of words, or every few seconds
+FRONTIER_COMPLETE_BATCH_SIZE = 50
+FRONTIER_FLUSH_SECONDS = 5
+# Worker name in the frontier (`-a worker=...` overrides it, default: host name and pid)
+# FRONTIER_WORKER = 'box-1'
+
+# Raw pages appended to gzip segments in `ARCHIVE_DIR`, `scrapy reparse` extracts their items again offline.
+# A segment is closed once it holds `ARCHIVE_SEGMENT_MAX_BYTES` bytes
+ARCHIVE_ENABLED = False
+ARCHIVE_DIR = 'archive'
+ARCHIVE_SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+ARCHIVE_GZIP_LEVEL = 6
+
+# `scrapy serve`, single word lookups over HTTP. Items are cached in memory (`LOOKUP_MEMORY_ENTRIES`) and on disk
+# (`LOOKUP_DISK_ENTRIES`), words which don't exist for `LOOKUP_NOT_FOUND_TTL` seconds
+LOOKUP_HOST = '127.0.0.1'
+LOOKUP_PORT = 8080
+LOOKUP_CACHE_DIR = 'lookup-cache'
+LOOKUP_MEMORY_ENTRIES = 10000
+LOOKUP_DISK_ENTRIES = 1000000
+LOOKUP_NOT_FOUND_TTL = 24 * 60 * 60
+# Concurrent upstream fetches, and their timeout in seconds
+LOOKUP_WORKERS = 8
+LOOKUP_TIMEOUT = 10
+# LOOKUP_BASE_URL = 'https://www.ldoceonline.com/dictionary/'
+
+# Progress of the words kept in `CHECKPOINT_DIR/<spider>`, completed words are skipped when the crawl is started
+# again and `scrapy retry <spider>` crawls the failed ones. A word is marked once its item is written to `EXPORT_DIR`,
+# marks are written every `CHECKPOINT_BATCH_SIZE` words, the export and the marks every `CHECKPOINT_FLUSH_SECONDS`
+CHECKPOINT_ENABLED = False
+CHECKPOINT_DIR = 'checkpoints'
+CHECKPOINT_BATCH_SIZE = 1000
+CHECKPOINT_FLUSH_SECONDS = 30
+
+# Aliases of the canonical words kept in `ALIASES_DIR/<spider>`, learned from redirects and from the headword of the
+# pages, with the item of their canonical word; a known alias reuses it instead of downloading its page
+ALIASES_ENABLED = False
+ALIASES_DIR = 'aliases'
+
+# Corpus examples kept per word
+CORPUS_MAX_EXAMPLES = 100
+
+# `dictionaries` spider: seconds a source is given to answer a word, its retries included (a retry gets the time
+# left), before the word is emitted without it; and the retries of a source
+FANOUT_SOURCE_TIMEOUT = 30
+FANOUT_SOURCE_RETRIES = 1
+
+# Run the definition and corpus extraction in a worker pool instead of the reactor thread
+# PARSE_POOL_ENABLED = True
+# "thread" or "process"
+# PARSE_POOL_TYPE = 'thread'
+# Number of workers (default: number of cores)
+# PARSE_POOL_SIZE = 8
+# Jobs waiting for a free worker (default: twice the pool size)
+# PARSE_POOL_QUEUE_DEPTH = 16
+
+# Re-crawl cache: conditional requests (ETag/Last-Modified) for known pages and
+# memoized definitions for unchanged entries, both kept as sqlite files in one directory
+RECRAWL_CACHE_ENABLED = False
+RECRAWL_CACHE_DIR = 'recrawl-cache'
+# Bound of the stored (compressed) page bodies
+RECRAWL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Bound of the memoized definitions
+PARSE_CACHE_MAX_ENTRIES = 200000
+
+# Adaptive throttle: AIMD concurrency and delay per download slot, driven by the time to first byte,
+# the error rate and the 429s of the slot; pages and audio are separate slots. Leave AutoThrottle disabled with it
+THROTTLE_ENABLED = False
+# Responses, or seconds, between two decisions of a slot
+THROTTLE_WINDOW = 20
+THROTTLE_WINDOW_SECONDS = 10
+# Time to first byte (seconds) above which a slot backs off
+THROTTLE_TARGET_TTFB = 1.0
+# Share of 5xx and download errors above which a slot backs off
+THROTTLE_MAX_ERROR_RATE = 0.05
+THROTTLE_PAGE_MAX_CONCURRENCY = 16
+THROTTLE_MEDIA_MAX_CONCURRENCY = 8
+# THROTTLE_BACKOFF = 0.5
+# THROTTLE_DELAY_STEP = 0.25
+# THROTTLE_MAX_DELAY = 30
+
+# Hot path timings: histograms per stage (item loading, processors, pipelines) in the crawl stats (`timing/*`)
+TIMING_ENABLED = False
+# Seconds between two dumps of the histograms to the stats and the log
+TIMING_DUMP_INTERVAL = 60
+# cProfile one item loading in N, written to `TIMING_PROFILE_DIR` (disabled when 0)
+TIMING_PROFILE_SAMPLE = 0
+TIMING_PROFILE_DIR = 'profiles'
+
+# Memory attribution (slow, to find a leak): a tracemalloc snapshot every `MEMORY_MONITOR_INTERVAL` seconds, its
+# growth per project line and live object counts written to `MEMORY_MONITOR_DIR` and to the crawl stats (`memory/*`)
+MEMORY_MONITOR_ENABLED = False
+MEMORY_MONITOR_INTERVAL = 300
+MEMORY_MONITOR_FRAMES = 16
+MEMORY_MONITOR_TOP = 20
+MEMORY_MONITOR_DIR = 'memory'
+# Soft RSS ceiling, disabled when 0: scheduling pauses above it and resumes under `MEMORY_RESUME_RATIO` of it, or
+# after `MEMORY_MAX_PAUSE` seconds
+MEMORY_SOFT_LIMIT_MB = 0
+MEMORY_RESUME_RATIO = 0.9
+MEMORY_MAX_PAUSE = 300
+MEMORY_CHECK_INTERVAL = 5
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 # AUTOTHROTTLE_ENABLED = True
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Signals of the dictionary spiders, on top of `scrapy.signals`.
+"""
+
+__all__ = (
+    'word_failed',
+    'items_exported',
+)
+
+# sent with (word, failure, spider) when the request of a word fails for good, or its callback raises
+word_failed = object()
+
+# sent with (items, spider) once `JsonLinesExportPipeline` has written a batch of items to disk
+items_exported = object()
@@ -2,68 +2,622 @@
 # -*- coding: utf-8 -*-
 # vim: ts=4: sw=4: et
 
+import itertools
 import logging
+import os
+import shutil
+import tempfile
+from urllib.parse import unquote, urlsplit
 
 import scrapy
+from itemadapter import ItemAdapter
+from itemloaders.processors import TakeFirst
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
 from scrapy.loader import ItemLoader
+from twisted.internet import task
 
-from ..processors import default_input_processor, default_output_processor
+from ..aliases import AliasStore
+from ..cache import ParseCache
+from ..checkpoint import ProgressStore
+from ..discovery import Discovery, VisitedSet
+from ..frontier import default_worker, open_frontier
+from ..models import to_primitive
+from ..pool import ParsePool
+from ..projection import Projection, found
+from ..signals import items_exported, word_failed
+from ..timing import profiled, timed
+from ..wordlist import WordStream, normalize, parse_shard, read_wordlist
 
 logger = logging.getLogger(__name__)
 
+# item loader fields keep their first value
+default_input_processor = TakeFirst()
+default_output_processor = TakeFirst()
+
 
 class BaseSpider(scrapy.Spider):
     name = None
     base_url = None
     item_loader_cls = None
     item_loader_xpath = None
+    parse_pool = None
+    parse_cache = None
+    discovery = None
+    frontier = None
+    checkpoint = None
+    aliases = None
+    # the JSON lines export, the words of the items are marked and completed once it wrote them, see `items_exported`
+    exporter = None
+    request_headers = {
+        'content-type': 'application/json',
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, '
+                      'like Gecko) Chrome/85.0.4183.102 Safari/537.36',
+    }
 
-    def __init__(self, **kwargs):
+    def __init__(self, wordlist=None, shard=None, discover=None, budget=None, frequencies=None, frontier=None,
+                 worker=None, retry=None, fields=None, **kwargs):
         """
-        :param kwargs:
+        :param wordlist: path of a plain-text or gzip file with one word per line
+        :param shard: "i/n", crawl only the i-th of n deterministic shards of the words
+        :param discover: also crawl the words found on the crawled pages, see `discover_words`
+        :param budget: number of words a discovery crawl stops at, seeds included (default: `DISCOVERY_WORD_BUDGET`)
+        :param frequencies: word list ordered from the most frequent word, a discovery crawl follows this order
+            instead of the depth
+        :param frontier: url of a frontier shared with other workers (default: `FRONTIER_URL`), see
+            `dictionary_crawlers.frontier`; the words and the word list are pushed to it, and the words to crawl are
+            leased from it
+        :param worker: name of this worker in the frontier (default: `FRONTIER_WORKER`, or host and pid)
+        :param retry: crawl again the words which failed in the previous crawls, instead of the given words, see
+            `CHECKPOINT_ENABLED`
+        :param fields: comma separated fields to extract, e.g. "hwd,pos,british_pron", the extraction skips the
+            others, see `dictionary_crawlers.projection`
+        :param kwargs: words to crawl, e.g. `-a word=market`
         """
         assert self.base_url is not None, "`base_url` is required!"
         assert self.item_loader_xpath is not None, "`item_loader_xpath` is required!"
 
         # initialize variables
-        self.start_urls = tuple(self.base_url + word for word in kwargs.values())
+        self.words = tuple(kwargs.values())
+        self.start_urls = tuple(self.base_url + word for word in self.words)
+        self.wordlist = wordlist
+        self.shard = parse_shard(shard) if shard else (0, 1)
+        self.discover = discover not in (None, '', '0', 'false', 'False')
+        self.budget = int(budget) if budget else None
+        self.frequencies = frequencies
+        self.frontier_url = frontier
+        self.worker = worker
+        self.retry = retry not in (None, '', '0', 'false', 'False')
+        self.projection = Projection.parse(fields)
         name = self.__class__.__name__ if self.name is None else self.name
 
         super(BaseSpider, self).__init__(name, **kwargs)
 
-    def start_requests(self):
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
         """
+        :param crawler:
+        :param args:
+        :param kwargs:
         :return:
         """
-        headers = {
-            'content-type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, '
-                          'like Gecko) Chrome/85.0.4183.102 Safari/537.36',
-        }
-        for url in self.start_urls:
-            yield scrapy.Request(url=url, callback=self.parse, headers=headers)
+        spider = super(BaseSpider, cls).from_crawler(crawler, *args, **kwargs)
 
-    def parse(self, response, **kwargs):
+        if crawler.settings.getbool('PARSE_POOL_ENABLED'):
+            crawler.signals.connect(spider.open_parse_pool, signal=signals.spider_opened)
+
+        if crawler.settings.getbool('RECRAWL_CACHE_ENABLED'):
+            crawler.signals.connect(spider.open_parse_cache, signal=signals.spider_opened)
+
+        if spider.discover:
+            crawler.signals.connect(spider.open_discovery, signal=signals.spider_opened)
+
+        spider.frontier_url = spider.frontier_url or crawler.settings.get('FRONTIER_URL')
+        if spider.frontier_url:
+            assert not spider.discover, "a discovery crawl can't use a shared frontier!"
+            crawler.signals.connect(spider.open_frontier, signal=signals.spider_opened)
+
+        if crawler.settings.getbool('CHECKPOINT_ENABLED'):
+            crawler.signals.connect(spider.open_checkpoint, signal=signals.spider_opened)
+        else:
+            assert not spider.retry, "a retry crawl needs `CHECKPOINT_ENABLED`!"
+
+        # the fan-out spider has no item of its own, it crawls the pages of the other spiders
+        if crawler.settings.getbool('ALIASES_ENABLED') and spider.item_loader_cls is not None:
+            crawler.signals.connect(spider.open_aliases, signal=signals.spider_opened)
+
+        crawler.signals.connect(spider.callback_failed, signal=signals.spider_error)
+
+        return spider
+
+    def open_parse_pool(self):
         """
-        response.xpath("//span[contains(@class, 'Head')]//text()").getall()
+        stats are only available once the crawl starts, so the pool is created when the spider opens.
+
+        :return:
+        """
+        self.parse_pool = ParsePool.from_crawler(self.crawler)
+        self.crawler.signals.connect(self.parse_pool.close, signal=signals.spider_closed)
+
+    def open_parse_cache(self):
+        """
+        definitions of the entries extracted by previous crawls, keyed on the `dictentry` content.
+
+        :return:
+        """
+        self.parse_cache = ParseCache(
+            self.settings.get('RECRAWL_CACHE_DIR'),
+            max_entries=self.settings.getint('PARSE_CACHE_MAX_ENTRIES'),
+            stats=self.crawler.stats,
+        )
+        self.crawler.signals.connect(self.parse_cache.close, signal=signals.spider_closed)
+
+    def open_discovery(self):
+        """
+        the visited words are kept in `JOBDIR`, along with the scheduler queue, or only for this crawl.
+
+        :return:
+        """
+        jobdir = self.settings.get('JOBDIR')
+        directory = os.path.join(jobdir, 'discovery') if jobdir else tempfile.mkdtemp(prefix='discovery-')
+
+        visited = VisitedSet(
+            directory,
+            capacity=self.settings.getint('DISCOVERY_BLOOM_CAPACITY', 1000000),
+            error_rate=self.settings.getfloat('DISCOVERY_BLOOM_ERROR_RATE', 0.001),
+            stats=self.crawler.stats,
+        )
+        frequencies = None
+        if self.frequencies:
+            frequencies = {}
+            for word in filter(None, map(normalize, read_wordlist(self.frequencies))):
+                frequencies.setdefault(word, len(frequencies))
+
+        self.discovery = Discovery(
+            visited,
+            budget=self.budget or self.settings.getint('DISCOVERY_WORD_BUDGET') or None,
+            frequencies=frequencies,
+            stats=self.crawler.stats,
+        )
+
+        def close():
+            self.discovery.close()
+            if not jobdir:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        self.crawler.signals.connect(close, signal=signals.spider_closed, weak=False)
+
+    def open_checkpoint(self):
+        """
+        the progress of the words, one store per spider in `CHECKPOINT_DIR`.
+
+        :return:
+        """
+        flush_seconds = self.settings.getfloat('CHECKPOINT_FLUSH_SECONDS', 30)
+        self.checkpoint = ProgressStore(
+            os.path.join(self.settings.get('CHECKPOINT_DIR'), self.name),
+            batch_size=self.settings.getint('CHECKPOINT_BATCH_SIZE', 1000),
+            flush_seconds=flush_seconds,
+            stats=self.crawler.stats,
+        )
+
+        # marks are also written while no word completes, at the tail of the crawl or during a stall
+        flush = task.LoopingCall(self.flush_checkpoint)
+        flush.start(flush_seconds, now=False)
+
+        def close():
+            if flush.running:
+                flush.stop()
+            self.checkpoint.close()
+
+        self.crawler.signals.connect(close, signal=signals.spider_closed, weak=False)
+
+        if self.retry:
+            logger.info(f"retrying the failed words: {self.checkpoint.counts().get('failed', 0)}")
+
+    def flush_checkpoint(self):
+        """
+        writes the buffered items, their words are marked on the way, then the marks.
+
+        :return:
+        """
+        if self.exporter is not None:
+            self.exporter.flush()
+        self.checkpoint.flush()
+
+    def open_aliases(self):
+        """
+        the aliases of the canonical words, and their items, one store per spider in `ALIASES_DIR`.
+
+        :return:
+        """
+        self.aliases = AliasStore(os.path.join(self.settings.get('ALIASES_DIR'), self.name), stats=self.crawler.stats)
+        self.crawler.signals.connect(self.learn_aliases, signal=signals.item_scraped)
+        self.crawler.signals.connect(self.aliases.close, signal=signals.spider_closed)
+        logger.info(f"{self.aliases.count()} known aliases")
+
+    def canonical_word(self, response, item):
+        """
+        :param response: the page of a requested word
+        :param item: its scraped item, in its JSON shape
+        :return: (canonical word, how it was found) when the page is the one of another word, (None, None) otherwise
+        """
+        word = response.meta.get('word')
+
+        if response.meta.get('redirect_urls'):
+            canonical = normalize(unquote(urlsplit(response.url).path.rstrip('/').rsplit('/', 1)[-1]))
+            if canonical and canonical != word:
+                return canonical, 'redirect'
+
+        definitions = item.get('definition') or {}
+        hwd = (definitions.get('1') or {}).get('hwd')
+        canonical = normalize(hwd) if hwd else None
+        if canonical and canonical != word:
+            return canonical, 'hwd'
+
+        return None, None
+
+    def learn_aliases(self, item, response, spider):
+        """
+        records the alias of a scraped page, and keeps the item of its canonical word up to date.
+
+        :param item:
         :param response:
-        :param kwargs:
+        :param spider:
+        :return:
+        """
+        word = response.meta.get('word')
+        if not word or response.meta.get('alias_of') or not self.found(item):
+            return
+
+        payload = to_primitive(ItemAdapter(item).asdict())
+        canonical, via = self.canonical_word(response, payload)
+        if canonical is not None:
+            self.aliases.learn(word, canonical, via)
+
+        # a projected item can't stand for the whole canonical item
+        if self.projection is not None:
+            return
+
+        if canonical is not None or self.aliases.has_item(word):
+            # the word and the audio files are the ones of each request
+            payload.pop('word', None)
+            payload.pop('audio_files', None)
+            self.aliases.store(canonical or word, payload)
+
+    def alias_item(self, response):
+        """
+        :param response: the empty response of an alias, see `DictionaryCrawlersDownloaderMiddleware`
+        :return: the item of its canonical word, under the requested word
+        """
+        payload = self.aliases.item(response.meta['alias_of'])
+        fields = self.item_loader_cls.fields
+        item = self.item_loader_cls(**{key: value for key, value in payload.items() if key in fields})
+        item['word'] = response.meta['word']
+        return item
+
+    def open_frontier(self):
+        """
+        pushes the words of this worker, if any, and follows the completions of its leased words.
+
+        :return:
+        """
+        self.frontier = open_frontier(self.frontier_url)
+        self.worker = self.worker or self.settings.get('FRONTIER_WORKER') or default_worker()
+        # leased words not completed yet
+        self.leased = set()
+        # (word, status) of the words completed since the last flush, see `flush_completions`
+        self.completions = []
+        # False once a lease came back empty, the idle spider leases again then
+        self.lease_more = True
+
+        if self.words or self.wordlist:
+            queued = self.frontier.push(self.iter_words())
+            logger.info(f"{queued} new words pushed to the frontier")
+
+        self.crawler.signals.connect(self.frontier_scraped, signal=signals.item_scraped)
+        self.crawler.signals.connect(self.frontier_exported, signal=items_exported)
+        self.crawler.signals.connect(self.frontier_dropped, signal=signals.item_dropped)
+        self.crawler.signals.connect(self.frontier_failed, signal=word_failed)
+        self.crawler.signals.connect(self.frontier_idle, signal=signals.spider_idle)
+
+        # completions are also written while no word completes, at the tail of the crawl or during a stall
+        flush = task.LoopingCall(self.flush_completions)
+        flush.start(self.settings.getfloat('FRONTIER_FLUSH_SECONDS', 5), now=False)
+
+        def close():
+            if flush.running:
+                flush.stop()
+            self.flush_completions(lease=False)
+            self.frontier.close()
+
+        self.crawler.signals.connect(close, signal=signals.spider_closed, weak=False)
+
+    def leased_requests(self):
+        """
+        :return: the requests of a new lease of `FRONTIER_BATCH_SIZE` words
+        """
+        words = self.frontier.lease(
+            self.worker,
+            self.settings.getint('FRONTIER_BATCH_SIZE', 100),
+            self.settings.getfloat('FRONTIER_LEASE_SECONDS', 600),
+        )
+        self.crawler.stats.inc_value('frontier/leased', len(words))
+        self.lease_more = bool(words)
+
+        for word in words:
+            self.leased.add(word)
+            yield from self.word_requests(word)
+
+    def complete(self, word, status):
+        """
+        buffers the completion of a leased word, they are written every `FRONTIER_COMPLETE_BATCH_SIZE` words.
+
+        :param word:
+        :param status: "done", "not_found", "dropped" or "failed"
+        :return:
+        """
+        if word not in self.leased:
+            return
+
+        self.leased.discard(word)
+        self.completions.append((word, status))
+        if len(self.completions) >= self.settings.getint('FRONTIER_COMPLETE_BATCH_SIZE', 50):
+            self.flush_completions()
+
+    def flush_completions(self, lease=True):
+        """
+        records the buffered completions, one transaction per status, then leases more words once half of the lease
+        is completed.
+
+        :param lease: False when the caller leases itself
+        :return:
+        """
+        if not self.completions:
+            return
+
+        words = {}
+        for word, status in self.completions:
+            words.setdefault(status, []).append(word)
+        self.completions = []
+
+        for status, status_words in words.items():
+            completed = len(self.frontier.complete(self.worker, status_words, status))
+            if completed:
+                self.crawler.stats.inc_value(f'frontier/completed/{status}', completed)
+            if completed < len(status_words):
+                # the lease expired and another worker completed them first
+                self.crawler.stats.inc_value('frontier/completed_elsewhere', len(status_words) - completed)
+
+        slot = self.crawler.engine.slot
+        if not lease or slot is None or slot.closing is not None:
+            # the last items are written while the spider closes, their words would never be crawled
+            return
+
+        if self.lease_more and len(self.leased) <= self.settings.getint('FRONTIER_BATCH_SIZE', 100) // 2:
+            for request in self.leased_requests():
+                self.crawler.engine.crawl(request)
+
+    def frontier_scraped(self, item, response, spider):
+        # with the export, the word is completed once its item is written
+        if self.exporter is None:
+            self.complete_item(response.meta.get('word'), item)
+
+    def frontier_exported(self, items, spider):
+        for item in items:
+            self.complete_item(item.get('word'), item)
+
+    def complete_item(self, word, item):
+        if self.failed(item):
+            self.complete(word, 'failed')
+        else:
+            self.complete(word, 'done' if self.found(item) else 'not_found')
+
+    def frontier_dropped(self, item, response, exception, spider):
+        self.complete(response.meta.get('word'), 'dropped')
+
+    def frontier_failed(self, word, failure, spider):
+        self.complete(word, 'failed')
+
+    def frontier_idle(self, spider):
+        """
+        the crawl goes on while the frontier has words, or leases of other workers which may expire.
+
+        :param spider:
+        :return:
+        """
+        if self.exporter is not None:
+            # the words of the buffered items are only completed once these are written
+            self.exporter.flush()
+        self.flush_completions(lease=False)
+
+        requests = list(self.leased_requests())
+        for request in requests:
+            self.crawler.engine.crawl(request)
+
+        if requests or not self.frontier.drained:
+            raise DontCloseSpider
+
+    def iter_words(self):
+        """
+        the `-a` words followed by the word list, streamed, normalized, de-duplicated and sharded.
+
+        :return:
+        """
+        words = itertools.chain(self.words, read_wordlist(self.wordlist) if self.wordlist else ())
+        return WordStream(shard=self.shard)(words)
+
+    def iter_pending_words(self):
+        """
+        the words of this crawl which were not completed by a previous one, or the failed words of a retry crawl.
+
+        :return:
+        """
+        if self.checkpoint is None:
+            yield from self.iter_words()
+            return
+
+        if self.retry:
+            yield from self.checkpoint.words('failed')
+            return
+
+        for word in self.iter_words():
+            if self.checkpoint.completed(word):
+                self.crawler.stats.inc_value('checkpoint/skipped')
+            else:
+                yield word
+
+    def found(self, item):
+        """
+        :param item: a scraped item
+        :return: True when the word has a definition, or one of the fields of the projection
+        """
+        return found(item, self.projection)
+
+    def failed(self, item):
+        """
+        :param item: a scraped item
+        :return: why the crawl of the word failed although an item was scraped, None when it did not
+        """
+        return None
+
+    def make_request(self, word, **kwargs):
+        """
+        :param word: normalized word
+        :param kwargs: `scrapy.Request` arguments
+        :return:
+        """
+        kwargs.setdefault('errback', self.request_failed)
+        kwargs['meta'] = {'word': word, **kwargs.get('meta', {})}
+
+        if self.aliases is not None and self.projection is None:
+            canonical = self.aliases.resolve(word)
+            if canonical is not None:
+                # answered without a download, the canonical item is reused
+                kwargs['meta']['alias_of'] = canonical
+        return scrapy.Request(url=self.base_url + word, callback=self.parse, headers=self.request_headers, **kwargs)
+
+    def word_requests(self, word):
+        """
+        the requests of a word leased from the frontier, a spider fanning a word out to several pages overrides it.
+
+        :param word: normalized word
+        :return:
+        """
+        yield self.make_request(word)
+
+    def request_failed(self, failure):
+        """
+        the request of a word failed for good, its retries are exhausted.
+
+        :param failure:
+        :return:
+        """
+        logger.warning(f"{failure.request.url} failed: {failure.value!r}")
+        word = failure.request.meta['word']
+        self.crawler.signals.send_catch_log(word_failed, word=word, failure=failure, spider=self)
+
+    def callback_failed(self, failure, response, spider):
+        """
+        the callback of a word raised.
+
+        :param failure:
+        :param response:
+        :param spider:
         :return:
         """
-        item_loader = ItemLoader(item=self.item_loader_cls, response=response, spider_name=self.name)
+        if response.meta.get('word'):
+            self.crawler.signals.send_catch_log(word_failed, word=response.meta['word'], failure=failure, spider=self)
+
+    def start_requests(self):
+        """
+        :return:
+        """
+        if self.frontier is not None:
+            yield from self.leased_requests()
+            return
+
+        for word in self.iter_pending_words():
+            if self.discovery is None:
+                yield self.make_request(word)
+                continue
+
+            priority = self.discovery.admit(word, depth=0)
+            if priority is not None:
+                yield self.make_request(word, priority=priority)
+            elif self.discovery.exhausted:
+                break
+
+    def discover_words(self, response, item):
+        """
+        words linked from a crawled page, scheduled by a discovery crawl.
+
+        :param response:
+        :param item: the item loaded from the response
+        :return: raw words
+        """
+        return ()
+
+    def discovered_requests(self, response, item):
+        """
+        :param response:
+        :param item:
+        :return: requests of the discovered words which were never scheduled, within the budget
+        """
+        # set by the depth middleware
+        depth = response.meta.get('depth', 0) + 1
+
+        for word in filter(None, map(normalize, self.discover_words(response, item))):
+            priority = self.discovery.admit(word, depth)
+            if priority is not None:
+                yield self.make_request(word, priority=priority)
+            elif self.discovery.exhausted:
+                return
+
+    @profiled('load_item')
+    @timed('spider/load_item')
+    def load_item(self, response, source=None):
+        """
+        :param response:
+        :param source: the spider class whose item is loaded, this spider by default
+        :return: the item of the response, its pool-extracted fields are still Deferreds
+        """
+        source = source or self
+        item_loader = ItemLoader(
+            item=source.item_loader_cls(), response=response, spider_name=source.name, settings=self.settings,
+            parse_pool=self.parse_pool, parse_cache=self.parse_cache, projection=self.projection,
+        )
         item_loader.default_input_processor = default_input_processor
         item_loader.default_output_processor = default_output_processor
 
-        # logger.info("************************************** TEST **************************************")
-        # logger.info("**********************************************************************************")
-        # for section in response.xpath("//span[contains(@class, 'Head')]").getall():
-        #     logger.info(section.split())
-        # logger.info("**********************************************************************************")
-        # logger.info("**********************************************************************************")
+        for field_name, xpath in source.item_loader_xpath.items():
+            if self.projection is not None and not self.projection.wants(field_name):
+                continue
+            if source.item_loader_cls.fields[field_name].get('parsed_element') and self.parse_pool is None:
+                # hand the elements of the already parsed response over, nothing is serialized or re-parsed.
+                # pool workers get the html instead, a tree must not be shared with another thread or process
+                item_loader.add_value(field_name, [selector.root for selector in response.xpath(xpath)])
+            else:
+                item_loader.add_xpath(field_name=field_name, xpath=xpath)
+
+        # the requested word, the response may come from a redirect
+        item_loader.add_value('word', response.meta.get('word') or response.request.url.split("/")[-1])
 
-        for field_name, xpath in self.item_loader_xpath.items():
-            item_loader.add_xpath(field_name=field_name, xpath=xpath)
+        return item_loader.load_item()
+
+    def parse(self, response, **kwargs):
+        """
+        response.xpath("//span[contains(@class, 'Head')]//text()").getall()
+        :param response:
+        :param kwargs:
+        :return:
+        """
+        if response.meta.get('alias_of'):
+            yield self.alias_item(response)
+            return
 
-        item_loader.add_value('word', response.request.url.split("/")[-1])
+        item = self.load_item(response)
+        yield item
 
-        yield item_loader.load_item()
+        if self.discovery is not None:
+            yield from self.discovered_requests(response, item)
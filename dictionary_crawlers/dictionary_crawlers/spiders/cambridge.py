@@ -2,8 +2,16 @@
 # -*- coding: utf-8 -*-
 # vim: ts=4: sw=4: et
 
+from ..items import CambridgeItem
 from .base import BaseSpider
 
 
 class CambridgeDictionarySpider(BaseSpider):
-    pass
+    name = 'cambridge'
+    allowed_domains = ["dictionary.cambridge.org"]
+    base_url = 'https://dictionary.cambridge.org/dictionary/english/'
+    item_loader_cls = CambridgeItem
+    item_loader_xpath = {
+        # the page also holds the American and Business dictionaries, only the first one is kept
+        'definition': "(//div[@class='entry-body'])[1]/div[contains(@class, 'entry-body__el')]",
+    }
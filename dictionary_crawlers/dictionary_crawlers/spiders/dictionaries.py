@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+import itertools
+import logging
+import time
+
+import scrapy
+from scrapy import signals
+from scrapy.spidermiddlewares.httperror import HttpError
+from twisted.internet.error import TCPTimedOutError, TimeoutError
+
+from ..items import DictionariesItem
+from ..pipelines import ParsedFieldsPipeline
+from ..projection import found
+from .base import BaseSpider
+from .cambridge import CambridgeDictionarySpider
+from .longman import LongmanDictionarySpider
+from .oxford import OxfordDictionarySpider
+
+logger = logging.getLogger(__name__)
+
+
+class DictionariesSpider(BaseSpider):
+    """
+    Crawls every word in every dictionary from a single crawler: the requests of all the sources share the
+    downloader, its connection pool and its per-domain slots, and the word list is read once.
+
+    One `DictionariesItem` is emitted per word, as soon as every source answered, failed or timed out, with the
+    item of each source and its status. `FANOUT_SOURCE_TIMEOUT` bounds each source of a word, its retries included.
+    A word requested twice (a lease expired meanwhile, for instance) is fetched and emitted twice, each fetch with
+    its own answers.
+
+        scrapy crawl dictionaries -a wordlist=words.txt -a sources=longman,oxford
+    """
+    name = 'dictionaries'
+    # source -> spider whose urls and items are used
+    sources = {
+        'longman': LongmanDictionarySpider,
+        'cambridge': CambridgeDictionarySpider,
+        'oxford': OxfordDictionarySpider,
+    }
+    allowed_domains = [domain for source in sources.values() for domain in source.allowed_domains]
+    # every source has its own
+    base_url = ''
+    item_loader_xpath = {}
+
+    def __init__(self, sources=None, **kwargs):
+        """
+        :param sources: comma separated sources, all of them by default
+        :param kwargs: see `BaseSpider`
+        """
+        super(DictionariesSpider, self).__init__(**kwargs)
+        assert not self.discover, "a discovery crawl follows a single dictionary, use its own spider!"
+
+        self.source_names = tuple(sources.split(',')) if sources else tuple(self.sources)
+        assert all(name in self.sources for name in self.source_names), \
+            f"`sources` must be taken from {tuple(self.sources)}!"
+
+        # fetch -> {source: (item, status)}, until every source answered
+        self.pending = {}
+        # the fetch of every request of a word, see `word_requests`
+        self.fetches = itertools.count()
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(DictionariesSpider, cls).from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.report_pending, signal=signals.spider_closed)
+        return spider
+
+    def source_request(self, word, name, fetch):
+        """
+        :param word: normalized word
+        :param name: source
+        :param fetch: the fetch of the word the request belongs to
+        :return:
+        """
+        source = self.sources[name]
+        timeout = self.settings.getfloat('FANOUT_SOURCE_TIMEOUT', 30)
+        meta = {
+            'word': word,
+            'source': name,
+            'fetch': fetch,
+            # the retries share the timeout, see the downloader middleware
+            'deadline': time.time() + timeout,
+            'download_timeout': timeout,
+            'max_retry_times': self.settings.getint('FANOUT_SOURCE_RETRIES', 1),
+        }
+        return scrapy.Request(
+            url=source.base_url + word, callback=self.parse_source, errback=self.source_failed,
+            headers=source.request_headers, meta=meta, dont_filter=True,
+        )
+
+    def word_requests(self, word):
+        """
+        :param word: normalized word
+        :return: the requests of the word in every source
+        """
+        fetch = next(self.fetches)
+        self.pending[fetch] = {}
+        for name in self.source_names:
+            yield self.source_request(word, name, fetch)
+
+    def start_requests(self):
+        if self.frontier is not None:
+            yield from self.leased_requests()
+            return
+
+        for word in self.iter_pending_words():
+            yield from self.word_requests(word)
+
+    def found(self, item):
+        """
+        :param item: a `DictionariesItem`
+        :return: True when one of the sources has a definition of the word
+        """
+        return 'ok' in item['sources'].values()
+
+    def failed(self, item):
+        """
+        :param item: a `DictionariesItem`
+        :return: the status of every source when none has a definition and one of them timed out or failed, the
+            word is retried then, None otherwise
+        """
+        statuses = item['sources']
+        if 'ok' in statuses.values() or not {'timeout', 'error'}.intersection(statuses.values()):
+            return None
+        return ', '.join(f"{name}: {status}" for name, status in statuses.items())
+
+    async def parse_source(self, response, **kwargs):
+        """
+        :param response: the page of a word in one of the sources
+        :param kwargs:
+        :return: the merged item once this source was the last one of the word
+        """
+        name = response.meta['source']
+        item = self.load_item(response, self.sources[name])
+
+        # the fields extracted in the parse pool are known once it answered, and so is the status
+        try:
+            for container, key, deferred in list(ParsedFieldsPipeline.pending_fields(item)):
+                container[key] = await deferred
+        except Exception as exc:
+            logger.warning(f"{name} extraction failed for {response.meta['word']}: {exc!r}")
+            item, status = None, 'error'
+        else:
+            status = 'ok' if found(item, self.projection) else 'not_found'
+
+        for answer in self.answer(response.meta, item, status):
+            yield answer
+
+    def source_failed(self, failure):
+        """
+        :param failure: the download or http error, once the retries are exhausted
+        :return: the merged item once this source was the last one of the word
+        """
+        request = failure.request
+        if failure.check(HttpError) and failure.value.response.status == 404:
+            status = 'not_found'
+        elif failure.check(TimeoutError, TCPTimedOutError):
+            status = 'timeout'
+        else:
+            status = 'error'
+            logger.warning(f"{request.meta['source']} failed for {request.meta['word']}: {failure.value!r}")
+
+        yield from self.answer(request.meta, None, status)
+
+    def answer(self, meta, item, status):
+        """
+        :param meta: meta of the request of the source
+        :param item: the item of the source, None when it failed
+        :param status:
+        :return:
+        """
+        name = meta['source']
+        self.crawler.stats.inc_value(f'dictionaries/{name}/{status}')
+        results = self.pending.get(meta['fetch'])
+        if results is None or name in results:
+            # the fetch was already emitted
+            self.crawler.stats.inc_value('dictionaries/late_answers')
+            return
+
+        results[name] = (item, status)
+        if len(results) < len(self.source_names):
+            return
+
+        del self.pending[meta['fetch']]
+        yield DictionariesItem(
+            word=meta['word'],
+            sources={name: status for name, (_, status) in results.items()},
+            **{name: item for name, (item, _) in results.items()},
+        )
+
+    def report_pending(self):
+        if self.pending:
+            self.crawler.stats.set_value('dictionaries/incomplete', len(self.pending))
+            logger.warning(f"{len(self.pending)} fetches of a word never got an answer from every source")
@@ -3,15 +3,30 @@
 # vim: ts=4: sw=4: et
 
 from ..items import LongManItem
+from ..services.longman import LONGMAN_DICTIONARY_URL, LONGMAN_ITEM_XPATH
 from .base import BaseSpider
 
 
 class LongmanDictionarySpider(BaseSpider):
     name = 'longman'
     allowed_domains = ["ldoceonline.com"]
-    base_url = 'https://www.ldoceonline.com/dictionary/'
-    item_loader_cls = LongManItem()
-    item_loader_xpath = {
-        'family_word': "//div[@class='wordfams']//text()",
-        'definition': "//span[@class='dictentry']"
-    }
+    base_url = LONGMAN_DICTIONARY_URL
+    item_loader_cls = LongManItem
+    item_loader_xpath = LONGMAN_ITEM_XPATH
+    # crossref targets, e.g. /dictionary/run-for-office
+    discovery_xpath = "//span[@class='Crossref']/a/@href"
+
+    def discover_words(self, response, item):
+        """
+        the family words and the crossref targets of the page.
+
+        :param response:
+        :param item:
+        :return:
+        """
+        for words in (item.get('family_word') or {}).values():
+            yield from words
+
+        for href in response.xpath(self.discovery_xpath).getall():
+            if href.startswith('/dictionary/'):
+                yield href.rsplit('/', 1)[-1]
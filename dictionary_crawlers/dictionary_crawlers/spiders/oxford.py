@@ -2,8 +2,15 @@
 # -*- coding: utf-8 -*-
 # vim: ts=4: sw=4: et
 
+from ..items import OxfordItem
 from .base import BaseSpider
 
 
 class OxfordDictionarySpider(BaseSpider):
-    pass
+    name = 'oxford'
+    allowed_domains = ["oxfordlearnersdictionaries.com"]
+    base_url = 'https://www.oxfordlearnersdictionaries.com/definition/english/'
+    item_loader_cls = OxfordItem
+    item_loader_xpath = {
+        'definition': "//div[@id='entryContent']//div[@class='entry']",
+    }
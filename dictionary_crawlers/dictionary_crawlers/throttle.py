@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Adaptive concurrency for the downloader slots, used by `DictionaryCrawlersDownloaderMiddleware`.
+
+Every slot is a lane with its own AIMD controller: pages go through the slot of their domain and audio through
+`AUDIO_DOWNLOAD_SLOT`, so a slow media server never throttles the page fetches. After every window of responses
+a lane compares what it observed with its targets:
+
+- 429s, or an error rate (5xx, timeouts, connection errors) above `THROTTLE_MAX_ERROR_RATE`: the concurrency is
+  halved and the delay doubled (or set from `Retry-After`),
+- a time to first byte above `THROTTLE_TARGET_TTFB`: the concurrency is halved,
+- otherwise the concurrency grows by one and the delay shrinks by `THROTTLE_DELAY_STEP`.
+
+The current targets and the decisions are kept in the crawl stats under `throttle/<slot>/`.
+Do not enable AutoThrottle along with it, both would set the slot delays.
+"""
+import time
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+__all__ = ('AdaptiveThrottle',)
+
+
+class Lane:
+
+    def __init__(self, name, concurrency, min_concurrency, max_concurrency, delay, max_delay):
+        """
+
+        :param name: the downloader slot key
+        :param concurrency: initial concurrency
+        :param min_concurrency:
+        :param max_concurrency:
+        :param delay: initial delay
+        :param max_delay:
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.delay = delay
+        self.max_delay = max_delay
+        self.ttfb = None
+        self.reset()
+
+    def reset(self):
+        self.responses = 0
+        self.errors = 0
+        self.throttled = 0
+        self.retry_after = None
+        self.started = time.monotonic()
+
+    def observe(self, ttfb=None, error=False, throttled=False, retry_after=None, smoothing=0.3):
+        """
+        :param ttfb: time to the response headers, in seconds
+        :param error:
+        :param throttled: a 429
+        :param retry_after: seconds, from the `Retry-After` header of a 429
+        :param smoothing: weight of the new sample in the average ttfb
+        :return:
+        """
+        self.responses += 1
+        self.errors += error
+        self.throttled += throttled
+        if retry_after is not None:
+            self.retry_after = max(retry_after, self.retry_after or 0)
+        if ttfb is not None:
+            self.ttfb = ttfb if self.ttfb is None else smoothing * ttfb + (1 - smoothing) * self.ttfb
+
+    def decide(self, target_ttfb, max_error_rate, backoff, delay_step):
+        """
+        :return: the decision, "decrease_429", "decrease_errors", "decrease_ttfb" or "increase"
+        """
+        if self.throttled or self.errors / self.responses > max_error_rate:
+            decision = 'decrease_429' if self.throttled else 'decrease_errors'
+            self.concurrency = max(self.min_concurrency, int(self.concurrency * backoff))
+            delay = self.retry_after if self.retry_after is not None else max(self.delay * 2, delay_step)
+            self.delay = min(self.max_delay, delay)
+
+        elif self.ttfb is not None and self.ttfb > target_ttfb:
+            decision = 'decrease_ttfb'
+            self.concurrency = max(self.min_concurrency, int(self.concurrency * backoff))
+
+        else:
+            decision = 'increase'
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.delay = max(0.0, self.delay - delay_step)
+
+        self.reset()
+        return decision
+
+
+class AdaptiveThrottle:
+
+    def __init__(self, crawler):
+        """
+
+        :param crawler: the downloader slots are reached through the crawler engine
+        """
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+
+        self.window = settings.getint('THROTTLE_WINDOW', 20)
+        self.window_seconds = settings.getfloat('THROTTLE_WINDOW_SECONDS', 10.0)
+        self.target_ttfb = settings.getfloat('THROTTLE_TARGET_TTFB', 1.0)
+        self.max_error_rate = settings.getfloat('THROTTLE_MAX_ERROR_RATE', 0.05)
+        self.backoff = settings.getfloat('THROTTLE_BACKOFF', 0.5)
+        self.delay_step = settings.getfloat('THROTTLE_DELAY_STEP', 0.25)
+        self.max_delay = settings.getfloat('THROTTLE_MAX_DELAY', 30.0)
+        self.media_slot = settings.get('AUDIO_DOWNLOAD_SLOT')
+        # lane -> max concurrency
+        self.limits = {
+            'page': settings.getint('THROTTLE_PAGE_MAX_CONCURRENCY', 16),
+            'media': settings.getint('THROTTLE_MEDIA_MAX_CONCURRENCY', 8),
+        }
+        self.lanes = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def lane(self, name):
+        """
+        :param name: downloader slot key
+        :return:
+        """
+        if name not in self.lanes:
+            max_concurrency = self.limits['media' if name == self.media_slot else 'page']
+            # a lane starts from the concurrency and delay the slot was configured with
+            slot = self.slot(name)
+            concurrency, delay = (slot.concurrency, slot.delay) if slot is not None else (1, 0.0)
+            self.lanes[name] = Lane(
+                name, min(concurrency, max_concurrency), 1, max_concurrency, delay, self.max_delay,
+            )
+            self.apply(self.lanes[name])
+        return self.lanes[name]
+
+    def slot(self, name):
+        engine = self.crawler.engine
+        return engine.downloader.slots.get(name) if engine is not None else None
+
+    def observe_response(self, request, response):
+        """
+        :param request:
+        :param response:
+        :return:
+        """
+        name = request.meta.get('download_slot')
+        if name is None:
+            return
+
+        retry_after = None
+        if response.status == 429:
+            value = response.headers.get('Retry-After')
+            retry_after = float(value) if value and value.isdigit() else None
+
+        self.observe(
+            self.lane(name),
+            ttfb=request.meta.get('download_latency'),
+            error=response.status >= 500,
+            throttled=response.status == 429,
+            retry_after=retry_after,
+        )
+
+    def observe_exception(self, request, exception):
+        """
+        :param request:
+        :param exception: a download error, e.g. a timeout
+        :return:
+        """
+        name = request.meta.get('download_slot')
+        if name is not None:
+            self.observe(self.lane(name), error=True)
+
+    def observe(self, lane, **observation):
+        lane.observe(**observation)
+        self.stats.inc_value(f'throttle/{lane.name}/responses')
+        self.stats.inc_value(f'throttle/{lane.name}/errors', int(bool(observation.get('error'))))
+        self.stats.inc_value(f'throttle/{lane.name}/throttled', int(bool(observation.get('throttled'))))
+
+        throttled_now = observation.get('throttled') and lane.throttled == 1
+        if lane.responses >= self.window or throttled_now or time.monotonic() - lane.started > self.window_seconds:
+            # a 429 is answered right away, once per window
+            decision = lane.decide(self.target_ttfb, self.max_error_rate, self.backoff, self.delay_step)
+            self.stats.inc_value(f'throttle/{lane.name}/{decision}')
+            logger.debug(f"{lane.name}: {decision}, concurrency {lane.concurrency}, delay {lane.delay:.2f}s")
+            self.apply(lane)
+
+        if lane.ttfb is not None:
+            self.stats.set_value(f'throttle/{lane.name}/ttfb_ms', round(lane.ttfb * 1000, 1))
+
+    def apply(self, lane):
+        slot = self.slot(lane.name)
+        if slot is not None:
+            slot.concurrency = lane.concurrency
+            slot.delay = lane.delay
+
+        self.stats.set_value(f'throttle/{lane.name}/concurrency', lane.concurrency)
+        self.stats.set_value(f'throttle/{lane.name}/delay', lane.delay)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Timings of the hot paths: item loading, the extraction processors and the pipelines.
+
+Stages are marked with `timed` and record their wall time in a histogram of the process, only while
+`TIMING_ENABLED` is set, otherwise a marked call costs a single flag check. The `TimingStats` extension copies the
+histograms to the crawl stats (`timing/<stage>`) and logs them every `TIMING_DUMP_INTERVAL` seconds.
+
+With `TIMING_PROFILE_SAMPLE = N`, one `profiled` call in N runs under cProfile and its profile is written to
+`TIMING_PROFILE_DIR`, read it with `python -m pstats <file>`.
+
+Stages include their nested stages (a sense includes its sub-senses), and the work of a process parse pool is not
+timed, its workers have their own histograms.
+"""
+import bisect
+import cProfile
+import functools
+import inspect
+import os
+import threading
+import time
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'Histogram',
+    'TIMINGS',
+    'timed',
+    'profiled',
+    'TimingStats',
+)
+
+# upper bounds of the buckets, in milliseconds, the last bucket holds anything slower
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        """
+        :param elapsed: milliseconds
+        :return:
+        """
+        self.counts[bisect.bisect_left(BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def percentile(self, q):
+        """
+        :param q: between 0 and 1
+        :return: upper bound of the bucket holding the percentile, the max for the last bucket
+        """
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        """
+        :return: the histogram as a stats value
+        """
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 4) if self.count else 0,
+            'p50_ms': self.percentile(0.5),
+            'p90_ms': self.percentile(0.9),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max, 3),
+            'buckets': {
+                f"<={bound}ms" if index < len(BUCKETS) else f">{BUCKETS[-1]}ms": count
+                for index, (bound, count) in enumerate(zip(BUCKETS + (None,), self.counts)) if count
+            },
+        }
+
+
+class Timings:
+    """
+    The histograms of the process, per stage. Parse pool threads record into it too.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+        # profile one call in `profile_sample`, none when 0
+        self.profile_sample = 0
+        self.profile_dir = None
+        self.profile_calls = 0
+
+    def record(self, stage, elapsed):
+        """
+        :param stage:
+        :param elapsed: milliseconds
+        :return:
+        """
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.add(elapsed)
+
+    def sampled(self):
+        """
+        :return: True when the next profiled call is the sampled one
+        """
+        if not self.profile_sample:
+            return False
+        with self.lock:
+            self.profile_calls += 1
+            return (self.profile_calls - 1) % self.profile_sample == 0
+
+    def summary(self):
+        with self.lock:
+            return {stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())}
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.profile_calls = 0
+
+
+TIMINGS = Timings()
+
+
+def timed_generator(stage, generator):
+    """
+    :param stage:
+    :param generator:
+    :return: the values of `generator`, the time spent running it is recorded under `stage` once exhausted
+    """
+    elapsed = 0.0
+    while True:
+        start = time.perf_counter()
+        try:
+            value = next(generator)
+        except StopIteration as stop:
+            TIMINGS.record(stage, (elapsed + time.perf_counter() - start) * 1000)
+            return stop.value
+        elapsed += time.perf_counter() - start
+        yield value
+
+
+def timed(stage):
+    """
+    records the wall time of every call of the decorated function under `stage`. A generator function is timed
+    while it runs, not while it is suspended.
+
+    :param stage: e.g. "longman/idoc"
+    :return:
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            # not a generator itself: untimed, the caller iterates the generator of `func` without any frame between
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not TIMINGS.enabled:
+                    return func(*args, **kwargs)
+                return timed_generator(stage, func(*args, **kwargs))
+
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TIMINGS.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                TIMINGS.record(stage, (time.perf_counter() - start) * 1000)
+
+        return wrapper
+
+    return decorator
+
+
+def profiled(name):
+    """
+    runs the sampled calls of the decorated function under cProfile, see `TIMING_PROFILE_SAMPLE`.
+
+    :param name: prefix of the profile files
+    :return:
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TIMINGS.sampled():
+                return func(*args, **kwargs)
+
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(func, *args, **kwargs)
+            finally:
+                path = os.path.join(TIMINGS.profile_dir, f"{name}-{os.getpid()}-{TIMINGS.profile_calls:08d}.prof")
+                profile.dump_stats(path)
+                logger.debug(f"profile written to {path}")
+
+        return wrapper
+
+    return decorator
+
+
+class TimingStats:
+    """
+    Enables the timings for the crawl and dumps them to the stats and the log.
+    """
+
+    def __init__(self, stats, interval=60.0, profile_sample=0, profile_dir='profiles'):
+        """
+
+        :param stats: crawler stats collector
+        :param interval: seconds between two dumps, only at the end of the crawl when 0
+        :param profile_sample: profile one sampled call in this many, none when 0
+        :param profile_dir:
+        """
+        self.stats = stats
+        self.interval = interval
+        self.profile_sample = profile_sample
+        self.profile_dir = profile_dir
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # imported here, the timed extraction code is also used without scrapy, see `dictionary_crawlers.lookup`
+        from scrapy import signals
+        from scrapy.exceptions import NotConfigured
+
+        settings = crawler.settings
+        if not settings.getbool('TIMING_ENABLED'):
+            raise NotConfigured
+
+        extension = cls(
+            crawler.stats,
+            interval=settings.getfloat('TIMING_DUMP_INTERVAL', 60.0),
+            profile_sample=settings.getint('TIMING_PROFILE_SAMPLE'),
+            profile_dir=settings.get('TIMING_PROFILE_DIR', 'profiles'),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        TIMINGS.reset()
+        TIMINGS.enabled = True
+        TIMINGS.profile_sample = self.profile_sample
+        TIMINGS.profile_dir = self.profile_dir
+        if self.profile_sample:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+        if self.interval:
+            from twisted.internet import task
+
+            self.task = task.LoopingCall(self.dump, spider)
+            self.task.start(self.interval, now=False)
+
+    def dump(self, spider):
+        summary = TIMINGS.summary()
+        for stage, histogram in summary.items():
+            self.stats.set_value(f'timing/{stage}', histogram)
+
+        lines = [
+            f"{stage:<36} {h['count']:>8} {h['mean_ms']:>10.3f} {h['p50_ms']:>8} {h['p90_ms']:>8} "
+            f"{h['p99_ms']:>8} {h['max_ms']:>10.3f} {h['total_ms'] / 1000:>9.2f}"
+            for stage, h in summary.items()
+        ]
+        if lines:
+            header = (
+                f"{'stage':<36} {'count':>8} {'mean ms':>10} {'p50':>8} {'p90':>8} {'p99':>8} "
+                f"{'max ms':>10} {'total s':>9}"
+            )
+            spider.logger.info("timings:\n" + "\n".join([header, *lines]))
+
+    def spider_closed(self, spider):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        self.dump(spider)
+        TIMINGS.enabled = False
+        TIMINGS.profile_sample = 0
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+A word index over the shards written by `JsonLinesExportPipeline`.
+
+Every shard gets its own index file next to it (`<shard>.idx`), so indexing a new shard never touches the
+others. Shards are named `<spider>-<start time>-<number>.jsonl[.gz]`: a `WordIndex` searches the ones of a single
+spider, the items of the other spiders have other schemas, the shard of the most recent crawl first.
+
+An index file is a header followed by fixed-size records sorted by the hash of their key, a word or a
+word and one of its homnums, and is searched in place through `mmap`. A record points to the line of the item:
+
+- in a plain shard, to its byte offset,
+- in a gzip shard, to the offset of the gzip member holding it (one member per exported batch) and to the
+  line offset inside the decompressed member, so a lookup decompresses a single batch.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+import zlib
+from logging import getLogger
+
+import ujson
+
+logger = getLogger(__name__)
+
+__all__ = (
+    'build_index',
+    'WordIndex',
+)
+
+MAGIC = b'DCWI'
+VERSION = 1
+# magic, version, compressed, records
+HEADER = struct.Struct('<4sHHQ')
+# key hash, shard (or gzip member) offset, line offset in the member, line length
+RECORD = struct.Struct('<QQII')
+
+SHARD_EXTENSIONS = ('.jsonl', '.jsonl.gz')
+# see `JsonLinesExportPipeline.open_shard`
+SHARD_NAME = re.compile(r'(?P<spider>.+)-(?P<started>\d{8}T\d{6})-(?P<number>\d+)\.jsonl(?:\.gz)?')
+INDEX_EXTENSION = '.idx'
+CHUNK_SIZE = 64 * 1024
+
+
+def key_hash(word, homnum=None):
+    """
+    :param word:
+    :param homnum: the key of a single homograph of the word
+    :return: 64 bits hash of the key
+    """
+    key = word if homnum is None else f'{word}\x00{homnum}'
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def item_keys(item):
+    """
+    :param item: a decoded item
+    :return: hashes of its word and of its word with each homnum
+    """
+    word = item.get('word')
+    if not word:
+        return []
+
+    keys = {key_hash(word)}
+    for entry in (item.get('definition') or {}).values():
+        if entry.get('homnum'):
+            keys.add(key_hash(word, entry['homnum']))
+    return keys
+
+
+def iter_plain_lines(path):
+    """
+    :return: (offset, 0, length, line) of every line of a plain shard
+    """
+    offset = 0
+    with open(path, 'rb') as fh:
+        for line in fh:
+            yield offset, 0, len(line), line
+            offset += len(line)
+
+
+def iter_gzip_lines(path):
+    """
+    :return: (member offset, offset in the member, length, line) of every line of a gzip shard
+    """
+    with open(path, 'rb') as fh:
+        member_offset = 0
+        consumed = 0
+        pending = b''
+
+        while True:
+            decompressor = zlib.decompressobj(wbits=31)
+            data = []
+            while not decompressor.eof:
+                chunk = pending or fh.read(CHUNK_SIZE)
+                pending = b''
+                if not chunk:
+                    break
+                data.append(decompressor.decompress(chunk))
+                consumed += len(chunk) - len(decompressor.unused_data)
+                pending = decompressor.unused_data
+
+            if not decompressor.eof:
+                # end of the file, or a member still being written
+                return
+
+            offset = 0
+            for line in b''.join(data).splitlines(keepends=True):
+                yield member_offset, offset, len(line), line
+                offset += len(line)
+
+            member_offset = consumed
+
+
+def index_path(shard_path):
+    return shard_path + INDEX_EXTENSION
+
+
+def is_shard(name):
+    return name.endswith(SHARD_EXTENSIONS)
+
+
+def shard_order(name, spider):
+    """
+    :param name: a file name
+    :param spider: spider name
+    :return: (start time of the crawl, shard number) of a shard of the spider, None for any other file
+    """
+    match = SHARD_NAME.fullmatch(name)
+    if match is None or match['spider'] != spider:
+        return None
+    return match['started'], int(match['number'])
+
+
+def build_shard_index(shard_path):
+    """
+    :param shard_path: a finished shard
+    :return: number of indexed items
+    """
+    compressed = shard_path.endswith('.gz')
+    lines = iter_gzip_lines(shard_path) if compressed else iter_plain_lines(shard_path)
+
+    records = []
+    items = 0
+    for member_offset, offset, length, line in lines:
+        if not line.strip():
+            continue
+        items += 1
+        for key in item_keys(ujson.loads(line)):
+            records.append((key, member_offset, offset, length))
+    records.sort()
+
+    temporary_path = index_path(shard_path) + '.part'
+    with open(temporary_path, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, compressed, len(records)))
+        for record in records:
+            fh.write(RECORD.pack(*record))
+    os.replace(temporary_path, index_path(shard_path))
+
+    return items
+
+
+def build_index(directory, rebuild=False):
+    """
+    indexes the shards of `directory` which have no index yet, `.part` shards are still being written.
+
+    :param directory: `EXPORT_DIR`
+    :param rebuild: index every shard again
+    :return: {shard name: number of indexed items}
+    """
+    indexed = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if is_shard(name) and (rebuild or not os.path.exists(index_path(path))):
+            indexed[name] = build_shard_index(path)
+            logger.info(f"indexed {indexed[name]} items of {name}")
+    return indexed
+
+
+class ShardIndex:
+    """
+    The memory-mapped index of one shard.
+    """
+
+    def __init__(self, shard_path):
+        self.shard_path = shard_path
+        with open(index_path(shard_path), 'rb') as fh:
+            self.mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, compressed, self.size = HEADER.unpack_from(self.mmap, 0)
+        assert magic == MAGIC and version == VERSION, f"`{index_path(shard_path)}` is not a word index!"
+        self.compressed = bool(compressed)
+
+    def record(self, position):
+        return RECORD.unpack_from(self.mmap, HEADER.size + position * RECORD.size)
+
+    def find(self, key):
+        """
+        :param key: a key hash
+        :return: the records of the key, equal hashes are neighbours
+        """
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        while low < self.size:
+            record = self.record(low)
+            if record[0] != key:
+                return
+            yield record
+            low += 1
+
+    def read(self, member_offset, offset, length):
+        """
+        :return: the line of an item
+        """
+        with open(self.shard_path, 'rb') as fh:
+            fh.seek(member_offset)
+            if not self.compressed:
+                return fh.read(length)
+
+            decompressor = zlib.decompressobj(wbits=31)
+            data = b''
+            while len(data) < offset + length and not decompressor.eof:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                data += decompressor.decompress(chunk)
+            return data[offset:offset + length]
+
+    def close(self):
+        self.mmap.close()
+
+
+class WordIndex:
+    """
+    Looks words up in the indexed shards of a spider, the shard of the most recent crawl first.
+
+        index = WordIndex('exports')
+        index.get('market')
+        index.get('market', homnum='2')
+    """
+
+    def __init__(self, directory, spider='longman'):
+        """
+
+        :param directory: `EXPORT_DIR`, indexed with `build_index`
+        :param spider: name of the spider whose items are looked up
+        """
+        self.directory = directory
+        self.spider = spider
+        # path -> shard index, in crawl order
+        self.shards = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        opens the indexes written since the last call.
+
+        :return:
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if shard_order(name, self.spider) and path not in self.shards and os.path.exists(index_path(path)):
+                self.shards[path] = ShardIndex(path)
+
+        self.shards = dict(sorted(
+            self.shards.items(), key=lambda item: shard_order(os.path.basename(item[0]), self.spider),
+        ))
+
+    def get(self, word, homnum=None):
+        """
+        :param word:
+        :param homnum: keep only the entries of this homnum in the definition
+        :return: the decoded item, or None
+        """
+        key = key_hash(word, homnum)
+
+        for shard in reversed(list(self.shards.values())):
+            # the last line of a shard is the most recent one too
+            for _, member_offset, offset, length in reversed(list(shard.find(key))):
+                item = ujson.loads(shard.read(member_offset, offset, length))
+                if item.get('word') != word:
+                    # hash collision
+                    continue
+
+                if homnum is not None:
+                    item['definition'] = {
+                        position: entry for position, entry in item['definition'].items()
+                        if entry.get('homnum') == homnum
+                    }
+                return item
+
+        return None
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        self.shards = {}
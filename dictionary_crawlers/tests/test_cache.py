@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+The sqlite stores of `dictionary_crawlers.cache`, and the audio index as `DictionaryFilePipeline` uses it.
+"""
+from unittest import mock
+
+import scrapy
+from scrapy.utils.test import get_crawler
+
+from benchmarks.common import dictentries, load_fixture
+from dictionary_crawlers.cache import PageCache, ParseCache
+from dictionary_crawlers.pipelines import DictionaryFilePipeline
+from dictionary_crawlers.processors.longman import LongManDefinitionProcessor
+from dictionary_crawlers.services import LongManDefinitionService
+
+
+def test_parse_cache_key_follows_the_service_version(tmp_path):
+    cache = ParseCache(str(tmp_path), 100)
+    entries = dictentries(load_fixture('market'))
+    processor = LongManDefinitionProcessor()
+
+    definitions = processor(entries, {'parse_cache': cache})
+    assert processor(entries, {'parse_cache': cache}) == definitions
+    assert cache.count == 1
+
+    # a parser fix bumps the version, the definitions of the previous one are not served anymore
+    with mock.patch.object(LongManDefinitionService, 'version', LongManDefinitionService.version + 1):
+        processor(entries, {'parse_cache': cache})
+    assert cache.count == 2
+    cache.close()
+
+
+def test_page_cache_keeps_the_stored_page(tmp_path):
+    cache = PageCache(str(tmp_path), max_bytes=100)
+    cache.store('http://x/market', '"1"', None, b'market')
+    cache.store('http://x/run', '"1"', None, b'run')
+
+    # alone above the bound, the page just stored evicts the others but stays
+    cache.store('http://x/dog', '"1"', None, bytes(range(256)) * 4)
+    assert cache.validators('http://x/market') is None and cache.validators('http://x/run') is None
+    assert cache.body('http://x/dog') == bytes(range(256)) * 4
+    cache.close()
+
+
+def test_audio_url_forgotten_once_indexed(tmp_path):
+    crawler = get_crawler(settings_dict={'FILES_STORE': str(tmp_path), 'AUDIO_INDEX_DIR': str(tmp_path)})
+    spider = scrapy.Spider.from_crawler(crawler, name='longman')
+    pipeline = DictionaryFilePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+
+    market = {'word': 'market', 'audio': ['http://x/market.mp3?version=1']}
+    again = {'word': 'market', 'audio': ['http://x/market.mp3?version=2']}
+    [request] = pipeline.get_media_requests(market, None)
+    # requested again while the first download is in progress, the same request
+    assert [r.url for r in pipeline.get_media_requests(again, None)] == [request.url]
+
+    result = {'url': request.url, 'path': 'audio/market.mp3', 'checksum': 'c'}
+    pipeline.item_completed([(True, result)], market, None)
+    assert pipeline.canonical_urls == {}
+    assert list(pipeline.get_media_requests(again, None)) == []
+    assert crawler.stats.get_value('audio/skipped_existing') == 1
+    pipeline.close_spider(spider)
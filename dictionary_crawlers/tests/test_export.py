@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+`JsonLinesExportPipeline`: the items are announced once on disk, and the shards of a crashed crawl are recovered.
+"""
+import gzip
+import os
+
+import pytest
+from scrapy.signalmanager import SignalManager
+from scrapy.utils.test import get_crawler
+
+from dictionary_crawlers.pipelines import JsonLinesExportPipeline
+from dictionary_crawlers.signals import items_exported
+
+
+class Spider:
+    name = 'longman'
+    exporter = None
+
+
+def make_pipeline(directory, compress, signals=None):
+    stats = get_crawler().stats
+    return JsonLinesExportPipeline(stats, str(directory), batch_size=2, compress=compress, signals=signals)
+
+
+def read_shard(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as fh:
+        return fh.read().splitlines()
+
+
+def test_items_exported_once_written(tmp_path):
+    signals = SignalManager()
+    exported = []
+    signals.connect(lambda items, spider: exported.extend(item['word'] for item in items), signal=items_exported,
+                    weak=False)
+
+    spider = Spider()
+    pipeline = make_pipeline(tmp_path, False, signals)
+    pipeline.open_spider(spider)
+    assert spider.exporter is pipeline
+
+    pipeline.process_item({'word': 'market'}, spider)
+    assert exported == []
+    pipeline.process_item({'word': 'run'}, spider)
+    assert exported == ['market', 'run']
+    [part] = os.listdir(tmp_path)
+    assert len(read_shard(os.path.join(tmp_path, part))) == 2
+
+    pipeline.process_item({'word': 'dog'}, spider)
+    pipeline.close_spider(spider)
+    assert exported == ['market', 'run', 'dog']
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_unfinished_shard_is_recovered(tmp_path, compress):
+    spider = Spider()
+    crashed = make_pipeline(tmp_path, compress)
+    crashed.open_spider(spider)
+    for word in ('market', 'run', 'dog', 'bank'):
+        crashed.process_item({'word': word}, spider)
+    # a crash in the middle of the third batch, the lock of the shard goes with the process
+    crashed.shard.write(gzip.compress(b'{"word": "give-up"}\n')[:10] if compress else b'{"word": "gi')
+    crashed.shard.close()
+    [part] = os.listdir(tmp_path)
+    assert part.endswith('.part')
+
+    pipeline = make_pipeline(tmp_path, compress)
+    pipeline.open_spider(spider)
+    [shard] = os.listdir(tmp_path)
+    assert shard == part[:-len('.part')]
+    assert read_shard(os.path.join(tmp_path, shard)) == [
+        b'{"word":"market"}', b'{"word":"run"}', b'{"word":"dog"}', b'{"word":"bank"}',
+    ]
+    assert pipeline.stats.get_value('export/recovered_shards') == 1
+
+
+def test_shard_of_a_running_crawl_is_left_alone(tmp_path):
+    spider = Spider()
+    running = make_pipeline(tmp_path, False)
+    running.open_spider(spider)
+    running.process_item({'word': 'market'}, spider)
+    running.process_item({'word': 'run'}, spider)
+
+    make_pipeline(tmp_path, False).open_spider(spider)
+    [part] = os.listdir(tmp_path)
+    assert part.endswith('.part')
+    running.close_spider(spider)
+
+
+def test_crawls_started_in_the_same_second_write_their_own_shards(tmp_path):
+    spider = Spider()
+    first, second = make_pipeline(tmp_path, False), make_pipeline(tmp_path, False)
+    first.open_spider(spider)
+    second.open_spider(spider)
+    second.prefix = first.prefix
+    for pipeline, words in ((first, ('market', 'run')), (second, ('dog', 'bank'))):
+        for word in words:
+            pipeline.process_item({'word': word}, spider)
+    first.close_spider(spider)
+    second.close_spider(spider)
+
+    shards = sorted(os.listdir(tmp_path))
+    assert len(shards) == 2
+    assert [read_shard(os.path.join(tmp_path, shard)) for shard in shards] == [
+        [b'{"word":"market"}', b'{"word":"run"}'], [b'{"word":"dog"}', b'{"word":"bank"}'],
+    ]
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+The definition services of the other dictionaries over the fixture pages of the benchmarks, checked against
+the definitions recorded in `tests/expected`.
+"""
+import json
+import os
+
+import pytest
+from lxml import etree
+
+from benchmarks.common import load_fixture
+from benchmarks.suite import SOURCE_FIXTURES
+from dictionary_crawlers.models import to_primitive
+
+EXPECTED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expected')
+
+
+@pytest.mark.parametrize('fixture', sorted(SOURCE_FIXTURES))
+def test_definition(fixture):
+    with open(os.path.join(EXPECTED_DIR, f'{fixture}.json'), encoding='utf-8') as fh:
+        expected = json.load(fh)
+
+    definition = SOURCE_FIXTURES[fixture](etree.HTML(load_fixture(fixture)))()
+    assert to_primitive(definition) == expected
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+`LookupServer` against a local fake ldoceonline, which serves the fixture pages of the benchmarks.
+"""
+import asyncio
+import collections
+import http.server
+import threading
+import time
+
+import pytest
+
+from benchmarks.startup import FixtureHandler
+from dictionary_crawlers.server import LookupServer
+
+EMPTY_PAGE = b'<html><body><div class="dictionary">nothing here</div></body></html>'
+
+
+class FakeLongmanHandler(FixtureHandler):
+    """
+    The fixture pages, 404 for the other words, and a page without any entry for `empty`. Every request is counted
+    per word and waits `delay` seconds, so concurrent lookups overlap.
+    """
+    requests = collections.Counter()
+    delay = 0.0
+
+    def do_GET(self):
+        word = self.path.rsplit('/', 1)[-1]
+        self.requests[word] += 1
+        time.sleep(self.delay)
+        if word != 'empty':
+            return super(FakeLongmanHandler, self).do_GET()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(EMPTY_PAGE)))
+        self.end_headers()
+        self.wfile.write(EMPTY_PAGE)
+
+
+@pytest.fixture
+def upstream():
+    FakeLongmanHandler.requests = collections.Counter()
+    FakeLongmanHandler.delay = 0.0
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FakeLongmanHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield FakeLongmanHandler, f'http://127.0.0.1:{server.server_port}/dictionary/'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_server(tmp_path, upstream):
+    servers = []
+
+    def make(**kwargs):
+        server = LookupServer(str(tmp_path / 'lookup-cache'), base_url=upstream[1], **kwargs)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def get(server, path):
+    return asyncio.run(server.answer('GET', path))
+
+
+def test_memory_then_disk_tier(upstream, make_server):
+    handler, _ = upstream
+    server = make_server()
+
+    status, item = get(server, '/words/market')
+    assert status == 200
+    assert item['word'] == 'market' and item['definition']
+    assert handler.requests['market'] == 1
+
+    assert get(server, '/words/Market') == (200, item)
+    assert server.metrics.get_value('lookup_cache/memory/hit') == 1
+    assert server.metrics.get_value('lookup_cache/miss') == 1
+
+    # a new server starts with an empty memory tier and the same disk tier
+    restarted = make_server()
+    assert get(restarted, '/words/market') == (200, item)
+    assert restarted.metrics.get_value('lookup_cache/memory/miss') == 1
+    assert restarted.metrics.get_value('lookup_cache/disk/hit') == 1
+    assert get(restarted, '/words/market') == (200, item)
+    assert restarted.metrics.get_value('lookup_cache/memory/hit') == 1
+    assert handler.requests['market'] == 1
+
+
+def test_concurrent_lookups_are_coalesced(upstream, make_server):
+    handler, _ = upstream
+    handler.delay = 0.3
+    server = make_server()
+
+    async def lookups():
+        return await asyncio.gather(*(server.answer('GET', '/words/market') for _ in range(10)))
+
+    answers = asyncio.run(lookups())
+    assert {status for status, _ in answers} == {200}
+    assert all(item == answers[0][1] for _, item in answers)
+    assert handler.requests['market'] == 1
+    assert server.metrics.get_value('lookup/coalesced') == 9
+    assert not server.in_flight
+
+
+@pytest.mark.parametrize('word', ['missing', 'empty'])
+def test_not_found_is_cached_until_its_ttl(upstream, make_server, word):
+    handler, _ = upstream
+    server = make_server(not_found_ttl=0.5)
+
+    assert get(server, f'/words/{word}') == (404, {'word': word, 'error': "not found"})
+    assert get(server, f'/words/{word}')[0] == 404
+    assert handler.requests[word] == 1
+    assert server.metrics.get_value('lookup/upstream/not_found') == 1
+
+    time.sleep(0.6)
+    assert get(server, f'/words/{word}')[0] == 404
+    assert handler.requests[word] == 2
+    assert server.metrics.get_value('lookup/upstream/not_found') == 2
+    assert not server.metrics.get_value('lookup/upstream/found')
+
+
+def test_metrics(upstream, make_server):
+    server = make_server()
+    get(server, '/words/market')
+    get(server, '/words/market')
+    get(server, '/words/missing')
+
+    status, metrics = get(server, '/metrics')
+    assert status == 200
+    assert metrics['lookup_cache/memory/hit'] == 1
+    assert metrics['lookup_cache/memory/miss'] == 2
+    assert metrics['lookup_cache/disk/miss'] == 2
+    assert metrics['lookup_cache/miss'] == 2
+    assert metrics['lookup/upstream/found'] == 1
+    assert metrics['lookup/upstream/not_found'] == 1
+    assert metrics['hit_rate'] == round(1 / 3, 4)
+    assert metrics['memory_entries'] == 2 and metrics['disk_entries'] == 2 and metrics['in_flight'] == 0
+    assert metrics['latency']['request']['count'] == 3
+    assert metrics['latency']['upstream']['count'] == 2
+
+
+def test_disk_tier_eviction(make_server):
+    server = make_server(disk_max_entries=2)
+    for word in ('market', 'run', 'dog'):
+        assert get(server, f'/words/{word}')[0] == 200
+
+    # the third word overflows the disk tier, the least recently used one is evicted
+    assert server.metrics.get_value('lookup_cache/disk/evicted') == 1
+    assert get(server, '/metrics')[1]['disk_entries'] == 2
+    assert server.disk.get('market', time.time()) is None
+    assert server.disk.get('run', time.time())[0]['word'] == 'run'
+    assert server.disk.get('dog', time.time())[0]['word'] == 'dog'
+
+
+def test_routes(make_server):
+    server = make_server()
+    assert get(server, '/words/')[0] == 400
+    assert get(server, '/nowhere')[0] == 404
+    assert asyncio.run(server.answer('POST', '/words/market'))[0] == 405
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+Items of the spiders over the fixture pages of the benchmarks.
+"""
+import pytest
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from benchmarks.common import load_fixture
+from dictionary_crawlers.spiders.dictionaries import DictionariesSpider
+from dictionary_crawlers.spiders.longman import LongmanDictionarySpider
+
+EMPTY_PAGE = '<html><body><div class="dictionary">nothing here</div></body></html>'
+
+
+def load_item(page, fields=None):
+    crawler = get_crawler(LongmanDictionarySpider)
+    spider = LongmanDictionarySpider.from_crawler(crawler, fields=fields)
+    url = spider.base_url + 'market'
+    response = HtmlResponse(url, body=page, encoding='utf-8', request=Request(url, meta={'word': 'market'}))
+    return spider, spider.load_item(response)
+
+
+@pytest.mark.parametrize('fields', [None, 'family_word', 'corpus', 'definition', 'hwd,pos', 'examples'])
+def test_found_follows_the_projection(fields):
+    spider, item = load_item(load_fixture('market'), fields)
+    assert spider.found(item)
+
+    spider, item = load_item(EMPTY_PAGE, fields)
+    assert not spider.found(item)
+
+
+def test_fan_out_word_requested_twice():
+    crawler = get_crawler(DictionariesSpider)
+    spider = DictionariesSpider.from_crawler(crawler, sources='longman,oxford')
+    crawler.stats.open_spider(spider)
+    first = list(spider.word_requests('market'))
+    second = list(spider.word_requests('market'))
+
+    assert list(spider.answer(second[0].meta, None, 'not_found')) == []
+    assert list(spider.answer(first[1].meta, None, 'timeout')) == []
+    [item] = spider.answer(first[0].meta, None, 'not_found')
+    assert item['sources'] == {'oxford': 'timeout', 'longman': 'not_found'}
+    [item] = spider.answer(second[1].meta, None, 'not_found')
+    assert item['sources'] == {'longman': 'not_found', 'oxford': 'not_found'}
+
+    # a late answer of an emitted fetch, a retry for instance, is only counted
+    assert list(spider.answer(first[0].meta, None, 'error')) == []
+    assert crawler.stats.get_value('dictionaries/late_answers') == 1
+    assert not spider.pending
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: ts=4: sw=4: et
+
+"""
+`WordIndex` over the shards of several crawls and spiders.
+"""
+import os
+
+import ujson
+
+from dictionary_crawlers.wordindex import WordIndex, build_index
+
+
+def write_shard(directory, name, *items):
+    with open(os.path.join(directory, name), 'wb') as fh:
+        for item in items:
+            fh.write(ujson.dumps(item).encode('utf-8') + b'\n')
+
+
+def test_most_recent_crawl_of_the_spider_wins(tmp_path):
+    directory = str(tmp_path)
+    write_shard(directory, 'longman-20240101T000000-00000.jsonl', {'word': 'market', 'crawl': 'old'})
+    write_shard(directory, 'longman-20250101T000000-00000.jsonl', {'word': 'market', 'crawl': 'first shard'})
+    write_shard(directory, 'longman-20250101T000000-00001.jsonl', {'word': 'market', 'crawl': 'new'})
+    # sorted by name, the shards of these spiders come after the longman ones
+    write_shard(directory, 'oxford-20260101T000000-00000.jsonl', {'word': 'market', 'crawl': 'oxford'})
+    write_shard(directory, 'dictionaries-20260101T000000-00000.jsonl', {'word': 'market', 'crawl': 'dictionaries'})
+    build_index(directory)
+
+    index = WordIndex(directory)
+    assert index.get('market')['crawl'] == 'new'
+    index.close()
+
+    index = WordIndex(directory, spider='oxford')
+    assert index.get('market')['crawl'] == 'oxford'
+    index.close()
+
+    # a later crawl is found once indexed
+    index = WordIndex(directory)
+    write_shard(directory, 'longman-20250601T000000-00000.jsonl', {'word': 'market', 'crawl': 'later'})
+    build_index(directory)
+    index.refresh()
+    assert index.get('market')['crawl'] == 'later'
+    index.close()